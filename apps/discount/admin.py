@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.shortcuts import get_object_or_404
-from .models import Product, DiscountBasket, DiscountDetail, Copon
+from apps.product import facets
+from .models import Product, DiscountBasket, DiscountDetail, Copon, ProductEffectivePrice
 
 # Register your models here.
 
@@ -33,9 +34,16 @@ class DiscountBasketAdmin(admin.ModelAdmin):
         discount_basket = queryset.first()
 
         # اضافه کردن تمام محصولات به سبد تخفیف
-        products = Product.objects.all()
-        for product in products:
-            DiscountDetail.objects.get_or_create(discountBasket=discount_basket, product=product)
+        existing = set(discount_basket.discountOfBasket.values_list('product_id', flat=True))
+        product_ids = Product.objects.exclude(id__in=existing).values_list('id', flat=True)
+        DiscountDetail.objects.bulk_create([
+            DiscountDetail(discountBasket=discount_basket, product_id=product_id)
+            for product_id in product_ids
+        ])
+        # bulk_create سیگنال ندارد؛ قیمت نهایی و بعد ایندکس فیلترهای دسته‌بندی را یکجا بروزرسانی می‌کنیم
+        all_ids = list(Product.objects.values_list('id', flat=True))
+        ProductEffectivePrice.refresh_products(all_ids)
+        facets.refresh_products(all_ids)
 
         self.message_user(request, "تمام محصولات به سبد تخفیف اضافه شدند")
 
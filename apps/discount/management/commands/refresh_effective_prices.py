@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from apps.discount.models import ProductEffectivePrice
+
+
+class Command(BaseCommand):
+    help = 'محاسبه دوباره قیمت نهایی محصولاتی که بازه تخفیفشان شروع یا تمام شده (برای اجرای زمان‌بندی شده با cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='محاسبه دوباره قیمت همه محصولات')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            count = ProductEffectivePrice.rebuild_all()
+        else:
+            count = ProductEffectivePrice.refresh_expired()
+        self.stdout.write(self.style.SUCCESS(f'قیمت نهایی {count} محصول بروزرسانی شد'))
@@ -0,0 +1,64 @@
+# Generated by Django 4.0.3 on 2026-10-18 10:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def fill_effective_prices(apps, schema_editor):
+    # مثل ProductEffectivePrice.rebuild_all، با مدل‌های تاریخی
+    Product = apps.get_model('product', 'Product')
+    DiscountDetail = apps.get_model('discount', 'DiscountDetail')
+    ProductEffectivePrice = apps.get_model('discount', 'ProductEffectivePrice')
+    now = timezone.now()
+
+    windows = {}
+    details = DiscountDetail.objects.filter(discountBasket__isActive=True).values_list(
+        'product_id', 'discountBasket__startDate', 'discountBasket__endDate', 'discountBasket__discount'
+    )
+    for product_id, start, end, discount in details:
+        windows.setdefault(product_id, []).append((start, end, discount))
+
+    rows = []
+    for product_id, price in Product.objects.values_list('id', 'price').iterator():
+        product_windows = windows.get(product_id, [])
+        current = [discount for start, end, discount in product_windows if start <= now <= end]
+        boundaries = [end for start, end, discount in product_windows if start <= now <= end]
+        boundaries += [start for start, end, discount in product_windows if start > now]
+        discount = max(current) if current else 0
+        rows.append(ProductEffectivePrice(
+            product_id=product_id,
+            price=price,
+            discount=discount,
+            final_price=int(price - (price * discount / 100)),
+            valid_until=min(boundaries) if boundaries else None,
+        ))
+    ProductEffectivePrice.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0003_productstats'),
+        ('discount', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductEffectivePrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.PositiveIntegerField(verbose_name='قیمت')),
+                ('discount', models.PositiveSmallIntegerField(default=0, verbose_name='درصد تخفیف')),
+                ('final_price', models.PositiveIntegerField(db_index=True, verbose_name='قیمت نهایی')),
+                ('valid_until', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='معتبر تا')),
+                ('updateAt', models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='effective_price', to='product.product', verbose_name='محصول')),
+            ],
+            options={
+                'verbose_name': 'قیمت نهایی محصول',
+                'verbose_name_plural': 'قیمت\u200cهای نهایی محصولات',
+            },
+        ),
+        migrations.RunPython(fill_effective_prices, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from apps.product.models import *
 from django.core.validators import MaxValueValidator, MinValueValidator
 from datetime import datetime
@@ -40,4 +40,92 @@ class DiscountDetail(models.Model):
 
     class Meta:
         verbose_name = 'جزییات سبد خرید'
-        verbose_name_plural = 'جزییات سبد تخفیف ها'
\ No newline at end of file
+        verbose_name_plural = 'جزییات سبد تخفیف ها'
+
+
+class ProductEffectivePrice(models.Model):
+    """
+    قیمت نهایی هر محصول با احتساب سبدهای تخفیف فعال.
+    تا زمان valid_until معتبر است؛ بعد از آن باید دوباره محاسبه شود.
+    """
+
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, verbose_name='محصول', related_name='effective_price')
+    price = models.PositiveIntegerField(verbose_name='قیمت')
+    discount = models.PositiveSmallIntegerField(default=0, verbose_name='درصد تخفیف')
+    final_price = models.PositiveIntegerField(db_index=True, verbose_name='قیمت نهایی')
+    valid_until = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name='معتبر تا')
+    updateAt = models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')
+
+    class Meta:
+        verbose_name = 'قیمت نهایی محصول'
+        verbose_name_plural = 'قیمت‌های نهایی محصولات'
+
+    def __str__(self) -> str:
+        return f'{self.product} - {self.final_price}'
+
+    def is_valid(self, now=None):
+        now = now or timezone.now()
+        return self.valid_until is None or now < self.valid_until
+
+    @staticmethod
+    def calc(price, windows, now):
+        """
+        محاسبه درصد تخفیف، قیمت نهایی و زمان اعتبار از روی بازه‌های تخفیف
+        windows: لیست (startDate, endDate, discount) سبدهای فعال
+        """
+        current = [discount for start, end, discount in windows if start <= now <= end]
+        boundaries = [end for start, end, discount in windows if start <= now <= end]
+        boundaries += [start for start, end, discount in windows if start > now]
+        discount = max(current) if current else 0
+        final_price = int(price - (price * discount / 100))
+        return discount, final_price, min(boundaries) if boundaries else None
+
+    @staticmethod
+    def discount_windows(product_ids):
+        """{id محصول: لیست (startDate, endDate, discount) سبدهای فعال} با یک کوئری"""
+        windows = {}
+        details = DiscountDetail.objects.filter(
+            product_id__in=product_ids, discountBasket__isActive=True
+        ).values_list('product_id', 'discountBasket__startDate', 'discountBasket__endDate', 'discountBasket__discount')
+        for product_id, start, end, discount in details:
+            windows.setdefault(product_id, []).append((start, end, discount))
+        return windows
+
+    @classmethod
+    def refresh_products(cls, product_ids):
+        """محاسبه دوباره قیمت نهایی محصولات داده شده به صورت گروهی"""
+        product_ids = set(product_ids)
+        if not product_ids:
+            return 0
+        now = timezone.now()
+        windows = cls.discount_windows(product_ids)
+
+        rows = []
+        for product_id, price in Product.objects.filter(id__in=product_ids).values_list('id', 'price'):
+            discount, final_price, valid_until = cls.calc(price, windows.get(product_id, []), now)
+            rows.append(cls(
+                product_id=product_id,
+                price=price,
+                discount=discount,
+                final_price=final_price,
+                valid_until=valid_until,
+            ))
+
+        with transaction.atomic():
+            cls.objects.filter(product_id__in=product_ids).delete()
+            cls.objects.bulk_create(rows)
+        return len(rows)
+
+    @classmethod
+    def refresh_expired(cls):
+        """محاسبه دوباره ردیف‌هایی که زمان اعتبارشان گذشته است (شروع یا پایان یک بازه تخفیف)"""
+        expired = cls.objects.filter(valid_until__lte=timezone.now()).values_list('product_id', flat=True)
+        return cls.refresh_products(list(expired))
+
+    @classmethod
+    def rebuild_all(cls, batch_size=500):
+        product_ids = list(Product.objects.values_list('id', flat=True))
+        count = 0
+        for i in range(0, len(product_ids), batch_size):
+            count += cls.refresh_products(product_ids[i:i + batch_size])
+        return count
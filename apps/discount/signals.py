@@ -0,0 +1,28 @@
+# signals.py
+# بروزرسانی جدول قیمت نهایی محصولات هنگام تغییر قیمت یا سبدهای تخفیف
+# ایندکس فیلترهای دسته‌بندی بعد از قیمت نهایی بروزرسانی می‌شود تا قیمت جدید را ببیند
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.product import facets
+from apps.product.models import Product
+from .models import DiscountBasket, DiscountDetail, ProductEffectivePrice
+
+
+@receiver(post_save, sender=Product)
+def update_price_on_product_change(sender, instance, **kwargs):
+    ProductEffectivePrice.refresh_products([instance.id])
+    facets.refresh_products([instance.id])
+
+
+@receiver(post_save, sender=DiscountBasket)
+def update_prices_on_basket_change(sender, instance, **kwargs):
+    product_ids = list(instance.discountOfBasket.values_list('product_id', flat=True))
+    ProductEffectivePrice.refresh_products(product_ids)
+    facets.refresh_products(product_ids)
+
+
+@receiver(post_save, sender=DiscountDetail)
+@receiver(post_delete, sender=DiscountDetail)
+def update_price_on_detail_change(sender, instance, **kwargs):
+    ProductEffectivePrice.refresh_products([instance.product_id])
+    facets.refresh_products([instance.product_id])
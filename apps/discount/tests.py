@@ -1,3 +1,103 @@
-from django.test import TestCase
+import importlib
+from datetime import timedelta
+from unittest import mock
+from django.apps import apps
+from django.contrib import admin
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+from apps.discount.admin import DiscountBasketAdmin
+from apps.discount.models import DiscountBasket, ProductEffectivePrice
+from apps.main.models import CacheVersion
+from apps.product import facets
+from apps.product.cards import build_product_cards
+from apps.product.models import Product
+from apps.product.tests.helpers import make_category, make_discount, make_product, reset_caches
 
-# Create your tests here.
+
+class ProductEffectivePriceTests(TestCase):
+    def setUp(self):
+        reset_caches()
+
+    def test_discount_changes_refresh_effective_price(self):
+        product = make_product(price=1000)
+        self.assertEqual(product.effective_price.final_price, 1000)
+
+        basket = make_discount([product], 20)
+        price = ProductEffectivePrice.objects.get(product=product)
+        self.assertEqual((price.discount, price.final_price), (20, 800))
+        self.assertEqual(price.valid_until, basket.endDate)
+
+        basket.isActive = False
+        basket.save()
+        price = ProductEffectivePrice.objects.get(product=product)
+        self.assertEqual((price.discount, price.final_price), (0, 1000))
+
+    def test_refresh_expired_applies_a_window_that_has_started(self):
+        now = timezone.now()
+        product = make_product(price=1000)
+        make_discount([product], 50, start=now - timedelta(minutes=1), end=now + timedelta(days=1))
+        # ردیفی که قبل از شروع بازه ساخته شده و اعتبارش با شروع بازه تمام شده است
+        ProductEffectivePrice.objects.filter(product=product).update(
+            discount=0, final_price=1000, valid_until=now - timedelta(minutes=1)
+        )
+
+        self.assertEqual(ProductEffectivePrice.refresh_expired(), 1)
+        price = ProductEffectivePrice.objects.get(product=product)
+        self.assertEqual((price.discount, price.final_price), (50, 500))
+
+    def test_price_sort_uses_discounted_price(self):
+        cheap = make_product(price=1000)
+        discounted = make_product(price=1500)
+        make_discount([discounted], 50)
+
+        ordered = list(Product.objects.with_final_price().order_by('final_price').values_list('id', 'final_price'))
+        self.assertEqual(ordered, [(discounted.id, 750), (cheap.id, 1000)])
+
+    def test_stale_rows_fall_back_without_extra_queries(self):
+        products = [make_product(title=f'Galaxy {index}', price=1000) for index in range(4)]
+        make_discount(products, 10)
+        ProductEffectivePrice.objects.update(valid_until=timezone.now() - timedelta(minutes=1))
+
+        with self.assertNumQueries(3):
+            cards = build_product_cards(Product.objects.with_card_data())
+        self.assertEqual({card['final_price'] for card in cards}, {900})
+
+    def test_migration_backfills_existing_products(self):
+        product = make_product(price=2000)
+        make_discount([product], 25)
+        ProductEffectivePrice.objects.all().delete()
+
+        migration = importlib.import_module('apps.discount.migrations.0003_producteffectiveprice')
+        migration.fill_effective_prices(apps, None)
+        price = ProductEffectivePrice.objects.get(product=product)
+        self.assertEqual((price.discount, price.final_price), (25, 1500))
+
+
+class AddAllProductsActionTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.category = make_category('Printers')
+        self.printer = make_product('Printer', price=1000, categories=[self.category])
+        self.toner = make_product('Toner', price=200, categories=[self.category])
+        now = timezone.now()
+        self.basket = DiscountBasket.objects.create(
+            discountTitle='حراج', discount=50, isActive=True,
+            startDate=now - timedelta(days=1), endDate=now + timedelta(days=1),
+        )
+
+    def run_action(self):
+        model_admin = DiscountBasketAdmin(DiscountBasket, admin.site)
+        with mock.patch.object(model_admin, 'message_user'):
+            model_admin.add_all_products(RequestFactory().post('/'), DiscountBasket.objects.filter(pk=self.basket.pk))
+
+    def test_facet_index_sees_the_discounted_prices(self):
+        index = facets.get_category_index(self.category)
+        version_key = facets.VERSION_KEY.format(self.category.id)
+        version = CacheVersion.get(version_key)
+        self.run_action()
+
+        self.assertEqual(index.price_range(), {'max_price': 500, 'min_price': 100})
+        self.assertEqual(index.sorted_ids(index.filter(price_max=150)), [self.toner.id])
+        self.assertEqual(index.valid_until, {self.printer.id: self.basket.endDate, self.toner.id: self.basket.endDate})
+        # ایندکس بقیه workerها با نسخه جدید دوباره ساخته می‌شود
+        self.assertGreater(CacheVersion.get(version_key), version)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.main'
+
+    def ready(self):
+        from .signals import connect_fragment_invalidation
+        connect_fragment_invalidation()
@@ -0,0 +1,78 @@
+# fragments.py
+# کش HTML ویجت‌های render_partial با TTL و تگ‌های وابستگی
+#
+# هر ویجت ثبت شده در FRAGMENTS یک TTL و چند تگ (مثل product یا blog) دارد.
+# نسخه هر تگ در دیتابیس (main.CacheVersion) نگه داشته می‌شود و جزو کلید ویجت است؛ با ذخیره
+# یا حذف مدل‌های وابسته نسخه تگ بالا می‌رود و فقط ویجت‌های همان تگ دوباره ساخته می‌شوند.
+# HTML ویجت‌ها در cache هر worker است ولی نسخه‌ها مشترک‌اند، پس تغییر در یک worker یا
+# دستور مدیریتی ویجت‌های کهنه همه workerها را کنار می‌گذارد.
+#
+# فقط ویجت‌هایی را ثبت کنید که خروجی آن‌ها به کاربر و سشن بستگی ندارد.
+import hashlib
+from django.core.cache import cache
+from .models import CacheVersion
+
+FRAGMENT_CACHE_KEY = 'fragment:{}:{}:{}'
+TAG_VERSION_KEY = 'fragment_tag:{}'
+
+# نام view -> TTL (ثانیه) و تگ‌های وابستگی
+FRAGMENTS = {
+    'main:slider_list_view': {'ttl': 60 * 5, 'tags': ('slider',)},
+    'main:slider_main_view': {'ttl': 60 * 5, 'tags': ('slider',)},
+    'product:category_group': {'ttl': 60 * 60, 'tags': ('category', 'product')},
+    'product:best_selling_products_view': {'ttl': 60 * 30, 'tags': ('product', 'brand')},
+    'product:recently': {'ttl': 60 * 30, 'tags': ('product', 'brand')},
+    'product:newest_drives': {'ttl': 60 * 30, 'tags': ('product', 'brand')},
+    'product:brands': {'ttl': 60 * 60, 'tags': ('brand', 'product')},
+    'product:category_filter_group': {'ttl': 60 * 60, 'tags': ('category', 'product')},
+    'product:category_filter_brand': {'ttl': 60 * 60, 'tags': ('brand', 'product')},
+    'blog:blogmain': {'ttl': 60 * 60, 'tags': ('blog',)},
+    'search:trending_searches': {'ttl': 60 * 60, 'tags': ('trending',)},
+}
+
+# مدل -> تگ‌هایی که با ذخیره یا حذف آن باطل می‌شوند
+MODEL_TAGS = {
+    'main.SliderSite': ('slider',),
+    'main.SliderMain': ('slider',),
+    'product.Product': ('product',),
+    'product.ProductStats': ('product',),
+    'product.ProductFeature': ('product',),
+    'product.Brand': ('brand',),
+    'product.Category': ('category',),
+    'discount.DiscountBasket': ('product',),
+    'discount.DiscountDetail': ('product',),
+    'blog.BlogPost': ('blog',),
+    'blog.Category': ('blog',),
+    'blog.Author': ('blog',),
+}
+
+
+def tag_versions(tags):
+    """نسخه فعلی تگ‌ها با یک کوئری"""
+    keys = [TAG_VERSION_KEY.format(tag) for tag in tags]
+    found = CacheVersion.get_many(keys)
+    return [str(found[key]) for key in keys]
+
+
+def invalidate_tags(*tags):
+    CacheVersion.bump_many(TAG_VERSION_KEY.format(tag) for tag in tags)
+
+
+def fragment_key(view_name, args, kwargs, tags):
+    params = repr((args, sorted(kwargs.items())))
+    digest = hashlib.md5(params.encode()).hexdigest()
+    return FRAGMENT_CACHE_KEY.format(view_name, digest, '.'.join(tag_versions(tags)))
+
+
+def get_or_render(view_name, args, kwargs, render):
+    """HTML ویجت از cache یا اجرای render() و ذخیره آن"""
+    config = FRAGMENTS.get(view_name)
+    if config is None:
+        return render()
+
+    key = fragment_key(view_name, args, kwargs, config['tags'])
+    content = cache.get(key)
+    if content is None:
+        content = render()
+        cache.set(key, content, config['ttl'])
+    return content
@@ -0,0 +1,26 @@
+# Generated by Django 4.0.3 on 2026-10-18 11:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True, verbose_name='کلید')),
+                ('version', models.BigIntegerField(verbose_name='نسخه')),
+                ('updateAt', models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')),
+            ],
+            options={
+                'verbose_name': 'نسخه کش',
+                'verbose_name_plural': 'نسخه\u200cهای کش',
+            },
+        ),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+import time
+from django.db import models, transaction
+from django.db.models import F
 from django.utils import timezone
 import os
 from PIL import Image
@@ -76,6 +78,57 @@ class Banner(models.Model):
         verbose_name_plural = 'بنرها'
 
 
+
+class CacheVersion(models.Model):
+    """
+    نسخه مشترک کش‌ها و ایندکس‌های حافظه بین همه workerها.
+    cache پیش‌فرض (LocMemCache) مال هر پردازه است؛ نسخه‌ها در دیتابیس نگه داشته می‌شوند تا
+    تغییر در یک worker (یا دستور مدیریتی) در درخواست بعدی همه workerها دیده شود.
+    افزایش نسخه در همان تراکنش تغییر داده انجام می‌شود و تا commit برای بقیه دیده نمی‌شود.
+    """
+    key = models.CharField(max_length=100, unique=True, verbose_name='کلید')
+    version = models.BigIntegerField(verbose_name='نسخه')
+    updateAt = models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')
+
+    class Meta:
+        verbose_name = 'نسخه کش'
+        verbose_name_plural = 'نسخه‌های کش'
+
+    def __str__(self) -> str:
+        return f'{self.key}: {self.version}'
+
+    @classmethod
+    def get_many(cls, keys):
+        """{کلید: نسخه} با یک کوئری؛ کلید جدید با زمان فعلی ساخته می‌شود تا نسخه‌های قبلی تکرار نشوند"""
+        keys = list(keys)
+        versions = dict(cls.objects.filter(key__in=keys).values_list('key', 'version'))
+        missing = [key for key in keys if key not in versions]
+        if missing:
+            cls.objects.bulk_create(
+                [cls(key=key, version=time.time_ns()) for key in missing], ignore_conflicts=True
+            )
+            versions.update(cls.objects.filter(key__in=missing).values_list('key', 'version'))
+        return versions
+
+    @classmethod
+    def get(cls, key):
+        return cls.get_many([key])[key]
+
+    @classmethod
+    def bump_many(cls, keys):
+        """افزایش اتمیک نسخه کلیدها؛ خروجی: {کلید: نسخه جدید}"""
+        keys = list(keys)
+        if not keys:
+            return {}
+        with transaction.atomic():
+            cls.get_many(keys)
+            cls.objects.filter(key__in=keys).update(version=F('version') + 1, updateAt=timezone.now())
+            return dict(cls.objects.filter(key__in=keys).values_list('key', 'version'))
+
+    @classmethod
+    def bump(cls, key):
+        return cls.bump_many([key])[key]
+
 def validateImageOrSvg(file):
     """
     Validator to check if the uploaded file is an image or an SVG.
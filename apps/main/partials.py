@@ -0,0 +1,96 @@
+# partials.py
+# رندر همزمان ویجت‌های cached_partial یک صفحه
+#
+# ویجت‌های یک صفحه به هم وابسته نیستند؛ در حالت همزمان قبل از رندر قالب اصلی
+# همه تگ‌های cached_partial قالب پیدا می‌شوند، view آن‌ها در یک thread pool محدود
+# اجرا می‌شود و HTML آماده هنگام رندر قالب فقط در جای خود قرار می‌گیرد.
+# زمان رندر هر ویجت در هدر Server-Timing پاسخ برگردانده می‌شود.
+#
+# فعال‌سازی در settings:  PARTIAL_RENDER_WORKERS = 4   (0 یعنی رندر ترتیبی)
+import copy
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from django.template import Context
+from django.template.loader import get_template
+from .templatetags.cached_partial import CachedViewNode
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='partial')
+    return _executor
+
+
+def _render_node(node, request, context):
+    """اجرای یک ویجت در thread جدا با کپی request (render_partial مسیر request را موقتا عوض می‌کند)"""
+    started = time.perf_counter()
+    try:
+        request = copy.copy(request)
+        content = node.render_fragment(Context({**context, 'request': request}))
+        return content, time.perf_counter() - started
+    finally:
+        connections.close_all()
+
+
+def prerender_partials(request, template, context):
+    """
+    رندر همزمان ویجت‌های قالب و ذخیره HTML آن‌ها روی request.
+    خروجی: لیست (نام ویجت، زمان به ثانیه)
+    """
+    workers = getattr(settings, 'PARTIAL_RENDER_WORKERS', 0)
+    if not workers:
+        return []
+
+    nodes = template.template.nodelist.get_nodes_by_type(CachedViewNode)
+    if not nodes:
+        return []
+
+    executor = _get_executor(workers)
+    futures = [(node, executor.submit(_render_node, node, request, context)) for node in nodes]
+
+    prerendered = {}
+    timings = []
+    for node, future in futures:
+        try:
+            content, elapsed = future.result()
+        except Exception:
+            # در صورت خطا ویجت هنگام رندر قالب به صورت عادی اجرا می‌شود
+            logger.exception('Concurrent render of partial %s failed', node.view_name)
+            continue
+        prerendered[id(node)] = content
+        timings.append((node.view_name.strip('\'"'), elapsed))
+
+    request._prerendered_partials = prerendered
+    return timings
+
+
+def server_timing_header(timings):
+    return ', '.join(
+        f'partial{index};desc="{name}";dur={elapsed * 1000:.1f}'
+        for index, (name, elapsed) in enumerate(timings)
+    )
+
+
+def render_page(request, template_name, context=None):
+    """مثل render، با رندر همزمان ویجت‌های cached_partial در صورت فعال بودن"""
+    context = context or {}
+    # همان شیء قالب رندر می‌شود تا ویجت‌های از قبل رندر شده با id گره پیدا شوند
+    template = get_template(template_name)
+    timings = prerender_partials(request, template, context)
+    response = HttpResponse(template.render(context, request))
+    if timings:
+        response['Server-Timing'] = server_timing_header(timings)
+        logger.debug('Partial render timings for %s: %s', request.path, timings)
+    return response
@@ -0,0 +1,23 @@
+# signals.py
+# باطل کردن کش ویجت‌های render_partial هنگام ذخیره یا حذف مدل‌های وابسته
+from django.apps import apps
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from .fragments import MODEL_TAGS, invalidate_tags
+
+
+def _invalidate_handler(tags):
+    def handler(sender, **kwargs):
+        invalidate_tags(*tags)
+    return handler
+
+
+def connect_fragment_invalidation():
+    for model_label, tags in MODEL_TAGS.items():
+        model = apps.get_model(model_label)
+        handler = _invalidate_handler(tags)
+        uid = f'fragment_invalidation:{model_label}'
+        post_save.connect(handler, sender=model, weak=False, dispatch_uid=uid)
+        post_delete.connect(handler, sender=model, weak=False, dispatch_uid=uid)
+        # تغییر رابطه‌های چند به چند (مثل دسته‌های محصول) post_save ندارد
+        for field in model._meta.local_many_to_many:
+            m2m_changed.connect(handler, sender=field.remote_field.through, weak=False, dispatch_uid=f'{uid}.{field.name}')
@@ -0,0 +1,38 @@
+from django.template import Library, Variable
+from django_render_partial.templatetags.render_partial import ViewNode, render_partial
+from apps.main.fragments import get_or_render
+
+register = Library()
+
+
+class CachedViewNode(ViewNode):
+    def render(self, context):
+        # HTML از قبل رندر شده در حالت همزمان (apps.main.partials)
+        request = context.get('request')
+        prerendered = getattr(request, '_prerendered_partials', None)
+        if prerendered and id(self) in prerendered:
+            return prerendered[id(self)]
+        return self.render_fragment(context)
+
+    def render_fragment(self, context):
+        request = context.get('request')
+        if request is None or request.method != 'GET':
+            return super().render(context)
+
+        view_name = Variable(self.view_name).resolve(context)
+        args = [Variable(arg).resolve(context) for arg in self.args]
+        kwargs = {key: Variable(value).resolve(context) for key, value in self.kwargs.items()}
+        return get_or_render(view_name, args, kwargs, lambda: super(CachedViewNode, self).render(context))
+
+
+@register.tag
+def cached_partial(parser, token):
+    """
+    مثل render_partial، با این تفاوت که خروجی ویجت‌های ثبت شده در
+    apps.main.fragments.FRAGMENTS در cache نگه داشته می‌شود
+    و در صورت فعال بودن، همه ویجت‌های صفحه همزمان رندر می‌شوند (apps.main.partials).
+
+      {% cached_partial view_name arg[ arg2] k=v [k2=v2...] %}
+    """
+    node = render_partial(parser, token)
+    return CachedViewNode(node.view_name, node.args, node.kwargs)
@@ -1,3 +1,66 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from apps.main.fragments import TAG_VERSION_KEY, get_or_render
+from apps.main.models import CacheVersion
+from apps.product.tests.helpers import make_brand, make_category, make_product, reset_caches
 
-# Create your tests here.
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.renders = []
+
+    def render(self, view_name='product:brands', args=()):
+        return get_or_render(view_name, list(args), {}, lambda: self.renders.append(view_name) or f'<p>{len(self.renders)}</p>')
+
+    def test_registered_fragment_is_rendered_once(self):
+        self.assertEqual(self.render(), '<p>1</p>')
+        self.assertEqual(self.render(), '<p>1</p>')
+        self.assertEqual(self.render(args=['other']), '<p>2</p>')
+        self.assertEqual(len(self.renders), 2)
+
+    def test_unregistered_view_is_never_cached(self):
+        self.render('main:index')
+        self.render('main:index')
+        self.assertEqual(len(self.renders), 2)
+
+    def test_saving_a_dependency_invalidates_only_its_tags(self):
+        self.render('product:brands')
+        self.render('blog:blogmain')
+        make_brand('LG')
+        self.render('product:brands')
+        self.render('blog:blogmain')
+        self.assertEqual(self.renders, ['product:brands', 'blog:blogmain', 'product:brands'])
+
+    def test_invalidation_from_another_worker_is_seen(self):
+        self.render()
+        # دستور مدیریتی یا worker دیگر فقط نسخه مشترک دیتابیس را بالا می‌برد
+        CacheVersion.bump(TAG_VERSION_KEY.format('brand'))
+        self.render()
+        self.assertEqual(len(self.renders), 2)
+
+    def test_version_lookup_is_a_single_query(self):
+        self.render()
+        with self.assertNumQueries(1):
+            self.render()
+
+
+class ConcurrentPartialRenderTests(TransactionTestCase):
+    def setUp(self):
+        reset_caches()
+        make_product(title='Galaxy Book', categories=[make_category('Laptops')])
+
+    def get_home(self):
+        reset_caches()
+        return self.client.get(reverse('main:index'))
+
+    def test_concurrent_render_matches_sequential_render(self):
+        with override_settings(PARTIAL_RENDER_WORKERS=0):
+            sequential = self.get_home()
+        with override_settings(PARTIAL_RENDER_WORKERS=4), self.assertNoLogs('apps.main.partials', 'ERROR'):
+            concurrent = self.get_home()
+
+        self.assertEqual(concurrent.status_code, 200)
+        self.assertNotIn('Server-Timing', sequential)
+        self.assertIn('partial0;desc=', concurrent['Server-Timing'])
+        self.assertEqual(concurrent.content.decode(), sequential.content.decode())
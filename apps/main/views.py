@@ -2,6 +2,7 @@ from django.shortcuts import render
 import web.settings as sett
 from django.utils import timezone
 from .models import *
+from .partials import render_page
 
 # Create your views here.
 
@@ -19,7 +20,7 @@ def media_admin(request):
 
 def main(request):
 
-    return render(request,'main_app/main.html')
+    return render_page(request,'main_app/main.html')
 
 
 
@@ -58,7 +58,9 @@ class OrderAdmin(admin.ModelAdmin):
         'registerDate',
         'updateDate',
         'get_total_price',
-        'get_final_price'
+        'get_final_price',
+        'taxAmount',
+        'payableTotal',
     ]
 
     fieldsets = (
@@ -81,6 +83,8 @@ class OrderAdmin(admin.ModelAdmin):
             'fields': (
                 'get_total_price',
                 'get_final_price',
+                'taxAmount',
+                'payableTotal',
             )
         }),
         ('توضیحات', {
@@ -171,7 +175,7 @@ class OrderDetailAdmin(admin.ModelAdmin):
 
 
 from django.contrib import admin
-from .models import State, City, UserAddress
+from .models import State, City, UserAddress, Cart, CartLine
 
 
 @admin.register(State)
@@ -251,3 +255,22 @@ class UserAddressAdmin(admin.ModelAdmin):
     coordinates_display.short_description = "مختصات"
 
 
+
+
+# ========================
+# ادمین سبد خرید
+# ========================
+class CartLineInline(admin.TabularInline):
+    model = CartLine
+    extra = 0
+    raw_id_fields = ['product']
+    fields = ['product', 'detail', 'qty', 'final_price', 'discount']
+
+
+@admin.register(Cart)
+class CartAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'createAt']
+    search_fields = ['user__mobileNumber', 'token']
+    raw_id_fields = ['user']
+    readonly_fields = ['token', 'createAt']
+    inlines = [CartLineInline]
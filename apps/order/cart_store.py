@@ -0,0 +1,150 @@
+# cart_store.py
+# ذخیره سبد خرید جدا از session
+#
+# هر سبد یک ردیف Cart دارد (کاربر وارد شده با user و مهمان با توکن کوکی cart_token) و
+# هر خط سبد یک ردیف CartLine: محصول، ویژگی‌های انتخابی، تعداد و قیمت نهایی و درصد تخفیف
+# زمان افزودن. خطوط سبد در هر درخواست با یک کوئری (Cart با LEFT JOIN روی CartLine) از
+# دیتابیس خوانده می‌شوند؛ cache پیش‌فرض LocMemCache و جدا برای هر worker است و نسخه
+# cache شده یک worker بعد از تغییر سبد در worker دیگر کهنه می‌ماند. تغییر یک خط فقط
+# همان ردیف CartLine را می‌نویسد و session دست نمی‌خورد. سبد مهمان هنگام ورود با
+# merge_on_login در سبد کاربر ادغام می‌شود.
+import secrets
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from .models import Cart, CartLine
+
+CART_COOKIE = 'cart_token'
+CART_COOKIE_AGE = 60 * 60 * 24 * 30
+
+
+def line_key(product_id, detail):
+    return f"{product_id}:{detail}" if detail else str(product_id)
+
+
+def new_token():
+    return secrets.token_urlsafe(32)
+
+
+class CartStore:
+    """خطوط سبد یک کاربر یا مهمان: {کلید خط: product_id، detail، qty، final_price، discount}"""
+
+    def __init__(self, user_id=None, token=None):
+        self.user_id = user_id
+        self.token = token
+        self.new_token = None    # توکن سبد مهمان تازه ساخته شده که باید در کوکی ذخیره شود
+        self.cart_id = None
+        self._lines = None
+
+    @classmethod
+    def for_request(cls, request):
+        # بدون کوکی session کاربر حتماً مهمان است و session بارگذاری نمی‌شود
+        if settings.SESSION_COOKIE_NAME in request.COOKIES and request.user.is_authenticated:
+            return cls(user_id=request.user.pk)
+        return cls(token=request.COOKIES.get(CART_COOKIE))
+
+    def _load(self):
+        if self.user_id:
+            carts = Cart.objects.filter(user_id=self.user_id)
+        else:
+            carts = Cart.objects.filter(token=self.token, user__isnull=True)
+        # سبد خالی یک ردیف با ستون‌های خط NULL برمی‌گرداند
+        rows = carts.values_list(
+            'id', 'lines__product_id', 'lines__detail', 'lines__qty', 'lines__final_price', 'lines__discount'
+        )
+
+        cart_id, lines = None, {}
+        for cart_id, product_id, detail, qty, final_price, discount in rows:
+            if product_id is not None:
+                lines[line_key(product_id, detail)] = {
+                    'product_id': product_id, 'detail': detail, 'qty': qty,
+                    'final_price': final_price, 'discount': discount,
+                }
+        return cart_id, lines
+
+    def lines(self):
+        """خطوط سبد (همان دیکشنری داخلی که با set_line و remove_line بروز می‌شود)"""
+        if self._lines is None:
+            if not self.user_id and not self.token:
+                self.cart_id, self._lines = None, {}
+            else:
+                self.cart_id, self._lines = self._load()
+        return self._lines
+
+    def _ensure_cart(self):
+        if self.cart_id is not None:
+            return
+        if self.user_id:
+            cart, _ = Cart.objects.get_or_create(user_id=self.user_id, defaults={'token': new_token()})
+        else:
+            self.token = self.new_token = new_token()
+            cart = Cart.objects.create(token=self.token)
+        self.cart_id = cart.id
+
+    def set_line(self, product_id, detail, qty, final_price, discount):
+        """افزودن یا بروزرسانی یک خط (یک INSERT یا UPDATE روی همان ردیف)"""
+        lines = self.lines()
+        key = line_key(product_id, detail)
+        values = {'qty': qty, 'final_price': final_price, 'discount': discount}
+        if key in lines:
+            CartLine.objects.filter(cart_id=self.cart_id, product_id=product_id, detail=detail).update(**values)
+        else:
+            self._ensure_cart()
+            try:
+                with transaction.atomic():
+                    CartLine.objects.create(cart_id=self.cart_id, product_id=product_id, detail=detail, **values)
+            except IntegrityError:
+                # خط در درخواست همزمان دیگری ساخته شده است
+                CartLine.objects.filter(cart_id=self.cart_id, product_id=product_id, detail=detail).update(**values)
+        lines[key] = {'product_id': product_id, 'detail': detail, **values}
+
+    def remove_line(self, key):
+        lines = self.lines()
+        line = lines.pop(key, None)
+        if line is None:
+            return
+        CartLine.objects.filter(cart_id=self.cart_id, product_id=line['product_id'], detail=line['detail']).delete()
+
+    def clear(self):
+        lines = self.lines()
+        if not lines:
+            return
+        CartLine.objects.filter(cart_id=self.cart_id).delete()
+        lines.clear()
+
+    def invalidate(self):
+        """کنار گذاشتن خطوط خوانده شده بعد از تغییر مستقیم CartLine (مثل ثبت سفارش)"""
+        self._lines = None
+
+    def set_cookie(self, response):
+        """ذخیره توکن سبد مهمان تازه ساخته شده در کوکی پاسخ"""
+        if self.new_token:
+            response.set_cookie(CART_COOKIE, self.new_token, max_age=CART_COOKIE_AGE, httponly=True, samesite='Lax')
+        return response
+
+
+def merge_on_login(request, user, response):
+    """
+    ادغام سبد مهمان (کوکی cart_token) در سبد کاربر بعد از ورود؛ تعداد خطوط مشترک جمع زده
+    می‌شود و قیمت زمان افزودن خط قبلی کاربر حفظ می‌شود. سبد مهمان و کوکی آن حذف می‌شوند.
+    """
+    token = request.COOKIES.get(CART_COOKIE)
+    if not token:
+        return response
+    guest = CartStore(token=token)
+    guest_lines = guest.lines()
+    if guest.cart_id is not None:
+        store = CartStore(user_id=user.pk)
+        user_lines = store.lines()
+        with transaction.atomic():
+            for key, line in guest_lines.items():
+                current = user_lines.get(key)
+                if current is None:
+                    store.set_line(line['product_id'], line['detail'], line['qty'], line['final_price'], line['discount'])
+                else:
+                    store.set_line(
+                        line['product_id'], line['detail'], current['qty'] + line['qty'],
+                        current['final_price'], current['discount'],
+                    )
+            Cart.objects.filter(id=guest.cart_id).delete()
+    response.delete_cookie(CART_COOKIE)
+    return response
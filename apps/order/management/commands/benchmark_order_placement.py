@@ -0,0 +1,85 @@
+import statistics
+import time
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from apps.order.cart_store import CartStore
+from apps.order.models import Cart, CartLine, Order, OrderDetail
+from apps.order.placement import place_order
+from apps.product.models import Product
+from apps.user.models import CustomUser
+
+
+class Rollback(Exception):
+    pass
+
+
+def legacy_place_order(user, lines):
+    """روش قبلی CreateOrderView: یک get و یک create برای هر خط، بدون تراکنش"""
+    order = Order.objects.create(customer=user, status="pending")
+    for product_id, qty in lines:
+        product = Product.objects.get(id=product_id)
+        OrderDetail.objects.create(
+            order=order, product=product, brand=product.brand,
+            qty=qty, price=product.get_price_by_discount(), selectedOptions='',
+        )
+    return order
+
+
+def cart_store(user, lines):
+    cart = Cart.objects.create(user=user, token=uuid.uuid4().hex)
+    CartLine.objects.bulk_create([CartLine(cart=cart, product_id=product_id, qty=qty) for product_id, qty in lines])
+    store = CartStore(user_id=user.pk)
+    store.invalidate()
+    store.lines()
+    return store
+
+
+def measure(setup, place, repeat):
+    """(بیشترین تعداد کوئری، میانه زمان به میلی‌ثانیه) اجرای place؛ همه تغییرات rollback می‌شوند"""
+    queries, timings = [], []
+    for _ in range(repeat):
+        try:
+            with transaction.atomic():
+                argument = setup()
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    place(argument)
+                    timings.append((time.perf_counter() - started) * 1000)
+                queries.append(len(captured))
+                raise Rollback
+        except Rollback:
+            pass
+    return max(queries), statistics.median(timings)
+
+
+class Command(BaseCommand):
+    help = 'تعداد کوئری و زمان ثبت سفارش (روش قبلی و place_order) برای اندازه‌های مختلف سبد؛ هیچ داده‌ای ذخیره نمی‌شود'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 5, 10, 20, 50])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        product_ids = list(Product.objects.filter(isActive=True).values_list('id', flat=True)[:max(options['sizes'])])
+        if not product_ids:
+            raise CommandError('هیچ محصول فعالی وجود ندارد')
+
+        repeat = options['repeat']
+        self.stdout.write(f"{'lines':>6} {'legacy queries':>15} {'legacy ms':>10} {'queries':>8} {'ms':>8}")
+        for size in options['sizes']:
+            lines = [(product_id, 2) for product_id in product_ids[:size]]
+            try:
+                with transaction.atomic():
+                    user = CustomUser.objects.create_user(mobileNumber=f'bench-{uuid.uuid4().hex[:8]}')
+                    legacy_queries, legacy_ms = measure(
+                        lambda: None, lambda _: legacy_place_order(user, lines), repeat
+                    )
+                    queries, ms = measure(
+                        lambda: cart_store(user, lines), lambda store: place_order(user, store), repeat
+                    )
+                    raise Rollback
+            except Rollback:
+                pass
+            self.stdout.write(f"{len(lines):>6} {legacy_queries:>15} {legacy_ms:>10.1f} {queries:>8} {ms:>8.1f}")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from apps.order.models import Order
+
+
+class Command(BaseCommand):
+    help = 'بررسی مبالغ ثابت سفارش‌ها با جزئیات و تخفیف فعلی؛ با --fix مبالغ نادرست دوباره محاسبه می‌شوند'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        mismatches = Order.inconsistent_totals(batch_size=options['batch_size'])
+        for order_id, stored, expected in mismatches:
+            self.stdout.write(f'سفارش {order_id}: ذخیره شده {stored} درست {expected}')
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('مبالغ همه سفارش‌ها درست است'))
+            return
+        if options['fix']:
+            count = Order.recompute_all([order_id for order_id, _, _ in mismatches], batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'مبالغ {count} سفارش اصلاح شد'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{len(mismatches)} سفارش مبالغ نادرست دارد (--fix برای اصلاح)'))
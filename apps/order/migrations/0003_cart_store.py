@@ -0,0 +1,47 @@
+# Generated by Django 4.0.3 on 2026-10-18 10:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('product', '0007_comment_vote_counters'),
+        ('order', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64, unique=True, verbose_name='توکن سبد')),
+                ('createAt', models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')),
+                ('user', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='cart', to=settings.AUTH_USER_MODEL, verbose_name='کاربر')),
+            ],
+            options={
+                'verbose_name': 'سبد خرید',
+                'verbose_name_plural': 'سبدهای خرید',
+            },
+        ),
+        migrations.CreateModel(
+            name='CartLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('detail', models.CharField(blank=True, default='', max_length=255, verbose_name='ویژگی\u200cهای انتخابی')),
+                ('qty', models.PositiveIntegerField(default=1, verbose_name='تعداد')),
+                ('final_price', models.PositiveIntegerField(default=0, verbose_name='قیمت نهایی زمان افزودن')),
+                ('discount', models.PositiveSmallIntegerField(default=0, verbose_name='درصد تخفیف زمان افزودن')),
+                ('cart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='order.cart', verbose_name='سبد')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cartLines', to='product.product', verbose_name='محصول')),
+            ],
+            options={
+                'verbose_name': 'خط سبد خرید',
+                'verbose_name_plural': 'خطوط سبد خرید',
+                'unique_together': {('cart', 'product', 'detail')},
+            },
+        ),
+    ]
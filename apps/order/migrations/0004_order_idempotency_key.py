@@ -0,0 +1,18 @@
+# Generated by Django 4.0.3 on 2026-10-18 11:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0003_cart_store'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='idempotencyKey',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True, verbose_name='کلید یکتایی ثبت'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.0.3 on 2026-10-18 11:03
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+TAX_RATE = 9
+
+
+def fill_order_totals(apps, schema_editor):
+    # مبالغ سفارش‌های موجود از قیمت ثبت شده جزئیات (نه قیمت فعلی محصولات)
+    Order = apps.get_model('order', 'Order')
+    OrderDetail = apps.get_model('order', 'OrderDetail')
+    subtotals = dict(
+        OrderDetail.objects.values('order_id').annotate(total=Sum(F('price') * F('qty'))).order_by().values_list('order_id', 'total')
+    )
+    orders = list(Order.objects.only('id', 'discount'))
+    for order in orders:
+        subtotal = subtotals.get(order.id) or 0
+        discount_amount = (subtotal * order.discount) // 100 if order.discount else 0
+        order.subtotal = subtotal
+        order.discountAmount = discount_amount
+        order.taxAmount = ((subtotal - discount_amount) * TAX_RATE) // 100
+        # همان گرد کردن utils.price_by_delivery_tax
+        order.payableTotal = (subtotal * (100 + TAX_RATE) * (100 - order.discount)) // 10000
+    Order.objects.bulk_update(orders, ['subtotal', 'discountAmount', 'taxAmount', 'payableTotal'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order', '0004_order_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='discountAmount',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='مبلغ تخفیف'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='payableTotal',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='مبلغ قابل پرداخت'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='subtotal',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='جمع کل'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='taxAmount',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='مالیات'),
+        ),
+        migrations.RunPython(fill_order_totals, migrations.RunPython.noop),
+    ]
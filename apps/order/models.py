@@ -1,9 +1,15 @@
 from django.db import models
 from django.utils import timezone
 import uuid
+from django.db.models import Count, F, Q, Sum
 from apps.product.models import Product, Brand
 from apps.user.models import CustomUser
 import utils
+
+# درصد مالیات بر ارزش افزوده فاکتور
+TAX_RATE = 9
+
+
 # ========================
 # مدل سفارش (Order)
 # ========================
@@ -35,28 +41,117 @@ class Order(models.Model):
 
     discount = models.PositiveIntegerField(default=0, verbose_name="تخفیف روی فاکتور")
     isFinally = models.BooleanField(default=False, verbose_name="نهایی شده")
+    # اثر انگشت خطوط سبدی که سفارش از آن ساخته شده؛ جلوی ثبت دوباره همان سبد را می‌گیرد
+    idempotencyKey = models.CharField(
+        max_length=64, unique=True, null=True, blank=True,
+        editable=False, verbose_name="کلید یکتایی ثبت"
+    )
+    # سبدی که سفارش از آن ثبت شده؛ ارسال دوباره بعد از خالی شدن سبد به همین سفارش می‌رسد
+    cart = models.ForeignKey(
+        "Cart", on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name="orders", verbose_name="سبد خرید"
+    )
+
+    # مبالغ ثابت فاکتور (تومان)؛ با ثبت سفارش و تغییر جزئیات یا تخفیف آن محاسبه می‌شوند
+    subtotal = models.PositiveBigIntegerField(default=0, editable=False, verbose_name="جمع کل")
+    discountAmount = models.PositiveBigIntegerField(default=0, editable=False, verbose_name="مبلغ تخفیف")
+    taxAmount = models.PositiveBigIntegerField(default=0, editable=False, verbose_name="مالیات")
+    payableTotal = models.PositiveBigIntegerField(default=0, editable=False, verbose_name="مبلغ قابل پرداخت")
 
     def __str__(self):
         return f"سفارش {self.customer} - {self.orderCode}"
 
+    def save(self, *args, **kwargs):
+        # مبالغ وابسته به تخفیف از جمع کل ذخیره شده محاسبه می‌شوند (بدون کوئری)
+        self.apply_totals(self.subtotal)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'discountAmount', 'taxAmount', 'payableTotal'}
+        super().save(*args, **kwargs)
+
+    def apply_totals(self, subtotal):
+        """محاسبه مبلغ تخفیف، مالیات و مبلغ قابل پرداخت از جمع کل و درصد تخفیف سفارش"""
+        self.subtotal = subtotal
+        self.discountAmount = (subtotal * self.discount) // 100 if self.discount else 0
+        self.taxAmount = ((subtotal - self.discountAmount) * TAX_RATE) // 100
+        # مبلغ درگاه با همان گرد کردن utils.price_by_delivery_tax (ممکن است یک تومان با جمع بالا فرق کند)
+        self.payableTotal, _ = utils.price_by_delivery_tax(subtotal, self.discount)
+
+    @staticmethod
+    def details_subtotal(order_ids):
+        """{id سفارش: جمع قیمت × تعداد جزئیات} با یک کوئری"""
+        rows = OrderDetail.objects.filter(order_id__in=order_ids).values('order_id').annotate(
+            total=Sum(F('price') * F('qty'))
+        ).order_by()
+        return {row['order_id']: row['total'] or 0 for row in rows}
+
+    def recompute_totals(self):
+        """محاسبه دوباره مبالغ ثابت از روی جزئیات سفارش و ذخیره آن‌ها"""
+        self.apply_totals(self.details_subtotal([self.id]).get(self.id, 0))
+        self.save(update_fields=['subtotal'])
+
+    @classmethod
+    def with_recomputed_totals(cls, order_ids=None, batch_size=500):
+        """(سفارش با مبالغ محاسبه شده از جزئیات، مبالغ ذخیره شده قبلی) به صورت دسته‌ای"""
+        orders = cls.objects.order_by('id')
+        if order_ids is not None:
+            orders = orders.filter(id__in=order_ids)
+        ids = list(orders.values_list('id', flat=True))
+        for i in range(0, len(ids), batch_size):
+            # isFinally در post_init خوانده می‌شود و نباید deferred باشد
+            batch = cls.objects.filter(id__in=ids[i:i + batch_size]).only(
+                'id', 'discount', 'isFinally', 'subtotal', 'discountAmount', 'taxAmount', 'payableTotal'
+            )
+            subtotals = cls.details_subtotal(ids[i:i + batch_size])
+            for order in batch:
+                stored = order.totals()
+                order.apply_totals(subtotals.get(order.id, 0))
+                yield order, stored
+
+    @classmethod
+    def recompute_all(cls, order_ids=None, batch_size=500):
+        """محاسبه دوباره مبالغ سفارش‌ها؛ خروجی: تعداد سفارش‌هایی که مبالغشان تغییر کرد"""
+        stale = [order for order, stored in cls.with_recomputed_totals(order_ids, batch_size) if order.totals() != stored]
+        cls.objects.bulk_update(stale, ['subtotal', 'discountAmount', 'taxAmount', 'payableTotal'], batch_size=batch_size)
+        return len(stale)
+
+    @classmethod
+    def inconsistent_totals(cls, batch_size=500):
+        """سفارش‌هایی که مبالغ ذخیره شده‌شان با جزئیات و تخفیف فعلی نمی‌خواند: لیست (id، ذخیره شده، درست)"""
+        return [
+            (order.id, stored, order.totals())
+            for order, stored in cls.with_recomputed_totals(batch_size=batch_size)
+            if order.totals() != stored
+        ]
+
+    def totals(self):
+        return (self.subtotal, self.discountAmount, self.taxAmount, self.payableTotal)
+
+    @classmethod
+    def history(cls, user):
+        """سفارش‌های کاربر (جدیدترین اول) با تعداد اقلام؛ مبلغ از payableTotal ذخیره شده خوانده می‌شود"""
+        return cls.objects.filter(customer=user).annotate(items_count=Count('details')).order_by('-registerDate', '-id')
+
+    @classmethod
+    def status_counts(cls, user):
+        """تعداد کل سفارش‌های کاربر و تعداد هر وضعیت با یک aggregate"""
+        statuses = [status for status, _ in cls.STATUS_CHOICES] + ['returned']
+        return cls.objects.filter(customer=user).aggregate(
+            all=Count('id'),
+            **{status: Count('id', filter=Q(status=status)) for status in statuses},
+        )
 
     def get_order_total_price(self):
-        sum = 0
-        for item in self.details.all():
-            sum+=item.product.get_price_by_discount()*item.qty
-        finaly_total_price,tax = utils.price_by_delivery_tax(sum,self.discount)
-        return int(finaly_total_price*10)
+        """مبلغ قابل پرداخت به ریال (درگاه پرداخت)"""
+        return self.payableTotal * 10
 
     def getTotalPrice(self):
-        """محاسبه جمع کل سفارش قبل از تخفیف"""
-        return sum(item.price * item.qty for item in self.details.all())
+        """جمع کل سفارش قبل از تخفیف"""
+        return self.subtotal
 
     def getFinalPrice(self):
-        """محاسبه مبلغ نهایی با تخفیف"""
-        total = self.getTotalPrice()
-        if self.discount:
-            total -= (total * self.discount) // 100
-        return total
+        """مبلغ نهایی با تخفیف (بدون مالیات)"""
+        return self.subtotal - self.discountAmount
 
     class Meta:
         verbose_name = "سفارش"
@@ -103,6 +198,43 @@ class OrderDetail(models.Model):
         verbose_name_plural = "جزئیات سفارش‌ها"
 
 
+# ========================
+# سبد خرید (جدا از session؛ apps.order.cart_store)
+# ========================
+class Cart(models.Model):
+    token = models.CharField(max_length=64, unique=True, verbose_name="توکن سبد")
+    user = models.OneToOneField(
+        CustomUser, on_delete=models.CASCADE, null=True, blank=True,
+        related_name="cart", verbose_name="کاربر"
+    )
+    createAt = models.DateTimeField(auto_now_add=True, verbose_name="تاریخ ایجاد")
+
+    class Meta:
+        verbose_name = "سبد خرید"
+        verbose_name_plural = "سبدهای خرید"
+
+    def __str__(self):
+        return f"سبد {self.user if self.user else 'مهمان'}"
+
+
+class CartLine(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="lines", verbose_name="سبد")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="cartLines", verbose_name="محصول")
+    detail = models.CharField(max_length=255, blank=True, default='', verbose_name="ویژگی‌های انتخابی")
+    qty = models.PositiveIntegerField(default=1, verbose_name="تعداد")
+    # قیمت نهایی و درصد تخفیف زمان افزودن؛ برای تشخیص تغییر قیمت
+    final_price = models.PositiveIntegerField(default=0, verbose_name="قیمت نهایی زمان افزودن")
+    discount = models.PositiveSmallIntegerField(default=0, verbose_name="درصد تخفیف زمان افزودن")
+
+    class Meta:
+        verbose_name = "خط سبد خرید"
+        verbose_name_plural = "خطوط سبد خرید"
+        unique_together = ['cart', 'product', 'detail']
+
+    def __str__(self):
+        return f"{self.product_id} × {self.qty}"
+
+
 from django.db import models
 from django.conf import settings
 
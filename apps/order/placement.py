@@ -0,0 +1,86 @@
+# placement.py
+# ثبت سفارش از سبد خرید در یک تراکنش
+#
+# خطوط سبد از جدول CartLine خوانده می‌شوند (نه از cache)، همه محصولات با یک کوئری
+# قیمت‌گذاری می‌شوند (apps.order.shop_cart.current_prices) و سفارش، همه جزئیات آن
+# (bulk_create) با مبالغ ثابت فاکتور و حذف همان خطوط سبد با هم commit می‌شوند.
+# کلید یکتایی سفارش از id و تعداد خطوط سبد ساخته می‌شود؛ ارسال دوباره یا همزمان همان
+# سبد به جای سفارش تکراری، سفارش قبلی را برمی‌گرداند. خطوط بعد از ثبت حذف می‌شوند و
+# خطوط جدید id جدید دارند، پس خرید دوباره همان محصولات کلید جدیدی می‌سازد. ارسالی که
+# بعد از commit سفارش قبلی برسد سبد خالی می‌بیند؛ آخرین سفارش پرداخت نشده همان سبد
+# (تا RESUBMIT_WINDOW بعد از ثبت) به جای پیام «سبد خالی» برگردانده می‌شود.
+import hashlib
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import Order, OrderDetail, CartLine
+from .shop_cart import current_prices
+
+RESUBMIT_WINDOW = timedelta(minutes=10)
+
+
+def idempotency_key(cart_id, lines):
+    fingerprint = repr((cart_id, sorted((line_id, qty) for line_id, _, _, qty in lines)))
+    return hashlib.sha256(fingerprint.encode()).hexdigest()
+
+
+def recent_order(user, cart_id):
+    """آخرین سفارش پرداخت نشده user که در RESUBMIT_WINDOW گذشته از سبد cart_id ثبت شده"""
+    if cart_id is None:
+        return None
+    return Order.objects.filter(
+        cart_id=cart_id, customer=user, isFinally=False,
+        registerDate__gte=timezone.now() - RESUBMIT_WINDOW,
+    ).order_by('-registerDate', '-id').first()
+
+
+def place_order(user, store):
+    """
+    ثبت سفارش از سبد store برای user.
+    خروجی: (سفارش یا None اگر خط معتبری نباشد، آیا سفارش تازه ساخته شد، id محصولات حذف شده)
+    """
+    store.lines()
+    lines = list(CartLine.objects.filter(cart_id=store.cart_id).values_list('id', 'product_id', 'detail', 'qty'))
+    if not lines:
+        # ارسال دوباره بعد از ثبت سفارش: خطوط سبد با همان سفارش حذف شده‌اند
+        return recent_order(user, store.cart_id), False, []
+
+    key = idempotency_key(store.cart_id, lines)
+    order = Order.objects.filter(idempotencyKey=key).first()
+    if order is not None:
+        return order, False, []
+
+    prices = current_prices({product_id for _, product_id, _, _ in lines})
+    missing = sorted({product_id for _, product_id, _, _ in lines if prices[product_id] is None})
+    valid = [line for line in lines if prices[line[1]] is not None]
+    if not valid:
+        return None, False, missing
+
+    try:
+        with transaction.atomic():
+            # مبالغ فاکتور همین‌جا و یک بار از قیمت‌های ثبت شده محاسبه و ذخیره می‌شوند
+            subtotal = sum(prices[product_id]['final_price'] * qty for _, product_id, _, qty in valid)
+            order = Order.objects.create(
+                customer=user, status="pending", idempotencyKey=key, cart_id=store.cart_id, subtotal=subtotal
+            )
+            OrderDetail.objects.bulk_create([
+                OrderDetail(
+                    order=order,
+                    product_id=product_id,
+                    brand_id=prices[product_id]['brand_id'],
+                    qty=qty,
+                    price=prices[product_id]['final_price'],
+                    selectedOptions=detail,
+                )
+                for _, product_id, detail, qty in valid
+            ])
+            CartLine.objects.filter(id__in=[line_id for line_id, _, _, _ in lines]).delete()
+    except IntegrityError:
+        # همین سبد در درخواست همزمان دیگری ثبت شده است
+        order = Order.objects.filter(idempotencyKey=key).first()
+        if order is None:
+            raise
+        return order, False, []
+    finally:
+        store.invalidate()
+    return order, True, missing
@@ -0,0 +1,102 @@
+# sales_refresh.py
+# بروزرسانی تاخیری داده‌های وابسته به فروش بعد از نهایی شدن سفارش
+#
+# نهایی شدن سفارش در مسیر پرداخت انجام می‌شود؛ به جای محاسبه آمار فروش، ایندکس فیلترها،
+# محصولات مرتبط و لیست پیشنهادی خریدار در همان درخواست، شناسه محصولات و خریداران بعد از
+# commit تراکنش (transaction.on_commit) در بافر worker جمع می‌شوند و هر
+# ORDER_SALES_REFRESH_INTERVAL ثانیه یکجا و در یک thread جدا محاسبه می‌شوند.
+# همه محاسبه‌ها از روی دیتابیس انجام می‌شوند و تکرار آن‌ها بی‌خطر است؛ اگر پردازه قبل از نوشتن
+# بافر از کار بیفتد دستورهای rebuild_product_stats، rebuild_related_products و
+# rebuild_user_recommendations داده‌ها را کامل می‌سازند.
+#
+# در settings:  ORDER_SALES_REFRESH_INTERVAL = 10  (0 یعنی محاسبه فوری بعد از commit)
+import atexit
+import logging
+import threading
+from django.conf import settings
+from django.db import connections, transaction
+from apps.product import facets
+from apps.product.models import ProductStats, RelatedProduct, UserRecommendation
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_interval():
+    return getattr(settings, 'ORDER_SALES_REFRESH_INTERVAL', 10)
+
+
+class SalesRefreshBuffer:
+    """بافر محصولات و خریدارانی که داده‌های فروششان باید دوباره محاسبه شود"""
+
+    def __init__(self):
+        self.product_ids = set()   # آمار فروش و ایندکس فیلترها
+        self.related_ids = set()   # محصولات مرتبط (خرید همزمان)
+        self.user_ids = set()      # لیست پیشنهادی خریدار
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.timer = None
+
+    def add(self, product_ids, related_ids=(), user_ids=()):
+        with self.lock:
+            self.product_ids.update(product_ids)
+            self.related_ids.update(related_ids)
+            self.user_ids.update(user_id for user_id in user_ids if user_id)
+
+        interval = refresh_interval()
+        if not interval:
+            self.flush()
+        else:
+            self._schedule(interval)
+
+    def _schedule(self, interval):
+        with self.lock:
+            if self.timer is not None:
+                return
+            self.timer = threading.Timer(interval, self._flush_from_timer)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def _flush_from_timer(self):
+        with self.lock:
+            self.timer = None
+        try:
+            self.flush()
+        finally:
+            # اتصال دیتابیس این thread بسته می‌شود
+            connections.close_all()
+
+    def flush(self):
+        """محاسبه داده‌های بافر؛ خروجی: تعداد محصولات و خریداران محاسبه شده"""
+        with self.flush_lock:
+            with self.lock:
+                product_ids, related_ids, user_ids = self.product_ids, self.related_ids, self.user_ids
+                self.product_ids, self.related_ids, self.user_ids = set(), set(), set()
+            if not product_ids and not related_ids and not user_ids:
+                return 0
+            try:
+                if product_ids:
+                    ProductStats.refresh_sales(list(product_ids))
+                    facets.refresh_products(list(product_ids))
+                if related_ids:
+                    RelatedProduct.refresh_products(list(related_ids))
+                if user_ids:
+                    UserRecommendation.refresh_users(list(user_ids))
+            except Exception:
+                # خطای این محاسبه‌ها نباید پرداخت یا خروج پردازه را خراب کند
+                logger.exception('Refreshing sales data for %d products failed', len(product_ids | related_ids))
+                return 0
+            return len(product_ids | related_ids) + len(user_ids)
+
+
+_buffer = SalesRefreshBuffer()
+atexit.register(_buffer.flush)
+
+
+def schedule(product_ids, related_ids=(), user_ids=()):
+    """ثبت محاسبه دوباره داده‌های فروش بعد از commit تراکنش جاری"""
+    product_ids, related_ids, user_ids = list(product_ids), list(related_ids), list(user_ids)
+    transaction.on_commit(lambda: _buffer.add(product_ids, related_ids, user_ids))
+
+
+def flush():
+    return _buffer.flush()
@@ -1,86 +1,167 @@
 # shop_cart.py
+#
+# خطوط سبد در CartStore (cache با پشتوانه جدول CartLine) نگه داشته می‌شوند، نه در session.
+# قیمت خطوط سبد در هر درخواست یک بار و با یک کوئری id__in (همراه قیمت نهایی با تخفیف
+# از ProductEffectivePrice) خوانده و روی request نگه داشته می‌شود. آیتم‌ها و جمع کل با هم
+# ساخته می‌شوند و تا تغییر بعدی سبد دوباره محاسبه نمی‌شوند.
+# اگر قیمت نهایی یا درصد تخفیف محصول از زمان افزودن به سبد تغییر کرده باشد، خط سبد با
+# قیمت جدید بروزرسانی و در خروجی با price_changed و previous_price مشخص می‌شود.
+from django.utils import timezone
 from apps.product.models import Product
+from apps.discount.models import ProductEffectivePrice
+from .cart_store import CartStore, line_key
+
+PRICES_ATTR = '_shop_cart_prices'
+
+
+def current_prices(product_ids):
+    """
+    {id محصول: قیمت، قیمت نهایی، درصد تخفیف، نام و تصویر} با یک کوئری؛
+    فقط برای محصولاتی که ردیف قیمت نهایی معتبر ندارند سبدهای تخفیف جدا خوانده می‌شوند.
+    """
+    now = timezone.now()
+    prices = {}
+    expired = []
+    for product in Product.objects.filter(id__in=product_ids).select_related('effective_price'):
+        effective_price = getattr(product, 'effective_price', None)
+        if effective_price is not None and effective_price.is_valid(now):
+            discount, final_price = effective_price.discount, effective_price.final_price
+        else:
+            discount, final_price = 0, product.price
+            expired.append(product.id)
+        prices[product.id] = {
+            'price': final_price,
+            'final_price': final_price,
+            'discount': discount,
+            'list_price': product.price,
+            'brand_id': product.brand_id,
+            'name': product.title,
+            'image': product.image.url if product.image else '',
+        }
+
+    if expired:
+        windows = ProductEffectivePrice.discount_windows(expired)
+        for product_id in expired:
+            price = prices[product_id]
+            discount, final_price, _ = ProductEffectivePrice.calc(price['list_price'], windows.get(product_id, []), now)
+            price.update(price=final_price, final_price=final_price, discount=discount)
+
+    # محصولات حذف شده هم ثبت می‌شوند تا در همین درخواست دوباره جستجو نشوند
+    for product_id in product_ids:
+        prices.setdefault(product_id, None)
+    return prices
+
 
 class ShopCart:
     def __init__(self, request):
-        self.session = request.session
-        temp = self.session.get('shop_cart')
-        if not temp:
-            temp = self.session['shop_cart'] = {}
-        self.shop_cart = temp
-        self.count = len(self.shop_cart.keys())
+        self.request = request
+        self.store = CartStore.for_request(request)
+        self.shop_cart = self.store.lines()
+        self.count = len(self.shop_cart)
+        self._cart = None
 
     def _get_key(self, product_id, detail):
-        return f"{product_id}:{detail}" if detail else str(product_id)
+        return line_key(product_id, detail)
+
+    def _changed(self):
+        self.count = len(self.shop_cart)
+        self._cart = None
 
     def add_to_shop_cart(self, product, qty, list_detail=''):
         key = self._get_key(product.id, list_detail)
+        line = self.shop_cart.get(key)
+        if line is None:
+            self.store.set_line(
+                product.id, list_detail, int(qty), product.get_price_by_discount(), product.get_discount_percentage()
+            )
+        else:
+            self.store.set_line(product.id, list_detail, line['qty'] + int(qty), line['final_price'], line['discount'])
+        self._changed()
 
-        if key not in self.shop_cart:
-            self.shop_cart[key] = {
-                'qty': 0,
-                'price': str(product.get_price_by_discount()),  # تبدیل به string برای اطمینان
-                'brand': product.brand.id if product.brand else None,
-                'detail': list_detail,
-                'final_price': str(product.get_price_by_discount()),  # فعلاً قیمت عادی
-                'product_id': product.id,
-                'product_name': product.title,  # استفاده از title به جای name
-                'product_image': product.image.url if product.image else ''
-            }
-
-        self.shop_cart[key]['qty'] += int(qty)
-        self.session.modified = True
-        self.count = len(self.shop_cart.keys())
+    def update_quantity(self, key, qty):
+        """تغییر تعداد یک خط سبد (صفر یا کمتر یعنی حذف)؛ خروجی: آیا خط در سبد بود"""
+        line = self.shop_cart.get(key)
+        if line is None:
+            return False
+        if qty <= 0:
+            self.store.remove_line(key)
+        else:
+            self.store.set_line(line['product_id'], line['detail'], qty, line['final_price'], line['discount'])
+        self._changed()
+        return True
 
     def delete_from_shop_cart(self, product, list_detail=''):
-        key = self._get_key(product.id, list_detail)
-        if key in self.shop_cart:
-            del self.shop_cart[key]
-        self.count = len(self.shop_cart.keys())
-        self.session.modified = True
+        self.store.remove_line(self._get_key(product.id, list_detail))
+        self._changed()
 
     def delete_all_list(self):
-        self.shop_cart.clear()
-        self.count = 0
-        self.session.modified = True
+        self.store.clear()
+        self._changed()
 
-    def get_cart_items(self):
-        """دریافت آیتم‌های سبد خرید به صورت قابل سریالایز"""
+    def set_cookie(self, response):
+        return self.store.set_cookie(response)
+
+    def _prices(self):
+        """قیمت‌های فعلی محصولات سبد؛ در طول درخواست فقط محصولات جدید خوانده می‌شوند"""
+        prices = getattr(self.request, PRICES_ATTR, None)
+        if prices is None:
+            prices = {}
+            setattr(self.request, PRICES_ATTR, prices)
+        missing = {item['product_id'] for item in self.shop_cart.values()} - prices.keys()
+        if missing:
+            prices.update(current_prices(missing))
+        return prices
+
+    def _build(self):
+        prices = self._prices()
         items = []
-        for key, item in self.shop_cart.items():
-            # اگر اطلاعات محصول کامل نیست، از دیتابیس بگیر
-            if 'product_name' not in item:
-                try:
-                    product = Product.objects.get(id=item.get('product_id', key.split(':')[0]))
-                    item.update({
-                        'product_name': product.title,
-                        'product_image': product.image.url if product.image else '',
-                        'price': str(product.get_price_by_discount()),
-                        'final_price': str(product.get_price_by_discount())
-                    })
-                except Product.DoesNotExist:
-                    continue
+        total = 0
+        price_changed = False
+        for key, item in list(self.shop_cart.items()):
+            product_id = item['product_id']
+            price = prices.get(product_id)
+            if price is None:
+                continue
 
+            previous_price = item['final_price']
+            changed = previous_price != price['final_price'] or item['discount'] != price['discount']
+            if changed:
+                # خط سبد با قیمت فعلی محصول بروزرسانی می‌شود
+                self.store.set_line(product_id, item['detail'], item['qty'], price['final_price'], price['discount'])
+            price_changed = price_changed or changed
+
+            total_price = float(price['final_price']) * item['qty']
+            total += total_price
             items.append({
-                'id': item.get('product_id', key.split(':')[0]),
-                'name': item.get('product_name', ''),
-                'image': item.get('product_image', ''),
-                'price': float(item.get('price', 0)),
-                'final_price': float(item.get('final_price', 0)),
+                'id': product_id,
+                'name': price['name'],
+                'image': price['image'],
+                'price': float(price['price']),
+                'final_price': float(price['final_price']),
+                'discount': price['discount'],
                 'quantity': item['qty'],
-                'total_price': float(item.get('final_price', 0)) * item['qty'],
-                'detail': item.get('detail', ''),
-                'key': key  # کلید یکتا برای مدیریت
+                'total_price': total_price,
+                'detail': item['detail'],
+                'key': key,  # کلید یکتا برای مدیریت
+                'price_changed': changed,
+                'previous_price': float(previous_price) if changed else None,
             })
-        return items
+        return {'items': items, 'total_price': total, 'price_changed': price_changed}
+
+    def get_cart(self):
+        """آیتم‌ها، جمع کل و تغییر قیمت سبد؛ تا تغییر بعدی سبد دوباره محاسبه نمی‌شود"""
+        if self._cart is None:
+            self._cart = self._build()
+        return self._cart
+
+    def get_cart_items(self):
+        """دریافت آیتم‌های سبد خرید به صورت قابل سریالایز"""
+        return self.get_cart()['items']
 
     def calc_total_price(self):
-        total = 0
-        for item in self.get_cart_items():
-            total += item['total_price']
-        return total
+        return self.get_cart()['total_price']
 
     def __iter__(self):
         """برای backward compatibility"""
         for item in self.get_cart_items():
-            yield item
\ No newline at end of file
+            yield item
@@ -0,0 +1,62 @@
+# signals.py
+# بروزرسانی تعداد فروش محصولات (ProductStats) هنگام نهایی شدن سفارش
+# و مرتب‌سازی پرفروش‌ترین‌ها در ایندکس فیلترهای دسته‌بندی، محصولات مرتبط (خرید همزمان) و لیست پیشنهادی خریدار
+# و محاسبه دوباره مبالغ ثابت سفارش با تغییر جزئیات آن
+# (محاسبه داده‌های فروش بعد از commit و خارج از مسیر پرداخت انجام می‌شود؛ sales_refresh.py)
+import threading
+from django.db.models.signals import post_init, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from . import sales_refresh
+from .models import Order, OrderDetail
+
+# سفارش‌هایی که در این thread در حال حذف هستند و جزئیاتشان cascade حذف می‌شوند: {id: isFinally}
+_deleting = threading.local()
+
+
+def deleting_orders():
+    if not hasattr(_deleting, 'orders'):
+        _deleting.orders = {}
+    return _deleting.orders
+
+
+@receiver(post_init, sender=Order)
+def remember_order_state(sender, instance, **kwargs):
+    instance._was_finally = instance.isFinally
+
+
+@receiver(post_save, sender=Order)
+def update_sales_on_finalize(sender, instance, **kwargs):
+    if instance.isFinally != instance._was_finally:
+        product_ids = list(instance.details.values_list('product_id', flat=True))
+        # خرید همزمان فقط بین محصولات همین سفارش تغییر کرده است
+        sales_refresh.schedule(product_ids, related_ids=product_ids, user_ids=[instance.customer_id])
+        instance._was_finally = instance.isFinally
+
+
+@receiver(pre_delete, sender=Order)
+def remember_order_delete(sender, instance, **kwargs):
+    # Django پیش از حذف هر ردیفی pre_delete همه ردیف‌های cascade را می‌فرستد
+    deleting_orders()[instance.id] = instance.isFinally
+
+
+@receiver(post_delete, sender=Order)
+def forget_order_delete(sender, instance, **kwargs):
+    deleting_orders().pop(instance.id, None)
+
+
+@receiver(post_save, sender=OrderDetail)
+@receiver(post_delete, sender=OrderDetail)
+def update_on_detail_change(sender, instance, **kwargs):
+    deleting = deleting_orders()
+    if instance.order_id in deleting:
+        # حذف همراه سفارش: مبالغ سفارش حذف شده محاسبه نمی‌شوند، فقط آمار فروش
+        if deleting[instance.order_id]:
+            sales_refresh.schedule([instance.product_id])
+        return
+    order = Order.objects.filter(id=instance.order_id).first()
+    if order is None:
+        return
+    # مبالغ ثابت فاکتور از روی جزئیات دوباره محاسبه می‌شوند
+    order.recompute_totals()
+    if order.isFinally:
+        sales_refresh.schedule([instance.product_id])
@@ -1,3 +1,268 @@
-from django.test import TestCase
+import json
+from io import StringIO
+from unittest import mock
+from datetime import timedelta
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from apps.product.tests.helpers import make_discount, make_order, make_product, make_user, reset_caches
+import utils
+from .cart_store import CART_COOKIE, CartStore, merge_on_login
+from .models import Cart, CartLine, Order, OrderDetail
+from .placement import RESUBMIT_WINDOW, idempotency_key, place_order
+from .shop_cart import ShopCart
 
-# Create your tests here.
+
+def guest_request(token):
+    request = RequestFactory().get('/')
+    request.COOKIES[CART_COOKIE] = token
+    request.user = AnonymousUser()
+    return request
+
+
+class CartStoreTests(TestCase):
+    def setUp(self):
+        self.printer = make_product('Printer', price=1000)
+        self.toner = make_product('Toner', price=200)
+
+    def test_guest_without_cookie_runs_no_queries(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(CartStore.for_request(guest_request(None)).lines(), {})
+
+    def test_lines_are_read_from_the_database_in_one_query(self):
+        user = make_user()
+        store = CartStore(user_id=user.pk)
+        store.set_line(self.printer.id, '', 1, 1000, 0)
+        store.set_line(self.toner.id, 'رنگ: مشکی', 2, 200, 0)
+
+        # درخواست بعدی در worker دیگری همان خطوط را می‌بیند
+        other = CartStore(user_id=user.pk)
+        with self.assertNumQueries(1):
+            lines = other.lines()
+        self.assertEqual({key: line['qty'] for key, line in lines.items()}, {
+            str(self.printer.id): 1, f'{self.toner.id}:رنگ: مشکی': 2,
+        })
+        self.assertEqual(other.cart_id, store.cart_id)
+
+        other.remove_line(str(self.printer.id))
+        self.assertEqual(list(CartStore(user_id=user.pk).lines()), [f'{self.toner.id}:رنگ: مشکی'])
+
+    def test_empty_cart_keeps_its_token(self):
+        store = CartStore()
+        store.set_line(self.printer.id, '', 1, 1000, 0)
+        store.clear()
+
+        again = CartStore(token=store.token)
+        self.assertEqual(again.lines(), {})
+        again.set_line(self.toner.id, '', 1, 200, 0)
+        self.assertIsNone(again.new_token)
+        self.assertEqual(Cart.objects.count(), 1)
+
+    def test_guest_cart_is_merged_on_login(self):
+        user = make_user()
+        mine = CartStore(user_id=user.pk)
+        mine.set_line(self.printer.id, '', 1, 900, 10)
+        guest = CartStore()
+        guest.set_line(self.printer.id, '', 2, 1000, 0)
+        guest.set_line(self.toner.id, '', 3, 200, 0)
+
+        response = merge_on_login(guest_request(guest.token), user, HttpResponse())
+        lines = CartStore(user_id=user.pk).lines()
+        self.assertEqual(
+            {key: (line['qty'], line['final_price']) for key, line in lines.items()},
+            {str(self.printer.id): (3, 900), str(self.toner.id): (3, 200)},
+        )
+        self.assertFalse(Cart.objects.filter(token=guest.token).exists())
+        self.assertEqual(response.cookies[CART_COOKIE].value, '')
+
+
+class ShopCartPricingTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.printer = make_product('Printer', price=1000)
+        self.toner = make_product('Toner', price=200)
+        # اولین خط سبد مهمان تازه، توکن سبد را می‌سازد
+        self.store = CartStore()
+
+    def add(self, product, qty):
+        self.store.set_line(product.id, '', qty, product.price, 0)
+
+    def cart(self):
+        return ShopCart(guest_request(self.store.token))
+
+    def test_items_and_totals_are_priced_once_per_request(self):
+        self.add(self.printer, 2)
+        self.add(self.toner, 3)
+        cart = self.cart()
+
+        with self.assertNumQueries(1):
+            data = cart.get_cart()
+            cart.get_cart_items()
+            cart.calc_total_price()
+        self.assertEqual(data['total_price'], 2 * 1000 + 3 * 200)
+        self.assertEqual({item['id']: item['quantity'] for item in data['items']}, {self.printer.id: 2, self.toner.id: 3})
+        self.assertFalse(data['price_changed'])
+
+    def test_stale_line_is_repriced_with_the_active_discount(self):
+        self.add(self.printer, 1)
+        make_discount([self.printer], 10)
+
+        data = self.cart().get_cart()
+        item = data['items'][0]
+        self.assertEqual((item['final_price'], item['discount'], item['previous_price']), (900, 10, 1000))
+        self.assertTrue(data['price_changed'])
+        line = CartLine.objects.get(product=self.printer)
+        self.assertEqual((line.final_price, line.discount), (900, 10))
+
+        # قیمت ذخیره شده حالا با قیمت فعلی می‌خواند
+        self.assertFalse(self.cart().get_cart()['price_changed'])
+
+    def test_deleted_products_are_left_out(self):
+        self.add(self.printer, 1)
+        self.add(self.toner, 1)
+        self.toner.delete()
+        data = self.cart().get_cart()
+        self.assertEqual([item['id'] for item in data['items']], [self.printer.id])
+        self.assertEqual(data['total_price'], 1000)
+
+
+class CartEndpointTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.printer = make_product('Printer', price=1000)
+
+    def post(self, name, **data):
+        return self.client.post(reverse(f'order:{name}'), json.dumps(data), content_type='application/json').json()
+
+    def test_add_update_and_remove(self):
+        data = self.post('add_to_cart', product_id=self.printer.id, quantity=1)
+        self.assertTrue(data['success'])
+        self.assertIn(CART_COOKIE, self.client.cookies)
+
+        data = self.post('add_to_cart', product_id=self.printer.id, quantity=2)
+        self.assertEqual((data['cart_count'], data['total_price']), (1, 3000))
+
+        data = self.post('update_cart_quantity', product_id=self.printer.id, quantity=5)
+        self.assertEqual(data['items'][0]['quantity'], 5)
+
+        data = self.post('remove_from_cart', product_id=self.printer.id)
+        self.assertEqual((data['cart_count'], data['total_price']), (0, 0))
+
+
+class PlaceOrderTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.user = make_user()
+        self.printer = make_product('Printer', price=1000)
+        self.store = CartStore(user_id=self.user.pk)
+        self.store.set_line(self.printer.id, '', 2, 1000, 0)
+
+    def test_order_is_placed_once_from_the_cart(self):
+        order, created, missing = place_order(self.user, self.store)
+        self.assertTrue(created)
+        self.assertEqual((order.subtotal, order.cart_id, missing), (2000, self.store.cart_id, []))
+        self.assertFalse(CartLine.objects.exists())
+
+        # ارسال دوباره بعد از commit سبد خالی می‌بیند و همان سفارش را می‌گیرد
+        again = CartStore(user_id=self.user.pk)
+        self.assertEqual(place_order(self.user, again), (order, False, []))
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_same_lines_are_not_placed_twice(self):
+        # درخواست همزمانی که همین خطوط را پیش از حذف ثبت کرده است
+        lines = CartLine.objects.values_list('id', 'product_id', 'detail', 'qty')
+        first = Order.objects.create(customer=self.user, idempotencyKey=idempotency_key(self.store.cart_id, lines))
+        self.assertEqual(place_order(self.user, self.store), (first, False, []))
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_old_or_paid_orders_are_not_returned(self):
+        order, _, _ = place_order(self.user, CartStore(user_id=self.user.pk))
+        Order.objects.filter(pk=order.pk).update(registerDate=timezone.now() - RESUBMIT_WINDOW - timedelta(minutes=1))
+        self.assertEqual(place_order(self.user, CartStore(user_id=self.user.pk)), (None, False, []))
+
+        Order.objects.filter(pk=order.pk).update(registerDate=timezone.now(), isFinally=True)
+        self.assertEqual(place_order(self.user, CartStore(user_id=self.user.pk)), (None, False, []))
+
+
+class CreateOrderViewTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.user = make_user()
+        self.client.force_login(self.user)
+        printer = make_product('Printer', price=1000)
+        CartStore(user_id=self.user.pk).set_line(printer.id, '', 1, 1000, 0)
+
+    def test_double_submit_redirects_to_the_same_checkout(self):
+        first = self.client.get(reverse('order:createOrder'))
+        order = Order.objects.get()
+        self.assertRedirects(first, reverse('order:checkout', args=[order.id]), fetch_redirect_response=False)
+
+        second = self.client.get(reverse('order:createOrder'))
+        self.assertRedirects(second, reverse('order:checkout', args=[order.id]), fetch_redirect_response=False)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_empty_cart_without_recent_order_goes_home(self):
+        CartLine.objects.all().delete()
+        response = self.client.get(reverse('order:createOrder'))
+        self.assertRedirects(response, reverse('main:index'), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderTotalsTests(TestCase):
+    def setUp(self):
+        self.printer = make_product('Printer', price=999)
+        self.toner = make_product('Toner', price=333)
+
+    def test_payable_total_matches_the_gateway_formula(self):
+        order = make_order([(self.printer, 3), (self.toner, 1)], finalize=False)
+        order.refresh_from_db()
+        order.discount = 7
+        order.save()
+        self.assertEqual((order.subtotal, order.discountAmount), (3330, 233))
+        self.assertEqual(order.payableTotal, utils.price_by_delivery_tax(3330, 7)[0])
+        self.assertEqual(order.get_order_total_price(), order.payableTotal * 10)
+
+    def test_detail_changes_recompute_the_totals(self):
+        order = make_order([(self.printer, 1)], finalize=False)
+        detail = OrderDetail.objects.create(order=order, product=self.toner, qty=2, price=333)
+        order.refresh_from_db()
+        self.assertEqual(order.subtotal, 999 + 666)
+        detail.delete()
+        order.refresh_from_db()
+        self.assertEqual(order.subtotal, 999)
+
+    def test_deleting_an_order_does_not_recompute_its_totals(self):
+        order = make_order([(self.printer, 1), (self.toner, 2)])
+        with mock.patch.object(Order, 'recompute_totals') as recompute:
+            order.delete()
+        recompute.assert_not_called()
+        self.assertFalse(OrderDetail.objects.exists())
+
+    def test_recompute_all_runs_a_fixed_number_of_queries(self):
+        def queries():
+            Order.objects.update(subtotal=0, payableTotal=0)
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(Order.recompute_all(), Order.objects.count())
+            return len(context)
+
+        make_order([(self.printer, 1)])
+        make_order([(self.toner, 2)])
+        few = queries()
+        for _ in range(4):
+            make_order([(self.printer, 1), (self.toner, 1)])
+        self.assertEqual(queries(), few)
+        self.assertEqual(Order.inconsistent_totals(), [])
+
+    def test_command_reports_and_fixes_drift(self):
+        order = make_order([(self.printer, 2)])
+        Order.objects.filter(pk=order.pk).update(subtotal=1)
+        out = StringIO()
+        call_command('check_order_totals', '--fix', stdout=out)
+        self.assertIn(str(order.id), out.getvalue())
+        order.refresh_from_db()
+        self.assertEqual(order.subtotal, 1998)
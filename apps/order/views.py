@@ -6,13 +6,25 @@ import json
 from .models import Product
 from django.shortcuts import get_object_or_404,redirect,render
 from .shop_cart import ShopCart
-from .models import Order,OrderDetail
+from .placement import place_order
+from .models import Order,OrderDetail,TAX_RATE
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views import View
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from .models import UserAddress
 
+
+def cart_data(cart):
+    """داده‌های مشترک پاسخ endpointهای سبد خرید (یک بار قیمت‌گذاری سبد)"""
+    data = cart.get_cart()
+    return {
+        'cart_count': cart.count,
+        'total_price': data['total_price'],
+        'items': data['items'],
+        'price_changed': data['price_changed'],
+    }
+
 @require_GET
 def cart_summary(request):
     """نمایش خلاصه سبد خرید"""
@@ -20,9 +32,7 @@ def cart_summary(request):
 
     return JsonResponse({
         'success': True,
-        'cart_count': cart.count,
-        'total_price': cart.calc_total_price(),
-        'items': cart.get_cart_items()  # استفاده از متد جدید
+        **cart_data(cart),
     })
 
 
@@ -30,12 +40,12 @@ def cart_summary(request):
 def cart_page(request):
     """صفحه نمایش سبد خرید"""
     shop_cart = ShopCart(request)
-    cart_items = shop_cart.get_cart_items()
-    total_price = shop_cart.calc_total_price()
+    cart = shop_cart.get_cart()
 
     context = {
-        'cart_items': cart_items,
-        'total_price': total_price,
+        'cart_items': cart['items'],
+        'total_price': cart['total_price'],
+        'price_changed': cart['price_changed'],
         'cart_count': shop_cart.count
     }
 
@@ -52,17 +62,16 @@ def add_to_cart(request):
         quantity = int(data.get('quantity', 1))
         detail = data.get('detail', '')
 
-        product = get_object_or_404(Product, id=product_id)
+        product = get_object_or_404(Product.objects.select_related('effective_price'), id=product_id)
         cart = ShopCart(request)
         cart.add_to_shop_cart(product, quantity, detail)
 
-        return JsonResponse({
+        # اولین محصول سبد مهمان: توکن سبد در کوکی ذخیره می‌شود
+        return cart.set_cookie(JsonResponse({
             'success': True,
-            'cart_count': cart.count,
-            'total_price': cart.calc_total_price(),
-            'items': cart.get_cart_items(),  # استفاده از متد جدید
+            **cart_data(cart),
             'message': 'محصول به سبد خرید اضافه شد'
-        })
+        }))
 
     except Product.DoesNotExist:
         return JsonResponse({
@@ -90,9 +99,7 @@ def remove_from_cart(request):
 
         return JsonResponse({
             'success': True,
-            'cart_count': cart.count,
-            'total_price': cart.calc_total_price(),
-            'items': cart.get_cart_items(),  # استفاده از متد جدید
+            **cart_data(cart),
             'message': 'محصول از سبد خرید حذف شد'
         })
 
@@ -112,24 +119,15 @@ def update_cart_quantity(request):
         quantity = int(data.get('quantity', 1))
         detail = data.get('detail', '')
 
-        product = get_object_or_404(Product, id=product_id)
         cart = ShopCart(request)
 
         # پیدا کردن کلید محصول در سبد خرید
         key = f"{product_id}:{detail}" if detail else str(product_id)
 
-        if key in cart.shop_cart:
-            if quantity <= 0:
-                cart.delete_from_shop_cart(product, detail)
-            else:
-                cart.shop_cart[key]['qty'] = quantity
-                cart.session.modified = True
-
+        if cart.update_quantity(key, quantity):
             return JsonResponse({
                 'success': True,
-                'cart_count': cart.count,
-                'total_price': cart.calc_total_price(),
-                'items': cart.get_cart_items(),  # استفاده از متد جدید
+                **cart_data(cart),
                 'message': 'تعداد محصول به‌روزرسانی شد'
             })
         else:
@@ -189,41 +187,25 @@ class CreateOrderView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
         shop_cart = ShopCart(request)
 
-        # بررسی اینکه سبد خرید خالی نباشد
-        if shop_cart.count == 0:
-            messages.error(request, "سبد خرید شما خالی است.", "danger")
-            return redirect("main:index")
-
         try:
-            order = Order.objects.create(
-                customer=request.user,
-                status="pending",
-            )
-
-            for item in shop_cart.get_cart_items():
-                try:
-                    product = Product.objects.get(id=item['id'])
-
-                    OrderDetail.objects.create(
-                        order=order,
-                        product=product,
-                        brand=product.brand,
-                        qty=item['quantity'],
-                        price=item['price'],
-                        selectedOptions=item.get('detail', '')
-                    )
-
-                except Product.DoesNotExist:
-                    messages.warning(request, f"محصول با شناسه {item['id']} یافت نشد و از سفارش حذف شد.")
-                    continue
-
-            # پاک کردن سبد خرید پس از ایجاد سفارش موفق
-            shop_cart.delete_all_list()
-
-            messages.success(
-                request,
-                f"سفارش شما با کد {order.orderCode} با موفقیت ایجاد شد و در انتظار پرداخت است."
-            )
+            # ثبت سفارش، جزئیات و خالی کردن سبد در یک تراکنش (ارسال دوباره، حتی بعد از خالی شدن
+            # سبد، سفارش قبلی را برمی‌گرداند)
+            order, created, missing = place_order(request.user, shop_cart.store)
+
+            for product_id in missing:
+                messages.warning(request, f"محصول با شناسه {product_id} یافت نشد و از سفارش حذف شد.")
+
+            if order is None:
+                messages.error(request, "سبد خرید شما خالی است.", "danger")
+                return redirect("main:index")
+
+            if created:
+                messages.success(
+                    request,
+                    f"سفارش شما با کد {order.orderCode} با موفقیت ایجاد شد و در انتظار پرداخت است."
+                )
+            else:
+                messages.info(request, f"این سبد خرید قبلاً با کد {order.orderCode} ثبت شده است.")
             return redirect('order:checkout',order.id)
 
         except Exception as e:
@@ -326,15 +308,12 @@ def checkout(request, order_id):
 
 def render_checkout_page(request, order, checkout_data):
     """تابع کمکی برای رندر کردن صفحه چک‌اوت"""
-    tax_rate = 9
-    tax_amount = (order.getFinalPrice() * tax_rate) // 100
-    final_price_with_tax = order.getFinalPrice() + tax_amount
-
+    # مبالغ ثابت ذخیره شده روی سفارش
     context = {
         'order': order,
         'checkout_data': checkout_data,
-        'tax_rate': tax_rate,
-        'tax_amount': tax_amount,
-        'final_price_with_tax': final_price_with_tax,
+        'tax_rate': TAX_RATE,
+        'tax_amount': order.taxAmount,
+        'final_price_with_tax': order.payableTotal,
     }
     return render(request, 'order_app/checkout.html', context)
\ No newline at end of file
@@ -1,3 +1,76 @@
+from datetime import timedelta
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from apps.order.models import Order
+from apps.product.tests.helpers import make_order, make_product, make_user, reset_caches
+from .views import ORDERS_PAGE_SIZE
 
-# Create your tests here.
+
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.printer = make_product('Printer', price=1000)
+        self.toner = make_product('Toner', price=200)
+
+    def test_history_counts_items_newest_first(self):
+        old = make_order([(self.printer, 1)], customer=self.user)
+        Order.objects.filter(pk=old.pk).update(registerDate=timezone.now() - timedelta(days=1))
+        new = make_order([(self.printer, 1), (self.toner, 3)], customer=self.user)
+        make_order([(self.toner, 1)])
+
+        with self.assertNumQueries(1):
+            rows = [(order.id, order.items_count, order.payableTotal) for order in Order.history(self.user)]
+        self.assertEqual(rows, [(new.id, 2, 1744), (old.id, 1, 1090)])
+
+    def test_status_counts_in_one_query(self):
+        make_order([(self.printer, 1)], customer=self.user)
+        canceled = make_order([(self.printer, 1)], customer=self.user)
+        Order.objects.filter(pk=canceled.pk).update(status='canceled')
+
+        with self.assertNumQueries(1):
+            counts = Order.status_counts(self.user)
+        self.assertEqual((counts['all'], counts['pending'], counts['canceled'], counts['delivered']), (2, 1, 1, 0))
+
+
+class OrdersViewTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.user = make_user()
+        self.client.force_login(self.user)
+        self.printer = make_product('Printer', price=1000)
+
+    def get(self, **params):
+        return self.client.get(reverse('panel:orders'), params)
+
+    def test_orders_are_paginated(self):
+        for _ in range(ORDERS_PAGE_SIZE + 2):
+            make_order([(self.printer, 1)], customer=self.user)
+
+        first = self.get()
+        self.assertEqual(len(first.context['orders']), ORDERS_PAGE_SIZE)
+        self.assertEqual(first.context['orders_stats']['all'], ORDERS_PAGE_SIZE + 2)
+        self.assertEqual(len(self.get(page=2).context['orders']), 2)
+
+    def test_status_filter(self):
+        make_order([(self.printer, 1)], customer=self.user)
+        canceled = make_order([(self.printer, 2)], customer=self.user)
+        Order.objects.filter(pk=canceled.pk).update(status='canceled')
+
+        orders = self.get(status='canceled').context['orders']
+        self.assertEqual([(order.id, order.final_price) for order in orders], [(canceled.id, 2180)])
+
+    def test_queries_do_not_grow_with_the_page(self):
+        def queries():
+            with CaptureQueriesContext(connection) as context:
+                self.get()
+            return len(context)
+
+        make_order([(self.printer, 1)], customer=self.user)
+        self.get()
+        one = queries()
+        for _ in range(ORDERS_PAGE_SIZE):
+            make_order([(self.printer, 1)], customer=self.user)
+        self.assertEqual(queries(), one)
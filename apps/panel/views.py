@@ -1,38 +1,41 @@
 from django.shortcuts import render,get_object_or_404,redirect
 from django.contrib.auth.decorators import login_required
 from django.db.models import Count
-from apps.product.models import Product,Category,LikeOrUnlike,Comment
+from apps.product.models import Product,Category,LikeOrUnlike,Comment,UserRecommendation
 from apps.order.models import Order,OrderDetail
+from apps.product.cards import product_card
 import jdatetime
 from django.db.models import Count, Q, Prefetch
+from django.core.paginator import Paginator
+
+ORDERS_PAGE_SIZE = 10
+
+
+def order_rows(orders):
+    """تاریخ شمسی و مبلغ قابل پرداخت (تومان) سفارش‌ها برای نمایش؛ بدون کوئری اضافه برای هر سفارش"""
+    orders = list(orders)
+    for order in orders:
+        order.jalali_date = jdatetime.datetime.fromgregorian(datetime=order.registerDate).strftime("%Y/%m/%d")
+        order.final_price = order.payableTotal
+    return orders
 
 
 @login_required
 def dashboard(request):
     user = request.user
 
-    # محاسبه آمار سفارشات کاربر
-    total_orders = user.orders.count()
-    delivered_orders = user.orders.filter(status='delivered').count()
-    canceled_orders = user.orders.filter(status='canceled').count()
-    returned_orders = user.orders.filter(status='returned').count()
-
-    # آخرین سفارش‌ها
-    latest_orders = user.orders.all().order_by('-registerDate')[:5]
-
-    # فرمت کردن تاریخ به شمسی برای آخرین سفارش‌ها
-    for order in latest_orders:
-        order.jalali_date = jdatetime.datetime.fromgregorian(datetime=order.registerDate).strftime("%Y/%m/%d")
-        order.final_price = order.get_order_total_price()
+    # آمار سفارشات کاربر (یک aggregate) و آخرین سفارش‌ها (یک کوئری)
+    orders_stats = Order.status_counts(user)
+    latest_orders = order_rows(Order.history(user)[:5])
 
     # محصولات پیشنهادی بر اساس خریدهای قبلی
     recommended_products = get_recommended_products_with_ratings(user)
 
     context = {
-        'total_orders': total_orders,
-        'delivered_orders': delivered_orders,
-        'canceled_orders': canceled_orders,
-        'returned_orders': returned_orders,
+        'total_orders': orders_stats['all'],
+        'delivered_orders': orders_stats['delivered'],
+        'canceled_orders': orders_stats['canceled'],
+        'returned_orders': orders_stats['returned'],
         'latest_orders': latest_orders,
         'recommended_products': recommended_products,
         'media_url': '/media/'
@@ -42,100 +45,30 @@ def dashboard(request):
 
 def get_recommended_products_with_ratings(user, limit=10):
     """
-    دریافت محصولات پیشنهادی با محاسبه رتبه‌بندی و رنگ‌ها
+    محصولات پیشنهادی از پیش محاسبه شده کاربر (UserRecommendation) با رتبه‌بندی و رنگ‌ها؛
+    برای کاربری که هنوز لیست پیشنهادی ندارد محصولات پرفروش نمایش داده می‌شوند
     """
-    try:
-        # دریافت محصولاتی که کاربر قبلاً خریده
-        purchased_products = OrderDetail.objects.filter(
-            order__customer=user,
-            order__status='delivered'
-        ).values_list('product', flat=True).distinct()
-
-        if purchased_products:
-            # دریافت دسته‌بندی‌های محصولات خریداری شده
-            purchased_categories = Product.objects.filter(
-                id__in=purchased_products
-            ).values_list('categories', flat=True).distinct()
-
-            # دریافت برندهای محصولات خریداری شده
-            purchased_brands = Product.objects.filter(
-                id__in=purchased_products
-            ).values_list('brand', flat=True).distinct()
-
-            # پیشنهاد محصولات از همان دسته‌بندی‌ها و برندها
-            recommended = Product.objects.filter(
-                Q(categories__in=purchased_categories) | Q(brand__in=purchased_brands),
-                isActive=True
-            ).exclude(
-                id__in=purchased_products
-            ).distinct()[:limit]
-
-            # اگر تعداد کافی نبود، محصولات پرفروش را اضافه کن
-            if recommended.count() < limit:
-                remaining = limit - recommended.count()
-                popular_products = get_popular_products().exclude(
-                    id__in=purchased_products
-                ).exclude(
-                    id__in=recommended.values_list('id', flat=True)
-                )[:remaining]
-                recommended = list(recommended) + list(popular_products)
-
-        else:
-            # اگر کاربر هیچ خریدی نداشته، محصولات پرفروش را نشان بده
-            recommended = get_popular_products()[:limit]
-
-        # محاسبه رتبه‌بندی و ویژگی‌ها برای هر محصول
-        product_list = []
-        for product in recommended:
-            product_data = calculate_product_ratings_and_features(product)
-            product_list.append(product_data)
-
-        return product_list
-
-    except Exception as e:
-        # در صورت بروز خطا، محصولات پرفروش را برگردان
-        popular_products = get_popular_products()[:limit]
-        return [calculate_product_ratings_and_features(product) for product in popular_products]
+    recommended = list(UserRecommendation.products_for(user, limit))
+    if not recommended:
+        recommended = get_popular_products().with_card_data()[:limit]
+    return [calculate_product_ratings_and_features(product) for product in recommended]
 
 def calculate_product_ratings_and_features(product):
     """
     محاسبه رتبه‌بندی و ویژگی‌های محصول
+    (محصول باید از Product.objects.with_card_data() آمده باشد)
     """
-    # محاسبه لایک و دیسلایک
-    likes_count = LikeOrUnlike.objects.filter(product=product, like=True).count()
-    unlikes_count = LikeOrUnlike.objects.filter(product=product, unlike=True).count()
-    total_votes = likes_count + unlikes_count
-
-    # محاسبه تعداد نظرات
-    comments_count = Comment.objects.filter(product=product, isActive=True).count()
-
-    # محاسبه رتبه‌بندی
-    if total_votes > 0:
-        rating = 4 + (likes_count - unlikes_count) / (total_votes * 10)
-        rating = max(3.5, min(rating, 5.0))  # محدود کردن بین 3.5 و 5.0
-    else:
-        rating = 4.0
-
-    # دریافت رنگ‌های محصول
-    colors = product.features_value.filter(feature__title='رنگ').values_list('value', flat=True)
+    product_data = product_card(product)
 
     # اگر رنگ پیدا نشد، از رنگ‌های پیش‌فرض استفاده کن
-    if not colors:
-        colors = ['مشکی', 'سفید', 'نقره‌ای']
+    colors = product_data['colors'] or ['مشکی', 'سفید', 'نقره‌ای']
 
-    return {
-        'product': product,
-        'image_url': product.image.url if product.image else '',
+    product_data.update({
         'short_title': product.title[:50] + '...' if len(product.title) > 50 else product.title,
         'brand': product.brand.title if product.brand else 'بدون برند',
-        'price': product.price,
-        'final_price': product.get_price_by_discount(),
-        'discount_percentage': product.get_discount_percentage(),
-        'colors': list(colors)[:3],  # حداکثر 3 رنگ نشان بده
-        'rating': round(rating, 1),
-        'comments_count': comments_count,
-        'likes_count': likes_count,
-    }
+        'colors': colors[:3],  # حداکثر 3 رنگ نشان بده
+    })
+    return product_data
 
 def get_popular_products():
     """
@@ -143,9 +76,7 @@ def get_popular_products():
     """
     return Product.objects.filter(
         isActive=True
-    ).annotate(
-        order_count=Count('orderItems')
-    ).order_by('-order_count', '-createAt')
+    ).order_by('-stats__total_sold', '-createAt')
 
 
 import jdatetime
@@ -162,8 +93,8 @@ def orders_view(request):
     date_to = request.GET.get('date_to')
     search_query = request.GET.get('search', '')
 
-    # فیلتر کردن سفارشات
-    orders = user.orders.all().order_by('-registerDate')
+    # فیلتر کردن سفارشات (تعداد اقلام با annotate در همان کوئری)
+    orders = Order.history(user)
 
     # فیلتر بر اساس وضعیت
     if status_filter != 'all':
@@ -202,26 +133,16 @@ def orders_view(request):
     if search_query:
         orders = orders.filter(orderCode__icontains=search_query)
 
-    # فرمت کردن تاریخ به شمسی برای نمایش
-    for order in orders:
-        order.jalali_date = jdatetime.datetime.fromgregorian(
-            datetime=order.registerDate
-        ).strftime("%Y/%m/%d")
-        order.final_price = order.get_order_total_price()
-        order.items_count = order.details.count()
-
-    # آمار سفارشات برای فیلترها
-    orders_stats = {
-        'all': user.orders.count(),
-        'pending': user.orders.filter(status='pending').count(),
-        'processing': user.orders.filter(status='processing').count(),
-        'shipped': user.orders.filter(status='shipped').count(),
-        'delivered': user.orders.filter(status='delivered').count(),
-        'canceled': user.orders.filter(status='canceled').count(),
-    }
+    # صفحه‌بندی و فرمت کردن تاریخ به شمسی برای نمایش
+    page_obj = Paginator(orders, ORDERS_PAGE_SIZE).get_page(request.GET.get('page'))
+    page_obj.object_list = order_rows(page_obj.object_list)
+
+    # آمار سفارشات برای فیلترها (یک aggregate)
+    orders_stats = Order.status_counts(user)
 
     context = {
-        'orders': orders,
+        'orders': page_obj,
+        'page_obj': page_obj,
         'orders_stats': orders_stats,
         'current_status': status_filter,
         'search_query': search_query,
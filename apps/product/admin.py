@@ -447,7 +447,7 @@ class ProductFeatureAdmin(admin.ModelAdmin):
 # ========================
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
-    list_display = ("user", "product", "text_short", "rating_stars", "product_type", "get_jalali_date", "isActive")
+    list_display = ("user", "product", "text_short", "rating_stars", "product_type", "likes_count", "unlikes_count", "get_jalali_date", "isActive")
     list_editable = ("isActive",)
     search_fields = ("user__username", "product__title", "text")
     list_filter = ("isActive", "product__isDrive", "product", ("created_at", admin.DateFieldListFilter))
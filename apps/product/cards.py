@@ -0,0 +1,59 @@
+# cards.py
+# ساخت داده کارت محصولات برای لیست‌ها و پاسخ‌های AJAX
+# محصولات باید از Product.objects.with_card_data() آمده باشند تا هیچ کوئری اضافه‌ای اجرا نشود.
+
+
+def calc_vote_rating(likes_count, unlikes_count):
+    """امتیاز کارت بر اساس لایک و دیسلایک (بین 3.5 تا 5)"""
+    total_votes = likes_count + unlikes_count
+    if total_votes > 0:
+        rating = 4 + (likes_count - unlikes_count) / (total_votes * 10)
+        rating = max(3.5, min(rating, 5.0))  # Clamp between 3.5 and 5.0
+    else:
+        rating = 4.0
+    return round(rating, 1)
+
+
+def product_card(product):
+    """دیکشنری کارت محصول برای قالب‌ها"""
+    discount_percentage = product.get_discount_percentage()
+    return {
+        'product': product,
+        'image_url': product.image.url if product.image else '',
+        'short_title': product.title,
+        'brand': product.brand.title if product.brand else '',
+        'price': product.price,
+        'final_price': int(product.price - (product.price * discount_percentage / 100)),
+        'discount_percentage': discount_percentage,
+        'colors': [feature.value for feature in product.color_features],
+        'rating': calc_vote_rating(product.likes_count, product.unlikes_count),
+        'comments_count': product.comments_count,
+        'likes_count': product.likes_count,
+    }
+
+
+def product_card_json(product):
+    """داده کارت محصول برای پاسخ‌های JSON (Load More)"""
+    return {
+        'id': product.id,
+        'title': product.title,
+        'brand': product.brand.title if product.brand else '',
+        'image_url': product.image.url if product.image else '',
+        'price': product.price,
+        'avg_rating': product.avg_rating,
+        'comments_count': product.comments_count,
+        'url': product.get_absolute_url(),
+        'colors': [
+            {'value': feature.filterValue.value}
+            for feature in product.color_features
+            if feature.filterValue
+        ],
+    }
+
+
+def build_product_cards(products):
+    return [product_card(product) for product in products]
+
+
+def build_product_cards_json(products):
+    return [product_card_json(product) for product in products]
@@ -0,0 +1,73 @@
+# comments.py
+# بارگذاری درخت نظرات محصول با دو کوئری و صفحه‌بندی cursor
+#
+# کوئری اول یک صفحه از نظرات سطح اول (مرتب بر اساس created_at و id) و کوئری دوم همه
+# پاسخ‌های فعال همان رشته‌ها (با فیلد root) را می‌گیرد؛ هر دو همراه نام کاربر و
+# شمارنده‌های لایک و دیسلایک. درخت با هر عمقی در حافظه ساخته می‌شود.
+from django.db.models import Q
+from .models import Comment
+from .pagination import encode_cursor, load_cursor, parse_cursor_datetime
+
+COMMENTS_PAGE_SIZE = 5
+COMMENTS_CURSOR = 'comments'
+
+
+def display_name(user):
+    return user.get_full_name() or user.name or user.mobileNumber
+
+
+def _decode(cursor):
+    loaded = load_cursor(cursor)
+    if loaded is None or loaded[0] != COMMENTS_CURSOR:
+        return None
+    created_at = parse_cursor_datetime(loaded[1])
+    return (created_at, loaded[2]) if created_at else None
+
+
+def comment_payload(comment):
+    return {
+        'id': comment.id,
+        'user_name': display_name(comment.user),
+        'text': comment.text,
+        'is_suggest': comment.is_suggest,
+        'created_at': comment.get_jalali_date(),
+        'likes_count': comment.likes_count,
+        'unlikes_count': comment.unlikes_count,
+        'replies': [],
+    }
+
+
+def load_comment_tree(product, cursor=None, limit=COMMENTS_PAGE_SIZE):
+    """
+    یک صفحه از نظرات فعال محصول به همراه درخت پاسخ‌ها.
+    خروجی: (لیست نظرات به شکل دیکشنری، cursor صفحه بعد یا None)
+    """
+    roots = Comment.objects.filter(product=product, parent__isnull=True, isActive=True)
+    key = _decode(cursor)
+    if key is not None:
+        created_at, pk = key
+        roots = roots.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    roots = list(roots.select_related('user').order_by('-created_at', '-id')[:limit + 1])
+
+    next_cursor = None
+    if len(roots) > limit:
+        roots = roots[:limit]
+        next_cursor = encode_cursor(COMMENTS_CURSOR, roots[-1].created_at, roots[-1].id)
+
+    nodes = {comment.id: comment_payload(comment) for comment in roots}
+    if nodes:
+        replies = Comment.objects.filter(root_id__in=nodes, isActive=True).select_related(
+            'user'
+        ).order_by('created_at', 'id')
+        pending = {}
+        for reply in replies:
+            pending.setdefault(reply.parent_id, []).append(comment_payload(reply))
+
+        # اتصال پاسخ‌ها به والد؛ پاسخ‌های زیر یک نظر غیرفعال نمایش داده نمی‌شوند
+        stack = list(nodes.values())
+        while stack:
+            node = stack.pop()
+            node['replies'] = pending.pop(node['id'], [])
+            stack.extend(node['replies'])
+
+    return [nodes[comment.id] for comment in roots], next_cursor
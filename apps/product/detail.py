@@ -0,0 +1,107 @@
+# detail.py
+# ساخت context صفحه جزئیات محصول و درایو در یک مرحله
+#
+# همه داده‌های صفحه (نظرات فعال، گالری، دسته‌ها، ویژگی‌ها، متاتگ و آمار) با یک کوئری
+# و چند prefetch گرفته می‌شوند و امتیاز، تعداد نظرات، پیشنهادها و نمودار امتیازها
+# از همان ردیف‌های prefetch شده محاسبه می‌شود.
+import logging
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import connection
+from django.db.models import Prefetch
+from django.shortcuts import get_object_or_404
+from .models import Product, Comment, ProductFeature
+
+logger = logging.getLogger(__name__)
+
+# حداکثر تعداد کوئری کل پاسخ صفحه جزئیات (get_object، context و رندر قالب):
+# محصول و پنج prefetch (6)، کارت محصولات مرتبط (3) و نسخه و داده قطعه cache شده هدر (2)
+DETAIL_QUERY_BUDGET = 12
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+@contextmanager
+def query_budget(limit, label=''):
+    """
+    شمارش کوئری‌های داخل بلاک؛ در حالت DEBUG عبور از بودجه خطا می‌دهد و در غیر این صورت لاگ می‌شود.
+    (در تست‌ها: with query_budget(DETAIL_QUERY_BUDGET): ...)
+    """
+    executed = []
+
+    def counter(execute, sql, params, many, context):
+        executed.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(counter):
+        yield executed
+
+    if len(executed) > limit:
+        message = f'{label or "block"} ran {len(executed)} queries (budget {limit})'
+        if settings.DEBUG:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+def detail_queryset():
+    """کوئری محصول با همه داده‌های مورد نیاز صفحه جزئیات"""
+    return Product.objects.select_related('brand', 'stats', 'meta_tag').prefetch_related(
+        'categories',
+        'gallery',
+        Prefetch(
+            'comments',
+            queryset=Comment.objects.filter(isActive=True)
+            .select_related('user')
+            .prefetch_related('replies')
+        ),
+        Prefetch(
+            'features_value',
+            queryset=ProductFeature.objects.select_related('feature', 'filterValue')
+        ),
+    )
+
+
+def build_detail_context(product):
+    """امتیاز، نظرات، نمودار امتیاز، ویژگی‌ها و گالری از داده‌های prefetch شده"""
+    comments = product.comments.all()
+    histogram = {rating: 0 for rating in range(5, 0, -1)}
+    suggest_count = 0
+    for comment in comments:
+        histogram[comment.rating] = histogram.get(comment.rating, 0) + 1
+        suggest_count += comment.is_suggest
+
+    comments_count = len(comments)
+    rating_total = sum(rating * count for rating, count in histogram.items())
+    return {
+        'average_rating': round(rating_total / comments_count, 1) if comments_count else 0,
+        'comments_count': comments_count,
+        'suggest_count': suggest_count,
+        'rating_histogram': histogram,
+        'gallery': product.gallery.all(),
+        'features': product.features_value.all(),
+    }
+
+
+class ProductDetailContextMixin:
+    """get_object و context مشترک صفحه جزئیات محصول و درایو با بودجه کوئری"""
+    detail_filters = {'isActive': True}
+    max_queries = DETAIL_QUERY_BUDGET
+
+    def get_object(self, queryset=None):
+        return get_object_or_404(detail_queryset().filter(**self.detail_filters), slug=self.kwargs.get('slug'))
+
+    def get(self, request, *args, **kwargs):
+        # رندر قالب (TemplateResponse تنبل است) هم داخل بودجه انجام می‌شود
+        with query_budget(self.max_queries, self.__class__.__name__):
+            self.object = self.get_object()
+            context = self.get_context_data(object=self.object)
+            return self.render_to_response(context).render()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(build_detail_context(self.object))
+        # محصولات مرتبط همین‌جا گرفته می‌شوند تا در بودجه کوئری حساب شوند
+        context['related_products'] = list(self.object.get_related_products())
+        return context
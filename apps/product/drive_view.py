@@ -3,63 +3,22 @@ from django.views.generic import DetailView
 from django.db.models import Avg, Prefetch
 from django.db.models import Q
 from .models import Product, Comment
-from apps.order.models import OrderDetail
+from .detail import DETAIL_QUERY_BUDGET, ProductDetailContextMixin
 
-class DriveDetailView(DetailView):
+class DriveDetailView(ProductDetailContextMixin, DetailView):
     model = Product
     template_name = 'driver_app/driverDetail.html'
     context_object_name = 'drive'
-
-    def get_object(self, queryset=None):
-        slug = self.kwargs.get('slug')
-        return get_object_or_404(
-            Product.objects.select_related('brand')
-                           .prefetch_related(
-                               'categories',
-                               'gallery',
-                               Prefetch(
-                                   'comments',
-                                   queryset=Comment.objects.filter(isActive=True)
-                                   .select_related('user')
-                                   .prefetch_related('replies')
-                               )
-                           )
-                           .filter(isActive=True, isDrive=True),  # فقط درایوها
-            slug=slug
-        )
+    detail_filters = {'isActive': True, 'isDrive': True}  # فقط درایوها
+    max_queries = DETAIL_QUERY_BUDGET + 1  # جدیدترین درایوهای همان برند
 
     def get_context_data(self, **kwargs):
+        # امتیاز، تعداد نظرات و پیشنهادها، گالری، ویژگی‌ها و درایوهای مرتبط (apps.product.detail)
         context = super().get_context_data(**kwargs)
         drive = self.object
 
-        # محاسبه امتیاز متوسط درایو
-        comments = drive.comments.filter(isActive=True)
-        if comments.exists():
-            avg_rating = comments.aggregate(avg=Avg('rating'))['avg']
-            context['average_rating'] = round(avg_rating, 1)
-        else:
-            context['average_rating'] = 0
-
-        # تعداد نظرات
-        context['comments_count'] = comments.count()
-
-        # تعداد پیشنهادها
-        context['suggest_count'] = comments.filter(is_suggest=True).count()
-
-        # گالری درایو
-        context['gallery'] = drive.gallery.all()
-
-        # درایوهای مرتبط (همان برند)
-        related_drives = Product.objects.filter(
-            brand=drive.brand,
-            isActive=True,
-            isDrive=True
-        ).exclude(id=drive.id).distinct()[:8]
-        context['related_drives'] = related_drives
-
-        # ویژگی‌های درایو
-        features = drive.features_value.select_related('feature', 'filterValue').all()
-        context['features'] = features
+        # درایوهای مرتبط (از پیش محاسبه شده؛ درایوهای همان برند امتیاز بیشتری دارند)
+        context['related_drives'] = context.pop('related_products')
 
         # ========================
         # اضافه کردن متاتگ
@@ -93,11 +52,8 @@ class DriveDetailView(DetailView):
         context['download_link'] = drive.downloadLink
 
         # آمار فروش درایو
-        drive_sales = OrderDetail.objects.filter(
-            product=drive,
-            order__isFinally=True
-        ).count()
-        context['drive_sales'] = drive_sales
+        stats = getattr(drive, 'stats', None)
+        context['drive_sales'] = stats.total_sold if stats else 0
 
         # جدیدترین درایوهای همان برند
         latest_brand_drives = Product.objects.filter(
@@ -105,7 +61,7 @@ class DriveDetailView(DetailView):
             isActive=True,
             isDrive=True
         ).exclude(id=drive.id).order_by('-createAt')[:4]
-        context['latest_brand_drives'] = latest_brand_drives
+        context['latest_brand_drives'] = list(latest_brand_drives)
 
         return context
 
@@ -159,7 +115,7 @@ class NewestDrivesView(ListView):
         return Product.objects.filter(
             isDrive=True,
             isActive=True
-        ).select_related('brand').prefetch_related('categories').order_by('-createAt')
+        ).with_card_data().prefetch_related('categories').order_by('-createAt')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -180,9 +136,7 @@ class BestSellingDrivesView(ListView):
         return Product.objects.filter(
             isDrive=True,
             isActive=True
-        ).annotate(
-            total_sold=Count('orderItems')
-        ).select_related('brand').prefetch_related('categories').order_by('-total_sold', '-createAt')
+        ).with_card_data().prefetch_related('categories').order_by('-stats__total_sold', '-createAt')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
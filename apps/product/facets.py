@@ -0,0 +1,298 @@
+# facets.py
+# ایندکس فیلترهای صفحه دسته‌بندی در حافظه (bitset)
+#
+# در هر دسته‌بندی به هر محصول یک شماره (bit) داده می‌شود و برای هر مقدار ویژگی،
+# هر برند و هر بازه قیمت یک عدد صحیح پایتون به عنوان bitset نگه داشته می‌شود.
+# فیلتر، مرتب‌سازی و شمارش مقادیر فیلترها با & و | روی همین bitsetها انجام می‌شود
+# و دیتابیس فقط برای ساخت ایندکس و گرفتن محصولات همان صفحه استفاده می‌شود.
+#
+# ایندکس در حافظه هر worker نگه داشته می‌شود. سیگنال‌ها ایندکس همان worker را
+# به صورت جزئی بروزرسانی می‌کنند و نسخه دسته را در دیتابیس (main.CacheVersion) بالا
+# می‌برند؛ بقیه workerها با دیدن نسخه جدید ایندکس خود را در درخواست بعدی از نو می‌سازند.
+#
+# ایندکس هر دسته شامل محصولات همه زیردسته‌های آن (زیردرخت path) است.
+import threading
+from django.db.models import F
+from django.utils import timezone
+from apps.main.models import CacheVersion
+from .models import Category, Product, ProductFeature
+from .pagination import SORT_FIELDS, normalize_sort
+
+PRICE_BUCKET_SIZE = 1_000_000
+VERSION_KEY = 'facet_index:{}'
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def bit_count(bits):
+    return bin(bits).count('1')
+
+
+def iter_bits(bits):
+    """شماره bitهای روشن به ترتیب صعودی"""
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+class CategoryFacetIndex:
+    """ایندکس bitset محصولات یک دسته‌بندی"""
+
+    def __init__(self, category_id, path, version):
+        self.category_id = category_id
+        self.path = path
+        self.version = version
+        self.rows = []             # داده مرتب‌سازی محصولات به ترتیب شماره bit
+        self.positions = {}        # product_id -> شماره bit
+        self.active = 0            # bitset محصولات فعال
+        self.by_value = {}         # feature_value_id -> bitset
+        self.by_brand = {}         # brand_id -> bitset
+        self.by_price_bucket = {}  # شماره بازه قیمت -> bitset
+        self.valid_until = {}      # product_id -> زمان تغییر بعدی قیمت تخفیف‌دار
+        self.lock = threading.RLock()
+
+    # ---------------------- ساخت و بروزرسانی ----------------------
+
+    @staticmethod
+    def _load(path, product_ids=None):
+        products = Product.objects.filter(categories__path__startswith=path).distinct()
+        values = ProductFeature.objects.filter(product__categories__path__startswith=path, filterValue__isnull=False)
+        if product_ids is not None:
+            products = products.filter(id__in=product_ids)
+            values = values.filter(product_id__in=product_ids)
+
+        rows = products.with_final_price().annotate(
+            total_sold=F('stats__total_sold'),
+            price_valid_until=F('effective_price__valid_until'),
+        ).values('id', 'isActive', 'brand_id', 'price', 'final_price', 'total_sold', 'createAt', 'price_valid_until')
+
+        feature_values = {}
+        for product_id, value_id in values.values_list('product_id', 'filterValue_id'):
+            feature_values.setdefault(product_id, set()).add(value_id)
+        return rows, feature_values
+
+    @classmethod
+    def build(cls, category, version):
+        index = cls(category.id, category.path, version)
+        rows, feature_values = cls._load(category.path)
+        for row in rows:
+            index._set_product(row, feature_values.get(row['id'], ()))
+        return index
+
+    def update_products(self, product_ids):
+        """بروزرسانی جزئی چند محصول (حذف از دسته، غیرفعال شدن، تغییر قیمت یا ویژگی)"""
+        rows, feature_values = self._load(self.path, product_ids)
+        with self.lock:
+            seen = set()
+            for row in rows:
+                seen.add(row['id'])
+                self._set_product(row, feature_values.get(row['id'], ()))
+            for product_id in set(product_ids) - seen:
+                self._remove_product(product_id)
+
+    def _set_product(self, row, value_ids):
+        product_id = row['id']
+        position = self.positions.get(product_id)
+        if position is None:
+            position = len(self.rows)
+            self.positions[product_id] = position
+            self.rows.append(None)
+        else:
+            self._clear_position(position)
+
+        self.rows[position] = {
+            'id': product_id,
+            'price': row['price'],
+            'final_price': row['final_price'],
+            'total_sold': row['total_sold'] or 0,
+            'createAt': row['createAt'],
+        }
+        if row['price_valid_until']:
+            self.valid_until[product_id] = row['price_valid_until']
+        else:
+            self.valid_until.pop(product_id, None)
+
+        if not row['isActive']:
+            return
+
+        bit = 1 << position
+        self.active |= bit
+        for value_id in value_ids:
+            self.by_value[value_id] = self.by_value.get(value_id, 0) | bit
+        self.by_brand[row['brand_id']] = self.by_brand.get(row['brand_id'], 0) | bit
+        bucket = row['final_price'] // PRICE_BUCKET_SIZE
+        self.by_price_bucket[bucket] = self.by_price_bucket.get(bucket, 0) | bit
+
+    def _remove_product(self, product_id):
+        position = self.positions.get(product_id)
+        if position is not None:
+            self._clear_position(position)
+        self.valid_until.pop(product_id, None)
+
+    def _clear_position(self, position):
+        mask = ~(1 << position)
+        self.active &= mask
+        for bitsets in (self.by_value, self.by_brand, self.by_price_bucket):
+            for key in [key for key, bits in bitsets.items() if bits >> position & 1]:
+                bitsets[key] &= mask
+                if not bitsets[key]:
+                    del bitsets[key]
+
+    def is_expired(self, now=None):
+        """اگر بازه تخفیف یکی از محصولات شروع یا تمام شده باشد، قیمت‌های ایندکس کهنه است"""
+        if not self.valid_until:
+            return False
+        return min(self.valid_until.values()) <= (now or timezone.now())
+
+    # ---------------------- جستجو ----------------------
+
+    def _union(self, bitsets, keys):
+        bits = 0
+        for key in keys:
+            bits |= bitsets.get(key, 0)
+        return bits
+
+    def _price_mask(self, mask, price_min, price_max):
+        """محدوده قیمت نهایی؛ بازه‌های کامل یکجا و بازه‌های مرزی محصول به محصول بررسی می‌شوند"""
+        low = price_min // PRICE_BUCKET_SIZE if price_min is not None else None
+        high = price_max // PRICE_BUCKET_SIZE if price_max is not None else None
+        result = 0
+        for bucket, bits in self.by_price_bucket.items():
+            if (low is not None and bucket < low) or (high is not None and bucket > high):
+                continue
+            if bucket != low and bucket != high:
+                result |= bits
+                continue
+            for position in iter_bits(bits & mask):
+                price = self.rows[position]['final_price']
+                if (price_min is None or price >= price_min) and (price_max is None or price <= price_max):
+                    result |= 1 << position
+        return mask & result
+
+    def filter(self, value_ids=(), brand_ids=(), price_min=None, price_max=None, max_base_price=None):
+        """
+        bitset محصولات مطابق فیلترها.
+        مقادیر ویژگی‌ها با منطق OR و برندها با منطق OR اعمال می‌شوند.
+        """
+        with self.lock:
+            mask = self.active
+            if value_ids:
+                mask &= self._union(self.by_value, value_ids)
+            if brand_ids:
+                mask &= self._union(self.by_brand, brand_ids)
+            if price_min is not None or price_max is not None:
+                mask = self._price_mask(mask, price_min, price_max)
+            if max_base_price is not None:
+                for position in iter_bits(mask):
+                    if self.rows[position]['price'] > max_base_price:
+                        mask &= ~(1 << position)
+            return mask
+
+    def sorted_rows(self, mask, sort=None):
+        field, descending = SORT_FIELDS[normalize_sort(sort)]
+        with self.lock:
+            rows = [self.rows[position] for position in iter_bits(mask)]
+        rows.sort(key=lambda row: (row[field], row['id']), reverse=descending)
+        return rows
+
+    def sorted_ids(self, mask, sort=None):
+        return [row['id'] for row in self.sorted_rows(mask, sort)]
+
+    def rows_after(self, mask, sort, key=None, limit=None):
+        """
+        ردیف‌های مرتب شده بعد از کلید (مقدار، id) cursor
+        (اگر محصول cursor حذف شده باشد هم ادامه لیست درست پیدا می‌شود)
+        """
+        sort = normalize_sort(sort)
+        field, descending = SORT_FIELDS[sort]
+        rows = self.sorted_rows(mask, sort)
+        if key is not None:
+            if descending:
+                rows = [row for row in rows if (row[field], row['id']) < key]
+            else:
+                rows = [row for row in rows if (row[field], row['id']) > key]
+        return rows if limit is None else rows[:limit]
+
+    def value_counts(self, mask):
+        """تعداد محصولات هر مقدار ویژگی در میان محصولات فیلتر شده"""
+        with self.lock:
+            counts = {}
+            for value_id, bits in self.by_value.items():
+                count = bit_count(bits & mask)
+                if count:
+                    counts[value_id] = count
+            return counts
+
+    def price_range(self):
+        """کمترین و بیشترین قیمت نهایی محصولات فعال دسته"""
+        with self.lock:
+            prices = [self.rows[position]['final_price'] for position in iter_bits(self.active)]
+        return {
+            'max_price': max(prices) if prices else None,
+            'min_price': min(prices) if prices else None,
+        }
+
+
+def _version(category_id):
+    return CacheVersion.get(VERSION_KEY.format(category_id))
+
+
+def _bump_versions(category_ids):
+    """{id دسته: نسخه جدید}"""
+    versions = CacheVersion.bump_many(VERSION_KEY.format(category_id) for category_id in category_ids)
+    return {category_id: versions[VERSION_KEY.format(category_id)] for category_id in category_ids}
+
+
+def get_category_index(category):
+    """ایندکس دسته‌بندی؛ در صورت نبود، کهنه بودن نسخه یا گذشتن بازه تخفیف از نو ساخته می‌شود"""
+    version = _version(category.id)
+    index = _indexes.get(category.id)
+    if index is None or index.version != version or index.is_expired():
+        with _lock:
+            index = _indexes.get(category.id)
+            if index is None or index.version != version or index.is_expired():
+                index = CategoryFacetIndex.build(category, version)
+                _indexes[category.id] = index
+    return index
+
+
+def _with_ancestors(category_ids):
+    """دسته‌ها به همراه همه اجدادشان (ایندکس اجداد هم شامل محصولات این دسته‌هاست)"""
+    paths = Category.objects.filter(id__in=list(category_ids)).values_list('path', flat=True)
+    ids = set(category_ids)
+    for path in paths:
+        ids.update(Category.path_ids(path))
+    return ids
+
+
+def invalidate_categories(category_ids):
+    """ساخت دوباره ایندکس دسته‌ها در درخواست بعدی (مثلا بعد از جابجایی در درخت)"""
+    category_ids = set(category_ids)
+    _bump_versions(category_ids)
+    for category_id in category_ids:
+        _indexes.pop(category_id, None)
+
+
+def refresh_products(product_ids, category_ids=None):
+    """
+    بروزرسانی ایندکس دسته‌بندی‌های محصولات داده شده
+    (category_ids برای وقتی است که محصول از یک دسته‌بندی حذف شده باشد)
+    """
+    product_ids = list(product_ids)
+    if category_ids is None:
+        category_ids = Product.categories.through.objects.filter(
+            product_id__in=product_ids
+        ).values_list('category_id', flat=True).distinct()
+
+    for category_id, version in _bump_versions(_with_ancestors(category_ids)).items():
+        index = _indexes.get(category_id)
+        if index is None:
+            continue
+        if index.version == version - 1:
+            index.update_products(product_ids)
+            index.version = version
+        else:
+            # ایندکس تغییرات worker دیگری را ندیده است؛ در درخواست بعدی از نو ساخته می‌شود
+            _indexes.pop(category_id, None)
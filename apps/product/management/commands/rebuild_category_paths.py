@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from apps.product import facets
+from apps.product.models import Category
+
+
+class Command(BaseCommand):
+    help = 'ساخت دوباره مسیر درخت دسته‌بندی‌ها (path و depth) از روی فیلد parent'
+
+    def handle(self, *args, **options):
+        count = Category.rebuild_paths()
+        facets.invalidate_categories(Category.objects.values_list('id', flat=True))
+        self.stdout.write(self.style.SUCCESS(f'مسیر {count} دسته‌بندی بروزرسانی شد'))
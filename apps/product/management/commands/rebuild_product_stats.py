@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from apps.product.models import ProductStats
+
+
+class Command(BaseCommand):
+    help = 'ساخت دوباره جدول آمار محصولات (امتیاز، لایک، نظرات و فروش) از روی داده‌های اصلی'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = ProductStats.rebuild_all(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'آمار {count} محصول بازسازی شد'))
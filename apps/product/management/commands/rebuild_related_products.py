@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from apps.product.models import RelatedProduct
+
+
+class Command(BaseCommand):
+    help = 'ساخت دوباره جدول محصولات مرتبط (دسته، ویژگی و خرید همزمان)؛ برای اجرای دوره‌ای با cron'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        count = RelatedProduct.rebuild_all(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'محصولات مرتبط {count} محصول بازسازی شد'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from apps.product.models import RelatedProduct, UserRecommendation
+
+
+class Command(BaseCommand):
+    help = 'ساخت دوباره لیست پیشنهادی کاربران از محصولات مرتبط، خریدهای نهایی و علاقه‌مندی‌ها؛ برای اجرای دوره‌ای با cron'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--with-related', action='store_true', help='ابتدا جدول محصولات مرتبط هم بازسازی شود')
+
+    def handle(self, *args, **options):
+        if options['with_related']:
+            count = RelatedProduct.rebuild_all()
+            self.stdout.write(f'محصولات مرتبط {count} محصول بازسازی شد')
+        count = UserRecommendation.rebuild_all(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'لیست پیشنهادی {count} کاربر بازسازی شد'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from apps.product.models import Comment
+
+
+class Command(BaseCommand):
+    help = 'اصلاح شمارنده‌های لایک و دیسلایک نظرات از روی جدول LikeOrUnlike'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = Comment.rebuild_vote_counts(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'شمارنده {count} نظر اصلاح شد'))
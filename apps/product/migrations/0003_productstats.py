@@ -0,0 +1,78 @@
+# Generated by Django 4.0.3 on 2026-10-18 10:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Avg, Count, Q, Sum
+
+
+def fill_product_stats(apps, schema_editor):
+    # مثل ProductStats.rebuild_all، با مدل‌های تاریخی
+    Product = apps.get_model('product', 'Product')
+    Comment = apps.get_model('product', 'Comment')
+    LikeOrUnlike = apps.get_model('product', 'LikeOrUnlike')
+    OrderDetail = apps.get_model('order', 'OrderDetail')
+    ProductStats = apps.get_model('product', 'ProductStats')
+
+    reviews = {
+        row['product']: row
+        for row in Comment.objects.filter(isActive=True).values('product').annotate(
+            avg=Avg('rating'), count=Count('id')
+        ).order_by()
+    }
+    votes = {
+        row['product']: row
+        for row in LikeOrUnlike.objects.values('product').annotate(
+            likes=Count('id', filter=Q(like=True)),
+            unlikes=Count('id', filter=Q(unlike=True)),
+        ).order_by()
+    }
+    sales = dict(
+        OrderDetail.objects.filter(order__isFinally=True).values('product').annotate(
+            sold=Sum('qty')
+        ).order_by().values_list('product', 'sold')
+    )
+
+    stats = []
+    for product_id in Product.objects.values_list('id', flat=True).iterator():
+        review = reviews.get(product_id, {})
+        vote = votes.get(product_id, {})
+        stats.append(ProductStats(
+            product_id=product_id,
+            avg_rating=round(review.get('avg') or 0, 1),
+            rating_count=review.get('count', 0),
+            comment_count=review.get('count', 0),
+            likes=vote.get('likes', 0),
+            unlikes=vote.get('unlikes', 0),
+            total_sold=sales.get(product_id) or 0,
+        ))
+    ProductStats.objects.bulk_create(stats, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0002_initial'),
+        ('order', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('avg_rating', models.FloatField(db_index=True, default=0, verbose_name='میانگین امتیاز')),
+                ('rating_count', models.PositiveIntegerField(default=0, verbose_name='تعداد امتیازها')),
+                ('likes', models.PositiveIntegerField(default=0, verbose_name='تعداد لایک')),
+                ('unlikes', models.PositiveIntegerField(default=0, verbose_name='تعداد دیسلایک')),
+                ('comment_count', models.PositiveIntegerField(default=0, verbose_name='تعداد نظرات فعال')),
+                ('total_sold', models.PositiveIntegerField(db_index=True, default=0, verbose_name='تعداد فروش')),
+                ('updateAt', models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='product.product', verbose_name='محصول')),
+            ],
+            options={
+                'verbose_name': 'آمار محصول',
+                'verbose_name_plural': 'آمار محصولات',
+            },
+        ),
+        migrations.RunPython(fill_product_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.0.3 on 2026-10-18 10:38
+
+from django.db import migrations, models
+
+
+def build_category_paths(apps, schema_editor):
+    Category = apps.get_model('product', 'Category')
+    categories = list(Category.objects.only('id', 'parent_id'))
+    by_parent = {}
+    for category in categories:
+        by_parent.setdefault(category.parent_id, []).append(category)
+
+    stack = [(category, '', 0) for category in by_parent.get(None, [])]
+    while stack:
+        category, parent_path, depth = stack.pop()
+        category.path = f'{parent_path}{category.id:08d}/'
+        category.depth = depth
+        stack.extend((child, category.path, depth + 1) for child in by_parent.get(category.id, []))
+
+    Category.objects.bulk_update(categories, ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0003_productstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='عمق'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255, verbose_name='مسیر درخت'),
+        ),
+        migrations.RunPython(build_category_paths, migrations.RunPython.noop),
+    ]
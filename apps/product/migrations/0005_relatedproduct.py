@@ -0,0 +1,37 @@
+# Generated by Django 4.0.3 on 2026-10-18 10:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0004_category_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(default=0, verbose_name='امتیاز')),
+                ('co_purchases', models.PositiveIntegerField(default=0, verbose_name='تعداد خرید همزمان')),
+                ('updateAt', models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_items', to='product.product', verbose_name='محصول')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_to', to='product.product', verbose_name='محصول مرتبط')),
+            ],
+            options={
+                'verbose_name': 'محصول مرتبط',
+                'verbose_name_plural': 'محصولات مرتبط',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='relatedproduct',
+            index=models.Index(fields=['product', '-score'], name='product_rel_product_4e7721_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='relatedproduct',
+            unique_together={('product', 'related')},
+        ),
+    ]
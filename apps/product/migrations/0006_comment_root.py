@@ -0,0 +1,39 @@
+# Generated by Django 4.0.3 on 2026-10-18 10:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def set_comment_roots(apps, schema_editor):
+    Comment = apps.get_model('product', 'Comment')
+    parents = dict(Comment.objects.values_list('id', 'parent_id'))
+    roots = {}
+    for comment_id, parent_id in parents.items():
+        root_id, seen = parent_id, {comment_id}
+        while root_id and parents.get(root_id) and root_id not in seen:
+            seen.add(root_id)
+            root_id = parents[root_id]
+        if root_id:
+            roots.setdefault(root_id, []).append(comment_id)
+    for root_id, comment_ids in roots.items():
+        Comment.objects.filter(id__in=comment_ids).update(root_id=root_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0005_relatedproduct'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='root',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='thread', to='product.comment', verbose_name='نظر ریشه'),
+        ),
+        migrations.RunPython(set_comment_roots, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['product', 'parent', '-created_at', '-id'], name='product_com_product_76cd05_idx'),
+        ),
+    ]
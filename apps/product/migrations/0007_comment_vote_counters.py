@@ -0,0 +1,50 @@
+# Generated by Django 4.0.3 on 2026-10-18 10:44
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def dedupe_votes_and_fill_counters(apps, schema_editor):
+    LikeOrUnlike = apps.get_model('product', 'LikeOrUnlike')
+    Comment = apps.get_model('product', 'Comment')
+
+    # از واکنش‌های تکراری یک کاربر روی یک نظر فقط آخرین ردیف می‌ماند
+    duplicates = LikeOrUnlike.objects.values('user', 'comment').annotate(
+        count=Count('id'), last_id=Max('id')
+    ).filter(count__gt=1).order_by()
+    for row in duplicates:
+        LikeOrUnlike.objects.filter(user=row['user'], comment=row['comment']).exclude(id=row['last_id']).delete()
+
+    votes = LikeOrUnlike.objects.values('comment').annotate(
+        likes=Count('id', filter=Q(like=True)),
+        unlikes=Count('id', filter=Q(unlike=True)),
+    ).order_by()
+    for row in votes:
+        Comment.objects.filter(id=row['comment']).update(likes_count=row['likes'], unlikes_count=row['unlikes'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('product', '0006_comment_root'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد لایک'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='unlikes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='تعداد دیسلایک'),
+        ),
+        migrations.RunPython(dedupe_votes_and_fill_counters, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='likeorunlike',
+            unique_together={('user', 'comment')},
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.0.3 on 2026-10-18 11:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('product', '0007_comment_vote_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(default=0, verbose_name='رتبه')),
+                ('score', models.FloatField(default=0, verbose_name='امتیاز')),
+                ('updateAt', models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_for', to='product.product', verbose_name='محصول')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to=settings.AUTH_USER_MODEL, verbose_name='کاربر')),
+            ],
+            options={
+                'verbose_name': 'پیشنهاد کاربر',
+                'verbose_name_plural': 'پیشنهادهای کاربر',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='userrecommendation',
+            index=models.Index(fields=['user', 'rank'], name='product_use_user_id_9fc779_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='userrecommendation',
+            unique_together={('user', 'product')},
+        ),
+    ]
@@ -1,9 +1,14 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Avg, Case, Count, F, Prefetch, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Concat, Substr
+from django.core.cache import cache
+from django.dispatch import Signal
 from django.utils import timezone
 from ckeditor_uploader.fields import RichTextUploadingField
 from django.utils.html import strip_tags
 from django.urls import reverse
 import jdatetime
+from apps.main.models import CacheVersion
 from apps.user.models import CustomUser
 import utils
 
@@ -45,6 +50,15 @@ class Brand(Base):
 # ========================
 # دسته‌بندی محصول
 # ========================
+CATEGORY_PATH_STEP = 8
+CATEGORY_COUNTS_CACHE_KEY = 'category_subtree_product_counts:{}'
+CATEGORY_COUNTS_VERSION_KEY = 'category_counts'
+CATEGORY_COUNTS_TTL = 60 * 60
+
+# بعد از تغییر مسیر یک دسته (ساخت یا جابجایی)؛ affected_ids اجداد قدیم و جدید هستند
+category_tree_changed = Signal()
+
+
 class Category(Base):
     parent = models.ForeignKey(
         "self", verbose_name="والد", related_name="children",
@@ -55,6 +69,9 @@ class Category(Base):
     )
     fileupload = utils.FileUpload('images', 'categoryFile')
     image = models.ImageField(upload_to=fileupload.upload_to, verbose_name="تصویر", blank=True, null=True)
+    # مسیر درخت (شناسه اجداد و خود دسته، مثل 00000001/00000004/) برای کوئری زیردرخت و اجداد با یک LIKE
+    path = models.CharField(max_length=255, db_index=True, blank=True, editable=False, verbose_name="مسیر درخت")
+    depth = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name="عمق")
 
     class Meta:
         verbose_name = "دسته‌بندی محصول"
@@ -69,6 +86,127 @@ class Category(Base):
     def get_absolute_url(self):
         return reverse("product:shop", kwargs={"slug": self.slug})
 
+    # ---------------------- درخت دسته‌بندی (materialized path) ----------------------
+
+    @staticmethod
+    def path_segment(category_id):
+        return f'{category_id:0{CATEGORY_PATH_STEP}d}/'
+
+    @staticmethod
+    def path_ids(path):
+        """شناسه دسته‌ها در یک مسیر، از ریشه تا خود دسته"""
+        return [int(segment) for segment in path.split('/') if segment]
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        if self.pk and self.parent_id and self.parent.path.startswith(self.path or self.path_segment(self.pk)):
+            raise ValidationError({'parent': 'دسته‌بندی نمی‌تواند زیرمجموعه خودش یا فرزندانش باشد.'})
+
+    def save(self, *args, **kwargs):
+        # دور در درخت قبل از نوشتن والد جدید رد می‌شود تا والد نامعتبر در دیتابیس ثبت نشود
+        parent_path = self._parent_path()
+        if self.pk and parent_path.startswith(self.path or self.path_segment(self.pk)):
+            raise ValueError('Category cannot be moved under its own subtree')
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self._update_path(parent_path)
+
+    def _parent_path(self):
+        """مسیر فعلی والد از دیتابیس (نمونه parent در حافظه ممکن است قدیمی باشد)"""
+        if not self.parent_id:
+            return ''
+        return Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or ''
+
+    def _update_path(self, parent_path):
+        """ساخت مسیر دسته و جابجایی مسیر همه نوادگان در صورت تغییر والد"""
+        new_path = parent_path + self.path_segment(self.pk)
+        if new_path == self.path:
+            return
+
+        old_path, old_depth = self.path, self.depth
+        new_depth = len(self.path_ids(new_path)) - 1
+        Category.objects.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+        if old_path:
+            Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+                depth=F('depth') + (new_depth - old_depth),
+            )
+        self.path, self.depth = new_path, new_depth
+        category_tree_changed.send(
+            sender=Category, instance=self,
+            affected_ids=set(self.path_ids(old_path)) | set(self.path_ids(new_path)),
+        )
+
+    def get_descendants(self, include_self=False):
+        """همه نوادگان دسته با یک کوئری روی ایندکس path"""
+        categories = Category.objects.filter(path__startswith=self.path)
+        if not include_self:
+            categories = categories.exclude(pk=self.pk)
+        return categories
+
+    def get_ancestors(self, include_self=False):
+        """اجداد دسته از ریشه تا والد (برای breadcrumb) با یک کوئری"""
+        ids = self.path_ids(self.path)
+        if not include_self:
+            ids = ids[:-1]
+        return Category.objects.filter(id__in=ids).order_by('depth')
+
+    def subtree_products(self):
+        """محصولات این دسته و همه زیردسته‌ها"""
+        return Product.objects.filter(categories__path__startswith=self.path).distinct()
+
+    @property
+    def subtree_product_count(self):
+        return Category.subtree_product_counts().get(self.pk, 0)
+
+    @classmethod
+    def subtree_product_counts(cls):
+        """
+        تعداد محصولات فعال زیردرخت هر دسته (cache شده).
+        نسخه در main.CacheVersion جزو کلید است و سیگنال‌ها با تغییر محصولات یا درخت دسته‌ها
+        آن را بالا می‌برند تا همه workerها در درخواست بعدی دوباره محاسبه کنند.
+        """
+        key = CATEGORY_COUNTS_CACHE_KEY.format(CacheVersion.get(CATEGORY_COUNTS_VERSION_KEY))
+        counts = cache.get(key)
+        if counts is None:
+            subtree_products = {}
+            links = Product.categories.through.objects.filter(
+                product__isActive=True
+            ).values_list('product_id', 'category__path')
+            for product_id, path in links:
+                for category_id in cls.path_ids(path):
+                    subtree_products.setdefault(category_id, set()).add(product_id)
+            counts = {category_id: len(ids) for category_id, ids in subtree_products.items()}
+            cache.set(key, counts, CATEGORY_COUNTS_TTL)
+        return counts
+
+    @classmethod
+    def invalidate_subtree_counts(cls):
+        CacheVersion.bump(CATEGORY_COUNTS_VERSION_KEY)
+
+    @classmethod
+    def rebuild_paths(cls):
+        """ساخت دوباره مسیر همه دسته‌ها (بعد از ورود داده با bulk یا update)"""
+        categories = list(cls.objects.only('id', 'parent_id', 'path', 'depth'))
+        by_parent = {}
+        for category in categories:
+            by_parent.setdefault(category.parent_id, []).append(category)
+
+        changed = []
+        stack = [(category, '') for category in by_parent.get(None, [])]
+        while stack:
+            category, parent_path = stack.pop()
+            path = parent_path + cls.path_segment(category.id)
+            depth = len(cls.path_ids(path)) - 1
+            if (category.path, category.depth) != (path, depth):
+                category.path, category.depth = path, depth
+                changed.append(category)
+            stack.extend((child, path) for child in by_parent.get(category.id, []))
+
+        cls.objects.bulk_update(changed, ['path', 'depth'], batch_size=500)
+        cls.invalidate_subtree_counts()
+        return len(changed)
+
 
 # ========================
 # ویژگی محصول
@@ -84,6 +222,57 @@ class Feature(Base):
 # ========================
 # محصول
 # ========================
+COLOR_FEATURE_TITLE = 'رنگ'
+
+
+class ProductQuerySet(models.QuerySet):
+
+    def with_card_data(self):
+        """
+        داده‌های لازم برای کارت محصول در لیست‌ها:
+        لایک/دیسلایک، تعداد و میانگین امتیاز نظرات فعال (از جدول ProductStats)،
+        قیمت نهایی (از جدول ProductEffectivePrice) و رنگ‌ها.
+        سبدهای تخفیف فعال هم prefetch می‌شوند تا اگر اعتبار ردیف قیمت نهایی گذشته باشد
+        (تا اجرای refresh_expired) درصد تخفیف بدون کوئری جدا برای هر محصول محاسبه شود.
+        برای یک صفحه کامل فقط سه کوئری اجرا می‌شود.
+        """
+        from django.apps import apps
+        DiscountDetail = apps.get_model('discount', 'DiscountDetail')
+        return self.select_related('brand', 'stats', 'effective_price').annotate(
+            likes_count=Coalesce('stats__likes', 0),
+            unlikes_count=Coalesce('stats__unlikes', 0),
+            comments_count=Coalesce('stats__comment_count', 0),
+            rating_avg=F('stats__avg_rating'),
+        ).prefetch_related(
+            Prefetch(
+                'features_value',
+                queryset=ProductFeature.objects.filter(feature__title=COLOR_FEATURE_TITLE).select_related('filterValue'),
+                to_attr='color_features',
+            ),
+            Prefetch(
+                'productOfDiscount',
+                queryset=DiscountDetail.objects.filter(discountBasket__isActive=True).select_related('discountBasket'),
+            ),
+        )
+
+
+    def with_final_price(self):
+        """
+        افزودن final_price (قیمت با تخفیف) برای فیلتر و مرتب‌سازی در SQL.
+        اگر اعتبار ردیف قیمت نهایی گذشته باشد، قیمت اصلی در نظر گرفته می‌شود.
+        """
+        now = timezone.now()
+        return self.annotate(final_price=Case(
+            When(
+                Q(effective_price__valid_until__isnull=True) | Q(effective_price__valid_until__gt=now),
+                effective_price__isnull=False,
+                then=F('effective_price__final_price'),
+            ),
+            default=F('price'),
+            output_field=models.PositiveIntegerField(),
+        ))
+
+
 class Product(Base):
     brand = models.ForeignKey(Brand, on_delete=models.CASCADE, verbose_name="برند", related_name="products")
     categories = models.ManyToManyField(Category, verbose_name="دسته‌بندی‌ها", related_name="products")
@@ -101,6 +290,8 @@ class Product(Base):
     drive = models.FileField(verbose_name='درایور',upload_to=fileDrive.upload_to,blank=True,null=True)
     isDrive = models.BooleanField(default=False,verbose_name='ایا درایو هست ',blank=True,null=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         verbose_name = "محصول"
         verbose_name_plural = "محصولات"
@@ -117,16 +308,23 @@ class Product(Base):
         return reverse("product:product_detail", kwargs={"slug": self.slug})
 
     def get_discount_percentage(self):
+        now = timezone.now()
+        effective_price = getattr(self, 'effective_price', None)
+        if effective_price is not None and effective_price.is_valid(now):
+            return effective_price.discount
+
         discounts = [
             dbd.discountBasket.discount
             for dbd in self.productOfDiscount.all()
             if dbd.discountBasket.isActive
-            and dbd.discountBasket.startDate <= timezone.now()
-            and timezone.now() <= dbd.discountBasket.endDate
+            and dbd.discountBasket.startDate <= now <= dbd.discountBasket.endDate
         ]
         return max(discounts) if discounts else 0
 
     def get_price_by_discount(self):
+        effective_price = getattr(self, 'effective_price', None)
+        if effective_price is not None and effective_price.is_valid():
+            return effective_price.final_price
         discount = self.get_discount_percentage()
         return int(self.price - (self.price * discount / 100))
 
@@ -136,12 +334,27 @@ class Product(Base):
     @property
     def avg_rating(self):
         """محاسبه میانگین امتیاز محصول"""
+        if hasattr(self, 'rating_avg'):
+            # مقدار از پیش محاسبه شده توسط with_card_data
+            return round(self.rating_avg, 1) if self.rating_avg else 0
         comments = self.comments.filter(isActive=True)
         if comments.exists():
             total_rating = sum(comment.rating for comment in comments)
             return round(total_rating / comments.count(), 1)
         return 0
 
+    def get_related_products(self, limit=8):
+        """محصولات مرتبط از پیش محاسبه شده (RelatedProduct) به ترتیب امتیاز، با یک کوئری"""
+        return Product.objects.filter(
+            related_to__product=self, isActive=True
+        ).order_by('-related_to__score').with_card_data()[:limit]
+
+    def get_bought_together(self, limit=8):
+        """محصولاتی که بیشتر همراه این محصول در سفارش‌های نهایی خریده شده‌اند"""
+        return Product.objects.filter(
+            related_to__product=self, related_to__co_purchases__gt=0, isActive=True
+        ).order_by('-related_to__co_purchases', '-related_to__score').with_card_data()[:limit]
+
     def get_absolute_url(self):
         return reverse("product:product_detail", kwargs={"slug": self.slug})
 
@@ -202,6 +415,23 @@ class ProductGallery(models.Model):
 # نظر کاربران
 # ========================
 # نظر کاربران
+def counter_changes(**deltas):
+    """
+    عبارت‌های F برای جمع زدن شمارنده‌ها با مقدار تغییر در یک UPDATE.
+    شمارنده هیچ‌وقت منفی نمی‌شود (ستون‌ها unsigned هستند).
+    """
+    changes = {}
+    for field, delta in deltas.items():
+        if delta > 0:
+            changes[field] = F(field) + delta
+        elif delta < 0:
+            changes[field] = Case(
+                When(**{f'{field}__gte': -delta}, then=F(field) + delta),
+                default=Value(0),
+            )
+    return changes
+
+
 class Comment(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="comments", verbose_name="کاربر")
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="comments", verbose_name="محصول")
@@ -216,8 +446,48 @@ class Comment(models.Model):
     )
 
     parent = models.ForeignKey("self", on_delete=models.CASCADE, related_name="replies", null=True, blank=True, verbose_name="والد")
+    # نظر سطح اول این رشته (برای گرفتن کل درخت پاسخ‌ها با یک کوئری)
+    root = models.ForeignKey("self", on_delete=models.CASCADE, related_name="thread", null=True, blank=True, editable=False, verbose_name="نظر ریشه")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="تاریخ ثبت")
     isActive = models.BooleanField(default=False, verbose_name="فعال")
+    # شمارنده‌های از پیش محاسبه شده (با LikeOrUnlike.toggle بروزرسانی می‌شوند)
+    likes_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="تعداد لایک")
+    unlikes_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="تعداد دیسلایک")
+
+    def save(self, *args, **kwargs):
+        self.root_id = (self.parent.root_id or self.parent_id) if self.parent_id else None
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def apply_vote_delta(cls, comment_id, likes=0, unlikes=0):
+        """تغییر اتمیک شمارنده‌های لایک و دیسلایک یک نظر (بدون شمارش دوباره)"""
+        changes = counter_changes(likes_count=likes, unlikes_count=unlikes)
+        if changes:
+            cls.objects.filter(id=comment_id).update(**changes)
+
+    @classmethod
+    def rebuild_vote_counts(cls, batch_size=500):
+        """
+        ساخت دوباره شمارنده‌های لایک و دیسلایک همه نظرات از جدول LikeOrUnlike.
+        خروجی: تعداد نظرهایی که شمارنده آن‌ها اصلاح شد
+        """
+        votes = {
+            row['comment']: (row['likes'], row['unlikes'])
+            for row in LikeOrUnlike.objects.values('comment').annotate(
+                likes=Count('id', filter=Q(like=True)),
+                unlikes=Count('id', filter=Q(unlike=True)),
+            ).order_by()
+        }
+
+        changed = []
+        for comment in cls.objects.only('id', 'likes_count', 'unlikes_count').iterator(chunk_size=batch_size):
+            likes, unlikes = votes.get(comment.id, (0, 0))
+            if (comment.likes_count, comment.unlikes_count) != (likes, unlikes):
+                comment.likes_count, comment.unlikes_count = likes, unlikes
+                changed.append(comment)
+
+        cls.objects.bulk_update(changed, ['likes_count', 'unlikes_count'], batch_size=batch_size)
+        return len(changed)
 
     def get_jalali_date(self):
         return jdatetime.datetime.fromgregorian(datetime=self.created_at).strftime("%Y/%m/%d")
@@ -228,6 +498,7 @@ class Comment(models.Model):
     class Meta:
         verbose_name = "نظر"
         verbose_name_plural = "نظرات"
+        indexes = [models.Index(fields=['product', 'parent', '-created_at', '-id'])]
 
 
 # ========================
@@ -247,6 +518,40 @@ class LikeOrUnlike(models.Model):
     class Meta:
         verbose_name = "لایک"
         verbose_name_plural = "لایک‌ها"
+        unique_together = ['user', 'comment']
+
+    @classmethod
+    def toggle(cls, user, comment, action):
+        """
+        ثبت یا برداشتن لایک/دیسلایک کاربر روی یک نظر در یک تراکنش.
+        ردیف واکنش کاربر قفل می‌شود تا کلیک‌های همزمان پشت سر هم اجرا شوند و
+        شمارنده‌های نظر و آمار محصول فقط به اندازه تغییر همین واکنش جابه‌جا می‌شوند.
+        خروجی: (واکنش، تعداد لایک، تعداد دیسلایک)
+        """
+        with transaction.atomic():
+            vote, created = cls.objects.select_for_update().get_or_create(
+                user=user, comment=comment, defaults={'product_id': comment.product_id}
+            )
+            before = (vote.like, vote.unlike)
+
+            if action == 'like':
+                vote.like, vote.unlike = not vote.like, False
+            elif action == 'unlike':
+                vote.like, vote.unlike = False, not vote.unlike
+
+            if (vote.like, vote.unlike) != before:
+                # update به جای save تا آمار محصول با سیگنال دوباره شمرده نشود
+                cls.objects.filter(id=vote.id).update(like=vote.like, unlike=vote.unlike)
+                likes_delta, unlikes_delta = vote.like - before[0], vote.unlike - before[1]
+                Comment.apply_vote_delta(comment.id, likes=likes_delta, unlikes=unlikes_delta)
+                ProductStats.objects.filter(product_id=vote.product_id).update(
+                    **counter_changes(likes=likes_delta, unlikes=unlikes_delta)
+                )
+
+            likes, unlikes = Comment.objects.filter(id=comment.id).values_list(
+                'likes_count', 'unlikes_count'
+            ).get()
+        return vote, likes, unlikes
 
 
 
@@ -344,4 +649,358 @@ class Wishlist(models.Model):
         unique_together = ['user', 'product']
 
     def __str__(self):
-        return f"{self.user} - {self.product}"
\ No newline at end of file
+        return f"{self.user} - {self.product}"
+
+
+# ========================
+# آمار محصول (جدول خواندنی از پیش محاسبه شده)
+# ========================
+class ProductStats(models.Model):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name="stats", verbose_name="محصول")
+    avg_rating = models.FloatField(default=0, db_index=True, verbose_name="میانگین امتیاز")
+    rating_count = models.PositiveIntegerField(default=0, verbose_name="تعداد امتیازها")
+    likes = models.PositiveIntegerField(default=0, verbose_name="تعداد لایک")
+    unlikes = models.PositiveIntegerField(default=0, verbose_name="تعداد دیسلایک")
+    comment_count = models.PositiveIntegerField(default=0, verbose_name="تعداد نظرات فعال")
+    total_sold = models.PositiveIntegerField(default=0, db_index=True, verbose_name="تعداد فروش")
+    updateAt = models.DateTimeField(auto_now=True, verbose_name="تاریخ بروزرسانی")
+
+    class Meta:
+        verbose_name = "آمار محصول"
+        verbose_name_plural = "آمار محصولات"
+
+    def __str__(self):
+        return f"آمار {self.product}"
+
+    @classmethod
+    def refresh_reviews(cls, product_id):
+        """بروزرسانی امتیاز و تعداد نظرات فعال یک محصول"""
+        result = Comment.objects.filter(product_id=product_id, isActive=True).aggregate(
+            avg=Avg('rating'), count=Count('id')
+        )
+        cls.objects.update_or_create(product_id=product_id, defaults={
+            'avg_rating': round(result['avg'] or 0, 1),
+            'rating_count': result['count'],
+            'comment_count': result['count'],
+        })
+
+    @classmethod
+    def refresh_votes(cls, product_id):
+        """بروزرسانی تعداد لایک و دیسلایک یک محصول"""
+        result = LikeOrUnlike.objects.filter(product_id=product_id).aggregate(
+            likes=Count('id', filter=Q(like=True)),
+            unlikes=Count('id', filter=Q(unlike=True)),
+        )
+        cls.objects.update_or_create(product_id=product_id, defaults=result)
+
+    @classmethod
+    def refresh_sales(cls, product_ids):
+        """بروزرسانی تعداد فروش محصولات (فقط سفارش‌های نهایی شده)"""
+        sales = Product.objects.filter(id__in=product_ids).annotate(
+            sold=Sum('orderItems__qty', filter=Q(orderItems__order__isFinally=True))
+        ).values_list('id', 'sold')
+        for product_id, sold in sales:
+            cls.objects.update_or_create(product_id=product_id, defaults={'total_sold': sold or 0})
+
+    @classmethod
+    def rebuild_all(cls, batch_size=500):
+        """ساخت دوباره کل جدول آمار به صورت گروهی"""
+        reviews = {
+            row['product']: row
+            for row in Comment.objects.filter(isActive=True).values('product').annotate(
+                avg=Avg('rating'), count=Count('id')
+            ).order_by()
+        }
+        votes = {
+            row['product']: row
+            for row in LikeOrUnlike.objects.values('product').annotate(
+                likes=Count('id', filter=Q(like=True)),
+                unlikes=Count('id', filter=Q(unlike=True)),
+            ).order_by()
+        }
+        sales = dict(
+            Product.objects.filter(orderItems__order__isFinally=True).annotate(
+                sold=Sum('orderItems__qty')
+            ).values_list('id', 'sold')
+        )
+
+        stats = []
+        for product_id in Product.objects.values_list('id', flat=True).iterator():
+            review = reviews.get(product_id, {})
+            vote = votes.get(product_id, {})
+            stats.append(cls(
+                product_id=product_id,
+                avg_rating=round(review.get('avg') or 0, 1),
+                rating_count=review.get('count', 0),
+                comment_count=review.get('count', 0),
+                likes=vote.get('likes', 0),
+                unlikes=vote.get('unlikes', 0),
+                total_sold=sales.get(product_id) or 0,
+            ))
+
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(stats, batch_size=batch_size)
+        return len(stats)
+
+
+# ========================
+# محصولات مرتبط (از پیش محاسبه شده)
+# ========================
+RELATED_PRODUCTS_LIMIT = 12
+RELATED_WEIGHT_CATEGORY = 1.0          # نسبت دسته‌های مشترک
+RELATED_WEIGHT_FEATURE = 0.5           # نسبت مقادیر ویژگی مشترک
+RELATED_WEIGHT_BOUGHT_TOGETHER = 2.0   # خرید در یک سفارش نهایی (اشباع شونده)
+RELATED_WEIGHT_BRAND = 0.25            # برند یکسان
+
+
+class RelatedProduct(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="related_items", verbose_name="محصول")
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="related_to", verbose_name="محصول مرتبط")
+    score = models.FloatField(default=0, verbose_name="امتیاز")
+    co_purchases = models.PositiveIntegerField(default=0, verbose_name="تعداد خرید همزمان")
+    updateAt = models.DateTimeField(auto_now=True, verbose_name="تاریخ بروزرسانی")
+
+    class Meta:
+        verbose_name = "محصول مرتبط"
+        verbose_name_plural = "محصولات مرتبط"
+        unique_together = ('product', 'related')
+        indexes = [models.Index(fields=['product', '-score'])]
+
+    def __str__(self):
+        return f"{self.product} → {self.related}"
+
+    @staticmethod
+    def _group(pairs):
+        groups = {}
+        for key, value in pairs:
+            groups.setdefault(key, set()).add(value)
+        return groups
+
+    @classmethod
+    def compute(cls, product_ids, limit=RELATED_PRODUCTS_LIMIT):
+        """
+        رتبه‌بندی محصولات مرتبط برای چند محصول با تعداد ثابتی کوئری.
+        کاندیداها محصولات فعال هم‌نوع (محصول یا درایو) هستند که دسته، مقدار ویژگی یا سفارش
+        مشترک دارند (برای درایوها درایوهای همان برند هم کاندید هستند).
+        خروجی: {product_id: [(related_id, score, co_purchases), ...]}
+        """
+        from django.apps import apps
+        OrderDetail = apps.get_model('order', 'OrderDetail')
+        through = Product.categories.through
+
+        targets = {
+            row[0]: row for row in
+            Product.objects.filter(id__in=list(product_ids)).values_list('id', 'brand_id', 'isDrive')
+        }
+        categories = cls._group(through.objects.filter(product_id__in=targets).values_list('product_id', 'category_id'))
+        values = cls._group(ProductFeature.objects.filter(
+            product_id__in=targets, filterValue__isnull=False
+        ).values_list('product_id', 'filterValue_id'))
+
+        category_members = cls._group(
+            (category_id, product_id) for product_id, category_id in through.objects.filter(
+                category_id__in=set().union(*categories.values()), product__isActive=True
+            ).values_list('product_id', 'category_id')
+        )
+        value_members = cls._group(
+            (value_id, product_id) for product_id, value_id in ProductFeature.objects.filter(
+                filterValue_id__in=set().union(*values.values()), product__isActive=True
+            ).values_list('product_id', 'filterValue_id')
+        )
+        drive_brands = {brand_id for _, brand_id, is_drive in targets.values() if is_drive}
+        brand_drives = cls._group(Product.objects.filter(
+            isActive=True, isDrive=True, brand_id__in=drive_brands
+        ).values_list('brand_id', 'id'))
+
+        # تعداد سفارش‌های نهایی که هر دو محصول در آن بوده‌اند
+        orders = OrderDetail.objects.filter(product_id__in=targets, order__isFinally=True).values('order_id')
+        order_products = cls._group(OrderDetail.objects.filter(
+            order_id__in=orders
+        ).values_list('order_id', 'product_id'))
+        co_purchases = {}
+        for products in order_products.values():
+            for product_id in products & targets.keys():
+                for other_id in products - {product_id}:
+                    pair = (product_id, other_id)
+                    co_purchases[pair] = co_purchases.get(pair, 0) + 1
+
+        candidate_ids = set().union(*category_members.values(), *value_members.values(), *brand_drives.values())
+        candidate_ids.update(other_id for _, other_id in co_purchases)
+        candidates = {
+            row[0]: row for row in
+            Product.objects.filter(id__in=candidate_ids, isActive=True).values_list('id', 'brand_id', 'isDrive')
+        }
+
+        result = {}
+        for product_id, (_, brand_id, is_drive) in targets.items():
+            product_categories = categories.get(product_id, set())
+            product_values = values.get(product_id, set())
+            shared_categories, shared_values = {}, {}
+            for category_id in product_categories:
+                for other_id in category_members.get(category_id, ()):
+                    shared_categories[other_id] = shared_categories.get(other_id, 0) + 1
+            for value_id in product_values:
+                for other_id in value_members.get(value_id, ()):
+                    shared_values[other_id] = shared_values.get(other_id, 0) + 1
+            related_ids = set(shared_categories) | set(shared_values)
+            related_ids.update(other_id for (source_id, other_id) in co_purchases if source_id == product_id)
+            if is_drive:
+                related_ids.update(brand_drives.get(brand_id, ()))
+
+            ranked = []
+            for other_id in related_ids - {product_id}:
+                other = candidates.get(other_id)
+                if other is None or bool(other[2]) != bool(is_drive):
+                    continue
+                bought = co_purchases.get((product_id, other_id), 0)
+                score = (
+                    RELATED_WEIGHT_CATEGORY * shared_categories.get(other_id, 0) / max(len(product_categories), 1)
+                    + RELATED_WEIGHT_FEATURE * shared_values.get(other_id, 0) / max(len(product_values), 1)
+                    + RELATED_WEIGHT_BOUGHT_TOGETHER * bought / (bought + 2)
+                    + (RELATED_WEIGHT_BRAND if brand_id and other[1] == brand_id else 0)
+                )
+                ranked.append((other_id, round(score, 4), bought))
+            ranked.sort(key=lambda item: (item[1], item[0]), reverse=True)
+            result[product_id] = ranked[:limit]
+        return result
+
+    @classmethod
+    def refresh_products(cls, product_ids):
+        """محاسبه دوباره لیست محصولات مرتبط چند محصول"""
+        ranked = cls.compute(product_ids)
+        rows = [
+            cls(product_id=product_id, related_id=related_id, score=score, co_purchases=bought)
+            for product_id, items in ranked.items()
+            for related_id, score, bought in items
+        ]
+        with transaction.atomic():
+            cls.objects.filter(product_id__in=product_ids).delete()
+            cls.objects.bulk_create(rows)
+        return len(rows)
+
+    @classmethod
+    def rebuild_all(cls, batch_size=200):
+        """ساخت دوباره کل جدول (برای اجرای دوره‌ای در پس‌زمینه)"""
+        product_ids = list(Product.objects.filter(isActive=True).values_list('id', flat=True))
+        for start in range(0, len(product_ids), batch_size):
+            cls.refresh_products(product_ids[start:start + batch_size])
+        cls.objects.exclude(product__isActive=True).delete()
+        return len(product_ids)
+
+
+# ========================
+# پیشنهاد محصول به کاربر (جدول خواندنی از پیش محاسبه شده)
+# ========================
+USER_RECOMMENDATIONS_LIMIT = 10
+RECOMMEND_WEIGHT_PURCHASE = 1.0    # همسایه‌های محصولات خریداری شده (سفارش نهایی)
+RECOMMEND_WEIGHT_WISHLIST = 0.5    # همسایه‌های محصولات علاقه‌مندی
+
+
+class UserRecommendation(models.Model):
+    """
+    لیست پیشنهادی هر کاربر از جمع امتیاز همسایه‌های RelatedProduct محصولاتی که خریده
+    یا به علاقه‌مندی‌ها افزوده است؛ با محصولات پرفروش تکمیل می‌شود.
+    فقط برای کاربرانی که خرید نهایی یا علاقه‌مندی دارند ذخیره می‌شود.
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="recommendations", verbose_name="کاربر")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="recommended_for", verbose_name="محصول")
+    rank = models.PositiveSmallIntegerField(default=0, verbose_name="رتبه")
+    score = models.FloatField(default=0, verbose_name="امتیاز")
+    updateAt = models.DateTimeField(auto_now=True, verbose_name="تاریخ بروزرسانی")
+
+    class Meta:
+        verbose_name = "پیشنهاد کاربر"
+        verbose_name_plural = "پیشنهادهای کاربر"
+        unique_together = ('user', 'product')
+        indexes = [models.Index(fields=['user', 'rank'])]
+
+    def __str__(self):
+        return f"{self.user} → {self.product}"
+
+    @classmethod
+    def seeds(cls, user_ids=None):
+        """
+        محصولات پایه کاربران از خریدهای نهایی و علاقه‌مندی‌ها (دو کوئری).
+        خروجی: ({user_id: {product_id: وزن}}, {user_id: محصولات خریداری شده})
+        """
+        from django.apps import apps
+        OrderDetail = apps.get_model('order', 'OrderDetail')
+        purchases = OrderDetail.objects.filter(order__isFinally=True)
+        wishlists = Wishlist.objects.all()
+        if user_ids is not None:
+            purchases = purchases.filter(order__customer_id__in=user_ids)
+            wishlists = wishlists.filter(user_id__in=user_ids)
+
+        seeds = {}
+        for user_id, product_id in wishlists.values_list('user_id', 'product_id'):
+            seeds.setdefault(user_id, {})[product_id] = RECOMMEND_WEIGHT_WISHLIST
+        purchased = RelatedProduct._group(purchases.values_list('order__customer_id', 'product_id').distinct())
+        for user_id, product_ids in purchased.items():
+            for product_id in product_ids:
+                seeds.setdefault(user_id, {})[product_id] = RECOMMEND_WEIGHT_PURCHASE
+        return seeds, purchased
+
+    @classmethod
+    def compute(cls, user_ids, limit=USER_RECOMMENDATIONS_LIMIT):
+        """
+        رتبه‌بندی پیشنهادها برای چند کاربر با تعداد ثابتی کوئری.
+        امتیاز هر محصول جمع (وزن محصول پایه × امتیاز همسایگی در RelatedProduct) است؛
+        محصولات خریداری شده حذف و جای خالی با پرفروش‌ها پر می‌شود.
+        خروجی: {user_id: [(product_id, score), ...]}
+        """
+        seeds, purchased_by_user = cls.seeds(user_ids)
+        neighbours = RelatedProduct._group(
+            (product_id, (related_id, score)) for product_id, related_id, score in RelatedProduct.objects.filter(
+                product_id__in=set().union(*seeds.values()), related__isActive=True
+            ).values_list('product_id', 'related_id', 'score')
+        )
+        popular_ids = list(Product.objects.filter(isActive=True).order_by(
+            '-stats__total_sold', '-createAt'
+        ).values_list('id', flat=True)[:limit + max(map(len, seeds.values()), default=0)])
+
+        result = {}
+        for user_id, weights in seeds.items():
+            purchased = purchased_by_user.get(user_id, set())
+            scores = {}
+            for product_id, weight in weights.items():
+                for related_id, score in neighbours.get(product_id, ()):
+                    scores[related_id] = scores.get(related_id, 0) + weight * score
+            ranked = sorted(
+                ((product_id, round(score, 4)) for product_id, score in scores.items() if product_id not in purchased),
+                key=lambda item: (item[1], item[0]), reverse=True
+            )[:limit]
+            chosen = {product_id for product_id, _ in ranked} | purchased
+            ranked += [(product_id, 0) for product_id in popular_ids if product_id not in chosen][:limit - len(ranked)]
+            result[user_id] = ranked
+        return result
+
+    @classmethod
+    def refresh_users(cls, user_ids):
+        """محاسبه دوباره لیست پیشنهادی چند کاربر"""
+        ranked = cls.compute(user_ids)
+        rows = [
+            cls(user_id=user_id, product_id=product_id, rank=rank, score=score)
+            for user_id, items in ranked.items()
+            for rank, (product_id, score) in enumerate(items)
+        ]
+        with transaction.atomic():
+            cls.objects.filter(user_id__in=user_ids).delete()
+            cls.objects.bulk_create(rows)
+        return len(rows)
+
+    @classmethod
+    def rebuild_all(cls, batch_size=500):
+        """ساخت دوباره کل جدول (بعد از rebuild_related_products، برای اجرای دوره‌ای در پس‌زمینه)"""
+        user_ids = sorted(cls.seeds()[0])
+        for start in range(0, len(user_ids), batch_size):
+            cls.refresh_users(user_ids[start:start + batch_size])
+        cls.objects.exclude(user_id__in=user_ids).delete()
+        return len(user_ids)
+
+    @staticmethod
+    def products_for(user, limit=USER_RECOMMENDATIONS_LIMIT):
+        """محصولات پیشنهادی ذخیره شده کاربر به ترتیب رتبه با داده‌های کارت (سه کوئری برای کل لیست)"""
+        return Product.objects.filter(
+            recommended_for__user=user, isActive=True
+        ).order_by('recommended_for__rank').with_card_data()[:limit]
@@ -0,0 +1,121 @@
+# pagination.py
+# صفحه‌بندی cursor (keyset) برای Load More لیست محصولات
+#
+# به جای OFFSET و COUNT(*)، مقدار ستون مرتب‌سازی و id آخرین محصول صفحه در یک
+# cursor مبهم به کلاینت داده می‌شود و صفحه بعد با شرط «بعد از این کلید» گرفته می‌شود.
+import base64
+import datetime
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+# ستون مرتب‌سازی و نزولی بودن آن؛ id در همان جهت ترتیب محصولات هم‌ارزش را ثابت می‌کند
+SORT_FIELDS = {
+    '1': ('createAt', True),      # جدیدترین
+    '2': ('final_price', True),   # گران‌ترین
+    '3': ('final_price', False),  # ارزان‌ترین
+    '4': ('total_sold', True),    # پرفروش‌ترین
+}
+DEFAULT_SORT = '1'
+
+
+def normalize_sort(sort):
+    return sort if sort in SORT_FIELDS else DEFAULT_SORT
+
+
+def encode_cursor(sort, value, pk):
+    # DjangoJSONEncoder تاریخ را تا میلی‌ثانیه کوتاه می‌کند و ردیف‌های هم‌میلی‌ثانیه جا می‌افتند
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort, value, pk], cls=DjangoJSONEncoder)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def load_cursor(cursor):
+    """محتوای خام cursor به شکل (sort، مقدار، id) یا None برای cursor نامعتبر"""
+    if not cursor:
+        return None
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, value, pk = json.loads(payload)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(pk, int):
+        return None
+    return cursor_sort, value, pk
+
+
+def parse_cursor_datetime(value):
+    """تاریخ داخل cursor با دقت میکروثانیه و منطقه زمانی؛ مقدار نامعتبر None برمی‌گرداند"""
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        return None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, datetime.timezone.utc)
+    return parsed
+
+
+def decode_cursor(cursor, sort):
+    """کلید (مقدار، id) داخل cursor؛ cursor نامعتبر یا مربوط به مرتب‌سازی دیگر None برمی‌گرداند"""
+    loaded = load_cursor(cursor)
+    if loaded is None or loaded[0] != sort:
+        return None
+    _, value, pk = loaded
+    if SORT_FIELDS[sort][0] == 'createAt':
+        value = parse_cursor_datetime(value)
+    elif not isinstance(value, (int, float)):
+        return None
+    if value is None:
+        return None
+    return value, pk
+
+
+def cursor_for(item, sort):
+    """cursor صفحه بعد از محصول (مدل یا دیکشنری ردیف ایندکس)"""
+    field = SORT_FIELDS[sort][0]
+    if isinstance(item, dict):
+        return encode_cursor(sort, item[field], item['id'])
+    return encode_cursor(sort, getattr(item, field), item.id)
+
+
+def order_by_sort(queryset, sort):
+    """
+    مرتب‌سازی کوئری بر اساس پارامتر sort.
+    کوئری باید با with_final_price() ساخته شده باشد.
+    """
+    field, descending = SORT_FIELDS[normalize_sort(sort)]
+    if field == 'total_sold':
+        queryset = queryset.annotate(total_sold=Coalesce('stats__total_sold', 0))
+    if descending:
+        return queryset.order_by(f'-{field}', '-id')
+    return queryset.order_by(field, 'id')
+
+
+def keyset_page(queryset, sort, cursor=None, per_page=8):
+    """
+    یک صفحه از کوئری بعد از cursor داده شده.
+    خروجی: (لیست محصولات، cursor صفحه بعد یا None)
+    """
+    sort = normalize_sort(sort)
+    field, descending = SORT_FIELDS[sort]
+    queryset = order_by_sort(queryset, sort)
+
+    key = decode_cursor(cursor, sort)
+    if key is not None:
+        value, pk = key
+        lookup = 'lt' if descending else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'id__{lookup}': pk})
+        )
+
+    items = list(queryset[:per_page + 1])
+    if len(items) <= per_page:
+        return items, None
+    items = items[:per_page]
+    return items, cursor_for(items[-1], sort)
@@ -0,0 +1,79 @@
+# signals.py
+# بروزرسانی جدول ProductStats هنگام تغییر محصول، نظرات و لایک‌ها
+# و بروزرسانی ایندکس فیلترهای دسته‌بندی هنگام تغییر دسته‌ها و ویژگی‌های محصول
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from . import facets
+from .models import Product, Category, Comment, LikeOrUnlike, ProductStats, ProductFeature, category_tree_changed
+
+
+@receiver(post_save, sender=Product)
+def create_product_stats(sender, instance, created, **kwargs):
+    if created:
+        ProductStats.objects.get_or_create(product=instance)
+    Category.invalidate_subtree_counts()
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def update_review_stats(sender, instance, **kwargs):
+    ProductStats.refresh_reviews(instance.product_id)
+
+
+@receiver(post_save, sender=LikeOrUnlike)
+@receiver(post_delete, sender=LikeOrUnlike)
+def update_vote_stats(sender, instance, **kwargs):
+    ProductStats.refresh_votes(instance.product_id)
+
+
+@receiver(post_delete, sender=LikeOrUnlike)
+def update_comment_votes_on_delete(sender, instance, **kwargs):
+    # ثبت و تغییر واکنش‌ها در LikeOrUnlike.toggle شمرده می‌شود؛ اینجا فقط حذف (مثلا از ادمین)
+    Comment.apply_vote_delta(instance.comment_id, likes=-instance.like, unlikes=-instance.unlike)
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def update_facets_on_categories_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action.startswith('post_'):
+        Category.invalidate_subtree_counts()
+
+    if action == 'pre_clear':
+        # بعد از clear دیگر نمی‌دانیم کدام رابطه‌ها حذف شده‌اند
+        if reverse:
+            instance._facet_product_ids = list(instance.products.values_list('id', flat=True))
+        else:
+            instance._facet_category_ids = list(instance.categories.values_list('id', flat=True))
+        return
+
+    if action == 'post_clear':
+        if reverse:
+            facets.refresh_products(getattr(instance, '_facet_product_ids', []), [instance.pk])
+        else:
+            facets.refresh_products([instance.pk], getattr(instance, '_facet_category_ids', []))
+        return
+
+    if action in ('post_add', 'post_remove') and pk_set:
+        if reverse:
+            facets.refresh_products(pk_set, [instance.pk])
+        else:
+            facets.refresh_products([instance.pk], pk_set)
+
+
+@receiver(post_save, sender=ProductFeature)
+@receiver(post_delete, sender=ProductFeature)
+def update_facets_on_feature_change(sender, instance, **kwargs):
+    facets.refresh_products([instance.product_id])
+
+
+@receiver(category_tree_changed, sender=Category)
+def update_on_category_move(sender, instance, affected_ids, **kwargs):
+    # مسیر ذخیره شده در ایندکس زیردسته‌ها هم عوض شده است
+    subtree_ids = instance.get_descendants(include_self=True).values_list('id', flat=True)
+    facets.invalidate_categories(set(affected_ids) | set(subtree_ids))
+    Category.invalidate_subtree_counts()
+
+
+@receiver(post_delete, sender=Category)
+def update_on_category_delete(sender, instance, **kwargs):
+    facets.invalidate_categories(Category.path_ids(instance.path))
+    Category.invalidate_subtree_counts()
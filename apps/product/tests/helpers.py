@@ -0,0 +1,96 @@
+# helpers.py
+# ساخت داده‌های آزمایشی مشترک تست‌های اپ‌ها (محصول، برند، دسته، تخفیف و کاربر)
+import itertools
+from datetime import timedelta
+from django.core.cache import cache
+from django.utils import timezone
+from apps.user.models import CustomUser
+from apps.product.models import (
+    Brand, Category, Comment, Feature, FeatureValue, LikeOrUnlike, Product, ProductFeature, COLOR_FEATURE_TITLE,
+)
+
+_numbers = itertools.count(1)
+
+
+def make_user(**kwargs):
+    user = CustomUser.objects.create_user(mobileNumber=f'0935{next(_numbers):07d}', **kwargs)
+    user.is_active = True
+    user.save(update_fields=['is_active'])
+    return user
+
+
+def make_brand(title='Samsung'):
+    return Brand.objects.create(title=title, slug=f'brand-{next(_numbers)}')
+
+
+def make_category(title='Printers', parent=None):
+    return Category.objects.create(title=title, slug=f'category-{next(_numbers)}', parent=parent)
+
+
+def make_product(title='Samsung Xpress M2070', price=1000, brand=None, categories=(), **kwargs):
+    product = Product.objects.create(
+        title=title, slug=f'product-{next(_numbers)}', price=price, brand=brand or make_brand(), **kwargs
+    )
+    if categories:
+        product.categories.add(*categories)
+    return product
+
+
+def make_feature_value(product, title, value, categories=()):
+    feature = Feature.objects.filter(title=title).first()
+    if feature is None:
+        feature = Feature.objects.create(title=title, slug=f'feature-{next(_numbers)}')
+        feature.categories.add(*categories)
+    filter_value = FeatureValue.objects.get_or_create(feature=feature, value=value)[0]
+    return ProductFeature.objects.create(product=product, feature=feature, value=value, filterValue=filter_value)
+
+
+def set_color(product, value, categories=()):
+    return make_feature_value(product, COLOR_FEATURE_TITLE, value, categories)
+
+
+def make_discount(products, percent, start=None, end=None, is_active=True):
+    from apps.discount.models import DiscountBasket, DiscountDetail
+    now = timezone.now()
+    basket = DiscountBasket.objects.create(
+        discountTitle=f'تخفیف {percent}', discount=percent, isActive=is_active,
+        startDate=start or now - timedelta(days=1), endDate=end or now + timedelta(days=1),
+    )
+    for product in products:
+        DiscountDetail.objects.create(discountBasket=basket, product=product)
+    return basket
+
+
+def make_comment(product, user=None, rating=5, is_active=True, parent=None, text='عالی بود'):
+    return Comment.objects.create(
+        user=user or make_user(), product=product, text=text, rating=rating, isActive=is_active, parent=parent
+    )
+
+
+def make_vote(comment, user=None, like=True):
+    return LikeOrUnlike.objects.create(
+        user=user or make_user(), comment=comment, product=comment.product, like=like, unlike=not like
+    )
+
+
+def make_order(items, customer=None, finalize=True):
+    """سفارش با جزئیات [(محصول، تعداد)]؛ نهایی شدن مثل درگاه با save سفارش انجام می‌شود"""
+    from apps.order.models import Order, OrderDetail
+    order = Order.objects.create(customer=customer or make_user())
+    for product, qty in items:
+        OrderDetail.objects.create(order=order, product=product, brand=product.brand, qty=qty, price=product.price)
+    if finalize:
+        # درگاه سفارش را با مبالغ محاسبه شده از جزئیات از دیتابیس می‌خواند
+        order.refresh_from_db()
+        order.isFinally = True
+        order.save()
+    return order
+
+
+def reset_caches():
+    """پاک کردن cache و ایندکس‌های حافظه پردازه بین تست‌ها"""
+    from apps.product import facets
+    from apps.search import autocomplete
+    cache.clear()
+    facets._indexes.clear()
+    autocomplete._index = None
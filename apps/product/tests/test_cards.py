@@ -0,0 +1,45 @@
+from django.test import TestCase
+from apps.product.cards import build_product_cards, build_product_cards_json, calc_vote_rating
+from apps.product.models import Product
+from .helpers import make_comment, make_discount, make_product, make_vote, reset_caches, set_color
+
+
+class ProductCardDataTests(TestCase):
+    def setUp(self):
+        reset_caches()
+
+    def test_card_values_come_from_annotations(self):
+        product = make_product(price=2000)
+        set_color(product, 'مشکی')
+        comment = make_comment(product, rating=4)
+        make_comment(product, rating=2)
+        make_comment(product, rating=1, is_active=False)
+        make_vote(comment, like=True)
+        make_vote(comment, like=True)
+        make_vote(comment, like=False)
+        make_discount([product], 25)
+
+        card = build_product_cards(Product.objects.filter(id=product.id).with_card_data())[0]
+
+        self.assertEqual(card['final_price'], 1500)
+        self.assertEqual(card['discount_percentage'], 25)
+        self.assertEqual(card['comments_count'], 2)
+        self.assertEqual(card['likes_count'], 2)
+        self.assertEqual(card['colors'], ['مشکی'])
+        self.assertEqual(card['rating'], calc_vote_rating(2, 1))
+
+        data = build_product_cards_json(Product.objects.filter(id=product.id).with_card_data())[0]
+        self.assertEqual(data['avg_rating'], 3.0)
+        self.assertEqual(data['comments_count'], 2)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        def card_queries(count):
+            for index in range(count):
+                product = make_product(title=f'Galaxy {index}')
+                set_color(product, 'سفید')
+                make_vote(make_comment(product))
+            with self.assertNumQueries(3) as captured:
+                build_product_cards(Product.objects.order_by('-id').with_card_data()[:count])
+            return len(captured)
+
+        self.assertEqual(card_queries(2), card_queries(8))
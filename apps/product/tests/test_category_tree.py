@@ -0,0 +1,67 @@
+from django.test import TestCase
+from apps.main.models import CacheVersion
+from apps.product.models import CATEGORY_COUNTS_VERSION_KEY, Category, Product
+from .helpers import make_category, make_product, reset_caches
+
+
+class CategoryTreeTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.root = make_category('Office')
+        self.printers = make_category('Printers', parent=self.root)
+        self.laser = make_category('Laser', parent=self.printers)
+
+    def test_path_and_depth_on_create(self):
+        self.assertEqual(self.root.path, Category.path_segment(self.root.pk))
+        self.assertEqual(self.laser.path, self.printers.path + Category.path_segment(self.laser.pk))
+        self.assertEqual((self.root.depth, self.printers.depth, self.laser.depth), (0, 1, 2))
+
+    def test_moving_subtree_rewrites_descendant_paths(self):
+        other = make_category('Supplies')
+        self.printers.parent = other
+        self.printers.save()
+
+        self.laser.refresh_from_db()
+        self.assertEqual(self.laser.path, other.path + Category.path_segment(self.printers.pk)
+                         + Category.path_segment(self.laser.pk))
+        self.assertEqual(self.laser.depth, 2)
+        self.assertEqual(list(self.root.get_descendants()), [])
+
+    def test_cycle_is_rejected_before_parent_is_written(self):
+        self.printers.parent = self.laser
+        with self.assertRaises(ValueError):
+            self.printers.save()
+
+        self.printers.refresh_from_db()
+        self.assertEqual(self.printers.parent_id, self.root.pk)
+        self.root.parent = self.root
+        with self.assertRaises(ValueError):
+            self.root.save()
+        self.root.refresh_from_db()
+        self.assertIsNone(self.root.parent_id)
+
+    def test_descendants_and_ancestors(self):
+        self.assertEqual(set(self.root.get_descendants()), {self.printers, self.laser})
+        self.assertEqual(set(self.root.get_descendants(include_self=True)), {self.root, self.printers, self.laser})
+        self.assertEqual(list(self.laser.get_ancestors()), [self.root, self.printers])
+
+    def test_subtree_product_counts(self):
+        make_product(categories=[self.laser])
+        make_product(categories=[self.printers, self.laser])
+        make_product(categories=[self.root], isActive=False)
+
+        counts = Category.subtree_product_counts()
+        self.assertEqual((counts.get(self.root.pk), counts.get(self.printers.pk), counts.get(self.laser.pk)), (2, 2, 2))
+
+        make_category('Inkjet', parent=self.printers).save()
+        make_product(categories=[Category.objects.get(title='Inkjet')])
+        self.assertEqual(Category.objects.get(pk=self.root.pk).subtree_product_count, 3)
+
+    def test_subtree_counts_follow_changes_from_other_workers(self):
+        product = make_product(categories=[self.laser])
+        self.assertEqual(Category.subtree_product_counts().get(self.root.pk), 1)
+
+        # worker دیگری محصول را غیرفعال کرده و نسخه را بالا برده است (cache این worker دست نخورده)
+        Product.objects.filter(pk=product.pk).update(isActive=False)
+        CacheVersion.bump(CATEGORY_COUNTS_VERSION_KEY)
+        self.assertIsNone(Category.subtree_product_counts().get(self.root.pk))
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.test import TestCase
+from apps.product.comments import load_comment_tree
+from apps.product.models import Comment, LikeOrUnlike
+from .helpers import make_comment, make_product, make_user, reset_caches
+
+
+class CommentTreeTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.product = make_product()
+
+    def test_tree_is_loaded_with_two_queries(self):
+        root = make_comment(self.product, text='ریشه')
+        reply = make_comment(self.product, parent=root, text='پاسخ')
+        make_comment(self.product, parent=reply, text='پاسخ به پاسخ')
+        hidden = make_comment(self.product, parent=root, is_active=False)
+        make_comment(self.product, parent=hidden, text='زیر نظر غیرفعال')
+        for action in ('like', 'unlike', 'like'):
+            LikeOrUnlike.toggle(make_user(), root, action)
+
+        with self.assertNumQueries(2):
+            comments, next_cursor = load_comment_tree(self.product)
+
+        self.assertIsNone(next_cursor)
+        self.assertEqual(len(comments), 1)
+        self.assertEqual((comments[0]['likes_count'], comments[0]['unlikes_count']), (2, 1))
+        replies = comments[0]['replies']
+        self.assertEqual([node['text'] for node in replies], ['پاسخ'])
+        self.assertEqual([node['text'] for node in replies[0]['replies']], ['پاسخ به پاسخ'])
+
+    def test_cursor_keeps_rows_created_in_the_same_millisecond(self):
+        base = datetime(2024, 5, 1, 10, 0, 0, 123000, tzinfo=dt_timezone.utc)
+        for i in range(7):
+            comment = make_comment(self.product, text=f'نظر {i}')
+            Comment.objects.filter(pk=comment.pk).update(created_at=base + timedelta(microseconds=100 * i))
+
+        first_page, cursor = load_comment_tree(self.product)
+        second_page, last_cursor = load_comment_tree(self.product, cursor)
+
+        self.assertEqual(len(first_page), 5)
+        self.assertIsNone(last_cursor)
+        texts = [node['text'] for node in first_page + second_page]
+        self.assertEqual(texts, [f'نظر {i}' for i in range(6, -1, -1)])
+
+    def test_invalid_cursor_starts_from_first_page(self):
+        make_comment(self.product)
+        comments, _ = load_comment_tree(self.product, 'not-a-cursor')
+        self.assertEqual(len(comments), 1)
+
+    def test_ajax_endpoint_returns_next_cursor(self):
+        for _ in range(6):
+            make_comment(self.product)
+        url = f'/product/{self.product.slug}/comments/'
+        data = self.client.get(url).json()
+        self.assertTrue(data['has_next'])
+        data = self.client.get(url, {'cursor': data['next_cursor']}).json()
+        self.assertEqual((len(data['comments']), data['has_next']), (1, False))
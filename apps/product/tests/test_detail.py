@@ -0,0 +1,70 @@
+from unittest import mock
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from apps.product.detail import DETAIL_QUERY_BUDGET, build_detail_context, detail_queryset
+from apps.product.drive_view import DriveDetailView
+from apps.product.models import Comment, RelatedProduct
+from .helpers import (
+    make_category, make_comment, make_discount, make_feature_value, make_product, make_vote, reset_caches,
+)
+
+
+class ProductDetailTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        category = make_category('Printers')
+        self.product = make_product(categories=[category])
+        self.others = [make_product(f'Printer {i}', categories=[category]) for i in range(4)]
+        make_discount([self.product, self.others[0]], 10)
+        make_feature_value(self.product, 'سرعت', '20', [category])
+
+        first = make_comment(self.product, rating=5)
+        Comment.objects.filter(pk=make_comment(self.product, rating=3).pk).update(is_suggest=True)
+        make_comment(self.product, rating=1, is_active=False)
+        make_comment(self.product, rating=4, parent=first)
+        make_vote(first)
+        RelatedProduct.refresh_products([self.product.id])
+
+    def warm_up(self, url):
+        # بار اول ردیف نسخه قطعه‌های cache شده هدر ساخته می‌شود؛ بعد از آن بودجه برای cache خالی هم کافی است
+        with mock.patch('apps.product.detail.logger'):
+            self.client.get(url)
+        reset_caches()
+
+    def get_within_budget(self, url, budget=DETAIL_QUERY_BUDGET):
+        # در حالت DEBUG عبور از بودجه به جای لاگ خطا می‌دهد
+        with override_settings(DEBUG=True), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(queries), budget)
+        return response
+
+    def test_context_is_built_from_prefetched_rows(self):
+        product = detail_queryset().get(pk=self.product.pk)
+        with self.assertNumQueries(0):
+            context = build_detail_context(product)
+        self.assertEqual(context['comments_count'], 3)
+        self.assertEqual(context['average_rating'], 4.0)
+        self.assertEqual(context['suggest_count'], 1)
+        self.assertEqual(context['rating_histogram'], {5: 1, 4: 1, 3: 1, 2: 0, 1: 0})
+        self.assertEqual(len(context['features']), 1)
+
+    def test_product_page_renders_within_budget(self):
+        self.warm_up(self.product.get_absolute_url())
+        response = self.get_within_budget(self.product.get_absolute_url())
+        self.assertEqual(len(response.context['related_products']), 4)
+        self.assertEqual(response.context['comments_count'], 3)
+
+    def test_drive_page_renders_within_budget(self):
+        drive = make_product('Driver', brand=self.product.brand, isDrive=True)
+        make_product('Older driver', brand=self.product.brand, isDrive=True)
+        make_comment(drive, rating=4)
+        RelatedProduct.refresh_products([drive.id])
+        url = reverse('product:driveDetail', kwargs={'slug': drive.slug})
+        self.warm_up(url)
+
+        response = self.get_within_budget(url, DriveDetailView.max_queries)
+        self.assertEqual(len(response.context['related_drives']), 1)
+        self.assertEqual(response.context['average_rating'], 4)
@@ -0,0 +1,52 @@
+from django.test import TestCase
+from apps.main.models import CacheVersion
+from apps.product import facets
+from apps.product.models import Product
+from .helpers import make_brand, make_category, make_discount, make_feature_value, make_product, reset_caches
+
+
+class CategoryFacetIndexTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.root = make_category('Printers')
+        self.child = make_category('Laser', parent=self.root)
+        self.samsung, self.hp = make_brand('Samsung'), make_brand('HP')
+        self.black = make_product(price=1000, brand=self.samsung, categories=[self.child])
+        self.white = make_product(price=3000, brand=self.hp, categories=[self.root])
+        self.black_value = make_feature_value(self.black, 'رنگ', 'مشکی', [self.root]).filterValue_id
+        make_feature_value(self.white, 'رنگ', 'سفید', [self.root])
+
+    def test_filters_counts_and_subtree(self):
+        index = facets.get_category_index(self.root)
+        self.assertEqual(set(index.sorted_ids(index.active)), {self.black.id, self.white.id})
+        self.assertEqual(index.sorted_ids(index.filter(brand_ids=[self.hp.id])), [self.white.id])
+        self.assertEqual(index.sorted_ids(index.filter(price_max=2000)), [self.black.id])
+        self.assertEqual(index.value_counts(index.filter(brand_ids=[self.samsung.id])), {self.black_value: 1})
+        self.assertEqual(index.price_range(), {'max_price': 3000, 'min_price': 1000})
+
+    def test_local_changes_update_the_index_in_place(self):
+        index = facets.get_category_index(self.root)
+        make_discount([self.white], 50)
+        self.assertIs(facets.get_category_index(self.root), index)
+        self.assertEqual(index.price_range(), {'max_price': 1500, 'min_price': 1000})
+
+        self.white.isActive = False
+        self.white.save()
+        self.assertEqual(index.sorted_ids(index.active), [self.black.id])
+
+    def test_change_from_another_worker_rebuilds_the_index(self):
+        index = facets.get_category_index(self.root)
+        # تغییر در worker دیگر: داده و نسخه دیتابیس عوض می‌شوند ولی ایندکس این پردازه نه
+        Product.objects.filter(id=self.white.id).update(isActive=False)
+        CacheVersion.bump(facets.VERSION_KEY.format(self.root.id))
+
+        rebuilt = facets.get_category_index(self.root)
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(rebuilt.sorted_ids(rebuilt.active), [self.black.id])
+
+    def test_local_update_after_a_missed_version_drops_the_index(self):
+        facets.get_category_index(self.root)
+        CacheVersion.bump(facets.VERSION_KEY.format(self.root.id))
+
+        facets.refresh_products([self.black.id])
+        self.assertNotIn(self.root.id, facets._indexes)
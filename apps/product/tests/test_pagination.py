@@ -0,0 +1,72 @@
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from apps.product import facets
+from apps.product.models import Product
+from apps.product.pagination import cursor_for, decode_cursor, encode_cursor, keyset_page
+from .helpers import make_brand, make_category, make_product, reset_caches
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.brand = make_brand()
+        self.category = make_category()
+        # چهار محصول در یک میلی‌ثانیه (فقط میکروثانیه‌ها فرق دارند) و دو محصول با زمان کاملا یکسان
+        base = timezone.now().replace(microsecond=123000)
+        self.products = [
+            make_product(title=f'Galaxy {index}', brand=self.brand, categories=[self.category],
+                         createAt=base + timedelta(microseconds=index * 100))
+            for index in range(4)
+        ]
+        self.products += [
+            make_product(title=f'Galaxy tie {index}', brand=self.brand, categories=[self.category], createAt=base)
+            for index in range(2)
+        ]
+        self.expected = list(Product.objects.order_by('-createAt', '-id').values_list('id', flat=True))
+
+    def collect(self, next_page):
+        ids, cursor = [], None
+        for _ in range(len(self.expected) + 1):
+            page_ids, cursor = next_page(cursor)
+            ids += page_ids
+            if cursor is None:
+                return ids
+        self.fail('cursor pagination did not terminate')
+
+    def test_cursor_keeps_microseconds_and_timezone(self):
+        product = self.products[1]
+        value, pk = decode_cursor(cursor_for(product, '1'), '1')
+        self.assertEqual((value, pk), (product.createAt, product.id))
+        self.assertIsNotNone(value.tzinfo)
+        self.assertIsNone(decode_cursor(encode_cursor('1', 'not a date', 1), '1'))
+        self.assertIsNone(decode_cursor(cursor_for(product, '1'), '2'))
+
+    def test_keyset_pages_do_not_skip_rows_in_the_same_millisecond(self):
+        def next_page(cursor):
+            items, cursor = keyset_page(Product.objects.with_final_price(), '1', cursor, per_page=2)
+            return [item.id for item in items], cursor
+
+        self.assertEqual(self.collect(next_page), self.expected)
+
+    def test_facet_index_pages_do_not_skip_rows(self):
+        index = facets.get_category_index(self.category)
+
+        def next_page(cursor):
+            rows = index.rows_after(index.active, '1', decode_cursor(cursor, '1'), limit=3)
+            return [row['id'] for row in rows[:2]], cursor_for(rows[1], '1') if len(rows) > 2 else None
+
+        self.assertEqual(self.collect(next_page), self.expected)
+
+    @mock.patch('apps.product.views.BRAND_PAGE_SIZE', 2)
+    def test_brand_load_more_endpoint(self):
+        url = reverse('product:brand', kwargs={'slug': self.brand.slug})
+
+        def next_page(cursor):
+            params = {'sort': '1', 'cursor': cursor} if cursor else {'sort': '1'}
+            data = self.client.get(url, params, HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()
+            return [product['id'] for product in data['products']], data['next_cursor']
+
+        self.assertEqual(self.collect(next_page), self.expected)
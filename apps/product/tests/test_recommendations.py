@@ -0,0 +1,73 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from apps.product.models import RelatedProduct, UserRecommendation, Wishlist
+from .helpers import make_order, make_product, make_user, reset_caches
+
+
+def relate(product, related, score):
+    RelatedProduct.objects.create(product=product, related=related, score=score)
+
+
+def recommended_ids(user):
+    return list(UserRecommendation.objects.filter(user=user).order_by('rank').values_list('product_id', flat=True))
+
+
+class UserRecommendationTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.user = make_user()
+        self.printer = make_product('Printer')
+        self.toner = make_product('Toner')
+        self.paper = make_product('Paper')
+        self.scanner = make_product('Scanner')
+        relate(self.printer, self.toner, 1.0)
+        relate(self.printer, self.paper, 0.5)
+        relate(self.scanner, self.paper, 1.0)
+
+    def test_neighbours_of_purchases_and_wishlist_are_ranked(self):
+        make_order([(self.printer, 1)], customer=self.user)
+        Wishlist.objects.create(user=self.user, product=self.scanner)
+
+        ranked = UserRecommendation.compute([self.user.id], limit=3)[self.user.id]
+        # کاغذ: 0.5 × 1.0 از خرید + 1.0 × 0.5 از علاقه‌مندی؛ محصول خریداری شده پیشنهاد نمی‌شود
+        self.assertEqual(ranked[:2], [(self.paper.id, 1.0), (self.toner.id, 1.0)])
+        self.assertEqual(ranked[2], (self.scanner.id, 0))
+
+    def test_unfinished_orders_are_ignored(self):
+        make_order([(self.printer, 1)], customer=self.user, finalize=False)
+        self.assertEqual(UserRecommendation.compute([self.user.id]), {})
+
+    def test_products_for_reads_the_stored_ranking(self):
+        make_order([(self.printer, 1)], customer=self.user)
+        UserRecommendation.refresh_users([self.user.id])
+        self.paper.isActive = False
+        self.paper.save()
+
+        # محصولات و داده‌های کارت (رنگ‌ها و تخفیف‌ها با prefetch)
+        with self.assertNumQueries(3):
+            products = list(UserRecommendation.products_for(self.user, limit=2))
+        self.assertEqual([product.id for product in products], [self.toner.id, self.scanner.id])
+
+    @override_settings(ORDER_SALES_REFRESH_INTERVAL=0)
+    def test_finalized_order_refreshes_the_buyer_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            make_order([(self.printer, 1)], customer=self.user)
+        self.assertFalse(UserRecommendation.objects.exists())
+
+        # RelatedProduct خرید همزمان هم بازسازی می‌شود؛ همسایه‌های دستی حفظ نمی‌شوند
+        for callback in callbacks:
+            callback()
+        self.assertNotIn(self.printer.id, recommended_ids(self.user))
+        self.assertTrue(recommended_ids(self.user))
+
+    def test_rebuild_command_drops_users_without_seeds(self):
+        make_order([(self.printer, 1)], customer=self.user)
+        other = make_user()
+        UserRecommendation.objects.create(user=other, product=self.toner)
+
+        out = StringIO()
+        call_command('rebuild_user_recommendations', stdout=out)
+        self.assertEqual(recommended_ids(self.user)[:2], [self.toner.id, self.paper.id])
+        self.assertFalse(UserRecommendation.objects.filter(user=other).exists())
+        self.assertIn('1', out.getvalue())
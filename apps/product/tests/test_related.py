@@ -0,0 +1,72 @@
+from django.test import TestCase, override_settings
+from apps.product.models import ProductStats, RelatedProduct
+from .helpers import make_brand, make_category, make_feature_value, make_order, make_product, make_user, reset_caches
+
+
+def related_ids(product):
+    return list(RelatedProduct.objects.filter(product=product).order_by('-score', '-related_id').values_list(
+        'related_id', flat=True
+    ))
+
+
+@override_settings(ORDER_SALES_REFRESH_INTERVAL=0)
+class RelatedProductTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.brand = make_brand('HP')
+        self.printers = make_category('Printers')
+        self.laser = make_category('Laser')
+        self.product = make_product('HP 107a', brand=self.brand, categories=[self.printers, self.laser])
+        self.same_categories = make_product('Canon 6030', brand=make_brand('Canon'), categories=[self.printers, self.laser])
+        self.same_brand = make_product('HP 135w', brand=self.brand, categories=[self.printers])
+        self.unrelated = make_product('Toner', categories=[make_category('Supplies')])
+
+    def test_ranks_by_shared_categories_features_and_brand(self):
+        RelatedProduct.refresh_products([self.product.id])
+        # دو دسته مشترک (1.0) از یک دسته و برند مشترک (0.5 + 0.25) بیشتر است
+        self.assertEqual(related_ids(self.product), [self.same_categories.id, self.same_brand.id])
+
+        make_feature_value(self.product, 'سرعت', '20', [self.printers])
+        make_feature_value(self.same_brand, 'سرعت', '20', [self.printers])
+        RelatedProduct.refresh_products([self.product.id])
+        self.assertEqual(related_ids(self.product), [self.same_brand.id, self.same_categories.id])
+
+    def test_inactive_and_drive_products_are_excluded(self):
+        self.same_categories.isActive = False
+        self.same_categories.save()
+        make_product('Driver', brand=self.brand, categories=[self.printers], isDrive=True)
+        RelatedProduct.refresh_products([self.product.id])
+
+        self.assertEqual(related_ids(self.product), [self.same_brand.id])
+
+    def test_bought_together_is_refreshed_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            make_order([(self.product, 1), (self.unrelated, 1)])
+        # در مسیر پرداخت چیزی محاسبه نمی‌شود
+        self.assertFalse(RelatedProduct.objects.exists())
+        self.assertEqual(ProductStats.objects.get(product=self.product).total_sold, 0)
+
+        for callback in callbacks:
+            callback()
+        self.assertIn(self.unrelated.id, related_ids(self.product))
+        self.assertEqual(RelatedProduct.objects.get(product=self.unrelated, related=self.product).co_purchases, 1)
+        self.assertEqual(ProductStats.objects.get(product=self.product).total_sold, 1)
+
+    def test_unfinished_order_schedules_nothing(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            make_order([(self.product, 1)], customer=make_user(), finalize=False)
+        self.assertEqual(callbacks, [])
+
+    @override_settings(ORDER_SALES_REFRESH_INTERVAL=60)
+    def test_refreshes_are_batched_until_flush(self):
+        from apps.order import sales_refresh
+        with self.captureOnCommitCallbacks(execute=True):
+            make_order([(self.product, 1), (self.unrelated, 1)])
+            make_order([(self.same_brand, 2)])
+        self.assertFalse(RelatedProduct.objects.exists())
+
+        sales_refresh._buffer.timer.cancel()
+        sales_refresh._buffer.timer = None
+        self.assertEqual(sales_refresh.flush(), 5)
+        self.assertEqual(ProductStats.objects.get(product=self.same_brand).total_sold, 2)
+        self.assertTrue(RelatedProduct.objects.filter(product=self.unrelated, related=self.product).exists())
@@ -0,0 +1,57 @@
+import importlib
+from django.apps import apps
+from django.test import TestCase, override_settings
+from apps.product.models import ProductStats
+from .helpers import make_comment, make_order, make_product, make_vote, reset_caches
+
+
+def stats_row(product):
+    stats = ProductStats.objects.get(product=product)
+    return (stats.avg_rating, stats.comment_count, stats.likes, stats.unlikes, stats.total_sold)
+
+
+@override_settings(ORDER_SALES_REFRESH_INTERVAL=0)
+class ProductStatsTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.product = make_product()
+
+    def sell(self, qty, finalize=True):
+        # آمار فروش بعد از commit تراکنش نهایی شدن سفارش محاسبه می‌شود
+        with self.captureOnCommitCallbacks(execute=True):
+            return make_order([(self.product, qty)], finalize=finalize)
+
+    def test_signals_keep_stats_in_sync(self):
+        self.assertEqual(stats_row(self.product), (0, 0, 0, 0, 0))
+
+        first = make_comment(self.product, rating=5)
+        make_comment(self.product, rating=2)
+        make_comment(self.product, rating=1, is_active=False)
+        make_vote(first, like=True)
+        vote = make_vote(first, like=False)
+        self.sell(3)
+        self.sell(4, finalize=False)
+        self.assertEqual(stats_row(self.product), (3.5, 2, 1, 1, 3))
+
+        first.delete()
+        vote.delete()
+        self.assertEqual(stats_row(self.product), (2.0, 1, 0, 0, 3))
+
+    def test_rebuild_all_matches_signal_state(self):
+        make_vote(make_comment(self.product, rating=4), like=True)
+        self.sell(2)
+        expected = stats_row(self.product)
+
+        ProductStats.objects.all().delete()
+        ProductStats.rebuild_all()
+        self.assertEqual(stats_row(self.product), expected)
+
+    def test_migration_backfills_existing_products(self):
+        make_vote(make_comment(self.product, rating=3), like=True)
+        self.sell(5)
+        expected = stats_row(self.product)
+
+        ProductStats.objects.all().delete()
+        migration = importlib.import_module('apps.product.migrations.0003_productstats')
+        migration.fill_product_stats(apps, None)
+        self.assertEqual(stats_row(self.product), expected)
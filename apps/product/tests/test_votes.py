@@ -0,0 +1,64 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from apps.product.models import Comment, LikeOrUnlike, ProductStats
+from .helpers import make_comment, make_product, make_user, make_vote, reset_caches
+
+
+def counters(comment):
+    return Comment.objects.filter(pk=comment.pk).values_list('likes_count', 'unlikes_count').get()
+
+
+class CommentVoteTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.product = make_product()
+        self.comment = make_comment(self.product)
+        self.user = make_user()
+
+    def test_toggle_switches_and_clears_reaction(self):
+        vote, likes, unlikes = LikeOrUnlike.toggle(self.user, self.comment, 'like')
+        self.assertEqual((vote.like, vote.unlike, likes, unlikes), (True, False, 1, 0))
+
+        vote, likes, unlikes = LikeOrUnlike.toggle(self.user, self.comment, 'unlike')
+        self.assertEqual((vote.like, vote.unlike, likes, unlikes), (False, True, 0, 1))
+
+        vote, likes, unlikes = LikeOrUnlike.toggle(self.user, self.comment, 'unlike')
+        self.assertEqual((vote.like, vote.unlike, likes, unlikes), (False, False, 0, 0))
+        self.assertEqual(LikeOrUnlike.objects.filter(user=self.user).count(), 1)
+
+    def test_toggle_moves_product_stats_by_the_delta(self):
+        LikeOrUnlike.toggle(self.user, self.comment, 'like')
+        LikeOrUnlike.toggle(make_user(), self.comment, 'unlike')
+        LikeOrUnlike.toggle(self.user, self.comment, 'unlike')
+
+        stats = ProductStats.objects.get(product=self.product)
+        self.assertEqual((stats.likes, stats.unlikes), (0, 2))
+        self.assertEqual(counters(self.comment), (0, 2))
+
+    def test_deleting_a_vote_decrements_counters(self):
+        LikeOrUnlike.toggle(self.user, self.comment, 'like')
+        LikeOrUnlike.objects.get(user=self.user).delete()
+        self.assertEqual(counters(self.comment), (0, 0))
+
+    def test_endpoint_returns_counts_without_recounting(self):
+        url = reverse('product:like_unlike_comment', kwargs={'comment_id': self.comment.id})
+        self.assertEqual(self.client.post(url, {'action': 'like'}).status_code, 400)
+
+        self.client.force_login(self.user)
+        data = self.client.post(url, {'action': 'like'}).json()
+        self.assertEqual(
+            (data['likes_count'], data['unlikes_count'], data['user_liked'], data['user_unliked']),
+            (1, 0, True, False),
+        )
+
+    def test_reconcile_command_rebuilds_drifted_counters(self):
+        make_vote(self.comment, like=True)
+        make_vote(self.comment, like=False)
+        Comment.objects.filter(pk=self.comment.pk).update(likes_count=7, unlikes_count=0)
+
+        out = StringIO()
+        call_command('reconcile_comment_votes', stdout=out)
+        self.assertEqual(counters(self.comment), (1, 1))
+        self.assertIn('1', out.getvalue())
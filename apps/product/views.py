@@ -20,46 +20,17 @@ def category_group_view(request):
 
 from django.db.models import Count, Case, When, F, Avg, FloatField
 from .models import Product, Comment, LikeOrUnlike
+from .cards import build_product_cards, build_product_cards_json
+from apps.main.partials import render_page
 
 def latest_products_view(request):
     """
     Fetches the 20 latest products with their calculated ratings and available colors.
     """
-    # Use Prefetch to optimize database queries for related data
-    products = Product.objects.filter(isActive=True).order_by('-createAt')[:20]
-
-    product_list = []
-    for product in products:
-
-        likes_count = LikeOrUnlike.objects.filter(product=product, like=True).count()
-        unlikes_count = LikeOrUnlike.objects.filter(product=product, unlike=True).count()
-        total_votes = likes_count + unlikes_count
-
-        comments = Comment.objects.filter(product=product, isActive=True)
-        comments_count = comments.count()
-
-
-        if total_votes > 0:
-            rating = 4 + (likes_count - unlikes_count) / (total_votes * 10)
-            rating = max(3.5, min(rating, 5.0)) # Clamp between 3.5 and 5.0
-        else:
-            rating = 4.0
-        colors = product.features_value.filter(feature__title='رنگ').values_list('value', flat=True)
-
-        product_data = {
-            'product': product,
-            'image_url': product.image.url if product.image else '',
-            'short_title': product.title,
-            'brand': product.brand.title,
-            'price': product.price,
-            'colors': colors,
-            'rating': round(rating, 1),
-            'comments_count': comments_count,
-        }
-        product_list.append(product_data)
+    products = Product.objects.filter(isActive=True).order_by('-createAt').with_card_data()[:20]
 
     context = {
-        'products': product_list,
+        'products': build_product_cards(products),
     }
     return render(request, 'product_app/recently_product.html', context)
 
@@ -92,62 +63,19 @@ from apps.user.models import CustomUser
 from django.db.models import Avg
 from django.shortcuts import get_object_or_404
 from django.db.models import Prefetch
+from .detail import ProductDetailContextMixin
+from .comments import load_comment_tree
 
-class ProductDetailView(DetailView):
+class ProductDetailView(ProductDetailContextMixin, DetailView):
     model = Product
     template_name = 'product_app/product_detail.html'
     context_object_name = 'product'
 
-    def get_object(self, queryset=None):
-        slug = self.kwargs.get('slug')
-        return get_object_or_404(
-            Product.objects.select_related('brand')
-                           .prefetch_related(
-                               'categories',
-                               'gallery',
-                               Prefetch(
-                                   'comments',
-                                   queryset=Comment.objects.filter(isActive=True)
-                                   .select_related('user')
-                                   .prefetch_related('replies')
-                               )
-                           )
-                           .filter(isActive=True),
-            slug=slug
-        )
-
     def get_context_data(self, **kwargs):
+        # امتیاز، تعداد نظرات و پیشنهادها، گالری، ویژگی‌ها و محصولات مرتبط (apps.product.detail)
         context = super().get_context_data(**kwargs)
         product = self.object
 
-        # محاسبه امتیاز متوسط محصول
-        comments = product.comments.filter(isActive=True)
-        if comments.exists():
-            avg_rating = comments.aggregate(avg=Avg('rating'))['avg']
-            context['average_rating'] = round(avg_rating, 1)
-        else:
-            context['average_rating'] = 0
-
-        # تعداد نظرات
-        context['comments_count'] = comments.count()
-
-        # تعداد پیشنهادها
-        context['suggest_count'] = comments.filter(is_suggest=True).count()
-
-        # گالری محصول
-        context['gallery'] = product.gallery.all()
-
-        # محصولات مرتبط (همان دسته‌بندی)
-        related_products = Product.objects.filter(
-            categories__in=product.categories.all(),
-            isActive=True
-        ).exclude(id=product.id).distinct()[:8]
-        context['related_products'] = related_products
-
-        # ویژگی‌های محصول
-        features = product.features_value.select_related('feature', 'filterValue').all()
-        context['features'] = features
-
         # ========================
         # اضافه کردن متاتگ
         # ========================
@@ -210,36 +138,11 @@ def add_comment(request, product_slug):
 # ویو برای لایک/دیسلایک
 def like_unlike_comment(request, comment_id):
     if request.method == 'POST' and request.user.is_authenticated:
-        comment = get_object_or_404(Comment, id=comment_id)
+        comment = get_object_or_404(Comment.objects.only('id', 'product_id'), id=comment_id)
         action = request.POST.get('action')  # 'like' or 'unlike'
 
-        # بررسی آیا کاربر قبلا روی این نظر واکنش داشته یا نه
-        like_unlike, created = LikeOrUnlike.objects.get_or_create(
-            user=request.user,
-            comment=comment,
-            product=comment.product
-        )
-
-        if action == 'like':
-            if like_unlike.like:
-                # اگر قبلا لایک کرده، لایک را برمی‌دارد
-                like_unlike.like = False
-            else:
-                like_unlike.like = True
-                like_unlike.unlike = False
-        elif action == 'unlike':
-            if like_unlike.unlike:
-                # اگر قبلا دیسلایک کرده، دیسلایک را برمی‌دارد
-                like_unlike.unlike = False
-            else:
-                like_unlike.unlike = True
-                like_unlike.like = False
-
-        like_unlike.save()
-
-        # تعداد لایک‌ها و دیسلایک‌های فعلی
-        likes_count = comment.likes.filter(like=True).count()
-        unlikes_count = comment.likes.filter(unlike=True).count()
+        # ثبت واکنش و بروزرسانی شمارنده‌های نظر در یک تراکنش
+        like_unlike, likes_count, unlikes_count = LikeOrUnlike.toggle(request.user, comment, action)
 
         return JsonResponse({
             'success': True,
@@ -254,55 +157,18 @@ def like_unlike_comment(request, comment_id):
         'message': 'خطا در ثبت واکنش'
     }, status=400)
 
-# ویو برای دریافت نظرات با صفحه‌بندی
+# ویو برای دریافت نظرات با صفحه‌بندی (cursor)
 def get_comments_ajax(request, product_slug):
     if request.method == 'GET':
         product = get_object_or_404(Product, slug=product_slug, isActive=True)
-        page = int(request.GET.get('page', 1))
-        comments_per_page = 5
-
-        # نظرات والد (بدون parent)
-        comments = product.comments.filter(
-            isActive=True,
-            parent__isnull=True
-        ).select_related('user').prefetch_related('replies')
-
-        # محاسبه صفحه‌بندی
-        total_comments = comments.count()
-        start_index = (page - 1) * comments_per_page
-        end_index = start_index + comments_per_page
-
-        comments_page = comments[start_index:end_index]
-
-        # ساختار داده‌ای برای پاسخ
-        comments_data = []
-        for comment in comments_page:
-            comment_data = {
-                'id': comment.id,
-                'user_name': comment.user.get_full_name() or comment.user.username,
-                'text': comment.text,
-                'is_suggest': comment.is_suggest,
-                'created_at': comment.get_jalali_date(),
-                'replies': []
-            }
-
-            # پاسخ‌های این نظر
-            for reply in comment.replies.filter(isActive=True):
-                reply_data = {
-                    'id': reply.id,
-                    'user_name': reply.user.get_full_name() or reply.user.name,
-                    'text': reply.text,
-                    'created_at': reply.get_jalali_date(),
-                }
-                comment_data['replies'].append(reply_data)
 
-            comments_data.append(comment_data)
+        # نظرات سطح اول همراه درخت پاسخ‌ها و تعداد لایک/دیسلایک (apps.product.comments)
+        comments_data, next_cursor = load_comment_tree(product, request.GET.get('cursor'))
 
         return JsonResponse({
             'comments': comments_data,
-            'has_next': end_index < total_comments,
-            'current_page': page,
-            'total_pages': (total_comments + comments_per_page - 1) // comments_per_page
+            'has_next': next_cursor is not None,
+            'next_cursor': next_cursor,
         })
 
 # -------------------------- shop ------------------------------
@@ -314,42 +180,12 @@ def best_selling_products_view(request):
     """
     # محاسبه تعداد فروش هر محصول
     best_selling_products = Product.objects.filter(
-        orderItems__order__isFinally=True
-    ).annotate(
-        total_sold=Sum('orderItems__qty')
-    ).filter(
-        total_sold__gt=0
-    ).order_by('-total_sold')[:20]
-
-    product_list = []
-    for product in best_selling_products:
-        likes_count = LikeOrUnlike.objects.filter(product=product, like=True).count()
-        unlikes_count = LikeOrUnlike.objects.filter(product=product, unlike=True).count()
-        total_votes = likes_count + unlikes_count
-
-        comments = Comment.objects.filter(product=product, isActive=True)
-        comments_count = comments.count()
-
-        if total_votes > 0:
-            rating = 4 + (likes_count - unlikes_count) / (total_votes * 10)
-            rating = max(3.5, min(rating, 5.0))  # Clamp between 3.5 and 5.0
-        else:
-            rating = 4.0
+        stats__total_sold__gt=0
+    ).order_by('-stats__total_sold').with_card_data()[:20]
 
-        colors = product.features_value.filter(feature__title='رنگ').values_list('value', flat=True)
-
-        product_data = {
-            'product': product,
-            'image_url': product.image.url if product.image else '',
-            'short_title': product.title,
-            'brand': product.brand.title,
-            'price': product.price,
-            'colors': colors,
-            'rating': round(rating, 1),
-            'comments_count': comments_count,
-            'total_sold': product.total_sold,  # تعداد فروش
-        }
-        product_list.append(product_data)
+    product_list = build_product_cards(best_selling_products)
+    for product_data in product_list:
+        product_data['total_sold'] = product_data['product'].stats.total_sold  # تعداد فروش
 
     context = {
         'products': product_list,
@@ -383,16 +219,7 @@ def show_brand_products(request, *args, **kwargs):
     products = Product.objects.filter(
         isActive=True,
         brand=brand
-    ).select_related('brand').prefetch_related(
-        'features_value',
-        'features_value__filterValue'
-    )
-
-    # محدوده قیمت
-    result_price = products.aggregate(
-        max_price=Max('price'),
-        min_price=Min('price')
-    )
+    ).with_final_price()
 
     # اعمال فیلترها
     filter_obj = ProductFilter(request.GET, queryset=products)
@@ -405,53 +232,30 @@ def show_brand_products(request, *args, **kwargs):
             features_value__filterValue__id__in=feature_filter
         ).distinct()
 
-    # مرتب‌سازی
-    sort = request.GET.get('sort')
-    if sort == '1':
-        products = products.order_by('-createAt')
-    elif sort == '2':
-        products = products.order_by('-price')
-    elif sort == '3':
-        products = products.order_by('price')
-    elif sort == '4':
-        products = products.annotate(
-            total_sold=Sum('orders_details_product__qty')
-        ).order_by('-total_sold')
-    else:
-        products = products.order_by('-createAt')
-
-    # پیجینیشن
-    paginator = Paginator(products, 8)
-    page_obj = paginator.get_page(page_number)
+    sort = normalize_sort(request.GET.get('sort'))
 
-    # پاسخ AJAX برای Load More
+    # پاسخ AJAX برای Load More (keyset با cursor، بدون COUNT و OFFSET)
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-        products_data = []
-        for product in page_obj:
-            product_data = {
-                'id': product.id,
-                'title': product.title,
-                'brand': product.brand.title,
-                'image_url': product.image.url if product.image else '',
-                'price': product.price,
-                'avg_rating': product.avg_rating,
-                'comments_count': product.comments.count(),
-                'url': product.get_absolute_url(),
-                'colors': []
-            }
-
-            for feature in product.features_value.all():
-                if feature.feature.title == "رنگ" and feature.filterValue:
-                    product_data['colors'].append({'value': feature.filterValue.value})
-
-            products_data.append(product_data)
-
+        page_products, next_cursor = keyset_page(
+            products.with_card_data(), sort, request.GET.get('cursor'), BRAND_PAGE_SIZE
+        )
         return JsonResponse({
-            'products': products_data,
-            'has_next': page_obj.has_next(),
-            'next_page_number': page_obj.next_page_number() if page_obj.has_next() else None
+            'products': build_product_cards_json(page_products),
+            'has_next': next_cursor is not None,
+            'next_cursor': next_cursor,
         })
 
+    # مرتب‌سازی و پیجینیشن صفحه HTML
+    paginator = Paginator(order_by_sort(products, sort).with_card_data(), BRAND_PAGE_SIZE)
+    page_obj = paginator.get_page(page_number)
+    next_cursor = cursor_for(page_obj[-1], sort) if page_obj.has_next() else None
+
+    # محدوده قیمت (همه محصولات برند، بدون فیلترها)
+    result_price = filter_obj.queryset.aggregate(
+        max_price=Max('final_price'),
+        min_price=Min('final_price')
+    )
+
     # متاتگ برند
     meta_context = {}
     if hasattr(brand, 'meta_tag'):
@@ -460,13 +264,14 @@ def show_brand_products(request, *args, **kwargs):
     # پاسخ HTML
     context = {
         'products': page_obj,
+        'next_cursor': next_cursor,
         'result_price': result_price,
         'brand': brand,
         'filter': filter_obj,
         **meta_context,  # اضافه شدن متاتگ‌ها به context
     }
 
-    return render(request, 'product_app/brand_products.html', context)
+    return render_page(request, 'product_app/brand_products.html', context)
 
 
 
@@ -509,6 +314,26 @@ from django.http import JsonResponse
 from django.db.models import Max, Min, Sum
 from .models import Product, Category, MetaTag
 from .filters import ProductFilter
+from .facets import get_category_index
+from .pagination import cursor_for, decode_cursor, keyset_page, normalize_sort, order_by_sort
+
+SHOP_PAGE_SIZE = 4
+BRAND_PAGE_SIZE = 8
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _products_in_order(product_ids):
+    """محصولات با داده کارت به همان ترتیب شناسه‌های داده شده"""
+    products = Product.objects.filter(id__in=product_ids).with_card_data().in_bulk()
+    return [products[pk] for pk in product_ids if pk in products]
+
+
 def show_by_filter(request, *args, **kwargs):
     """نمایش محصولات با فیلترهای اعمال‌شده"""
     slug = kwargs['slug']
@@ -517,126 +342,65 @@ def show_by_filter(request, *args, **kwargs):
     # شماره صفحه از درخواست
     page_number = request.GET.get('page', 1)
 
-    # کوئری پایه محصولات فعال در این دسته
-    products = Product.objects.filter(
-        isActive=True,
-        categories=group
-    ).select_related('brand').prefetch_related(
-        'features_value',
-        'features_value__filterValue'
-    ).distinct()
+    # ایندکس فیلترهای دسته (فیلتر، مرتب‌سازی و شمارش در حافظه)
+    index = get_category_index(group)
 
     # محدوده قیمت کل محصولات برای نمایش در اسلایدر
-    result_price = products.aggregate(
-        max_price=Max('price'),
-        min_price=Min('price')
-    )
+    result_price = index.price_range()
 
-    # اعمال فیلترهای django-filter
-    filter_obj = ProductFilter(request.GET, queryset=products)
-    products = filter_obj.qs
+    # فیلتر django-filter (قیمت پایه کمتر یا مساوی)
+    filter_obj = ProductFilter(request.GET, queryset=Product.objects.none())
+    max_base_price = filter_obj.form.cleaned_data.get('price') if filter_obj.form.is_valid() else None
 
     # ✅ فیلتر محدوده قیمت
-    price_min = request.GET.get('price_min')
-    price_max = request.GET.get('price_max')
-
-    if price_min and price_max:
-        try:
-            price_min = int(price_min)
-            price_max = int(price_max)
-            products = products.filter(price__gte=price_min, price__lte=price_max)
-        except ValueError:
-            pass
-    elif price_min:
-        try:
-            price_min = int(price_min)
-            products = products.filter(price__gte=price_min)
-        except ValueError:
-            pass
-    elif price_max:
-        try:
-            price_max = int(price_max)
-            products = products.filter(price__lte=price_max)
-        except ValueError:
-            pass
-
-    # ✅ اصلاح شده: فیلتر ویژگی‌ها با منطق OR
-    feature_filter = request.GET.getlist('feature')
-    if feature_filter:
-        # استفاده از Q objects برای منطق OR
-        from django.db.models import Q
-        feature_query = Q()
-        for f_id in feature_filter:
-            feature_query |= Q(features_value__filterValue__id=f_id)
-        products = products.filter(feature_query).distinct()
-
-    # ✅ فیلتر برند
-    brand_filter = request.GET.getlist('brand')
-    if brand_filter:
-        products = products.filter(brand__id__in=brand_filter)
-
-    # مرتب‌سازی
-    sort = request.GET.get('sort')
-    if sort == '1':
-        products = products.order_by('-createAt')  # جدیدترین
-    elif sort == '2':
-        products = products.order_by('-price')      # گران‌ترین
-    elif sort == '3':
-        products = products.order_by('price')       # ارزان‌ترین
-    elif sort == '4':
-        products = products.annotate(
-            total_sold=Sum('orders_details_product__qty')
-        ).order_by('-total_sold')                   # پرفروش‌ترین
-    else:
-        products = products.order_by('-createAt')
-
-    # صفحه‌بندی
-    paginator = Paginator(products, 4)
-    page_obj = paginator.get_page(page_number)
-
-    # ✅ بهبود: ساخت feature_dict برای نمایش در فیلترها
-    from django.db.models import Count
-    feature_dict = {}
-    features_in_category = Feature.objects.filter(categories=group)
-
-    for feature in features_in_category:
-        # فقط مقادیری که در محصولات فعلی وجود دارند
-        values = FeatureValue.objects.filter(
-            feature=feature,
-            productfeature__product__in=products
-        ).annotate(
-            product_count=Count('productfeature__product')
-        ).filter(product_count__gt=0).distinct()
+    price_min = _int_or_none(request.GET.get('price_min'))
+    price_max = _int_or_none(request.GET.get('price_max'))
+
+    # ✅ فیلتر ویژگی‌ها با منطق OR و فیلتر برند
+    feature_filter = [value for value in map(_int_or_none, request.GET.getlist('feature')) if value is not None]
+    brand_filter = [value for value in map(_int_or_none, request.GET.getlist('brand')) if value is not None]
+
+    matched = index.filter(
+        value_ids=feature_filter,
+        brand_ids=brand_filter,
+        price_min=price_min,
+        price_max=price_max,
+        max_base_price=max_base_price,
+    )
 
-        if values.exists():
-            feature_dict[feature] = values
+    sort = normalize_sort(request.GET.get('sort'))
 
-    # پاسخ برای AJAX
+    # پاسخ برای AJAX (Load More با cursor)
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-        products_data = []
-        for product in page_obj:
-            product_data = {
-                'id': product.id,
-                'title': product.title,
-                'brand': product.brand.title,
-                'image_url': product.image.url if product.image else '',
-                'price': product.price,
-                'avg_rating': product.avg_rating,
-                'comments_count': product.comments.count(),
-                'url': product.get_absolute_url(),
-                'colors': []
-            }
-            for feature in product.features_value.all():
-                if feature.feature.title == "رنگ":
-                    product_data['colors'].append({'value': feature.filterValue.value})
-            products_data.append(product_data)
-
+        key = decode_cursor(request.GET.get('cursor'), sort)
+        rows = index.rows_after(matched, sort, key, limit=SHOP_PAGE_SIZE + 1)
+        next_cursor = cursor_for(rows[SHOP_PAGE_SIZE - 1], sort) if len(rows) > SHOP_PAGE_SIZE else None
+        products = _products_in_order([row['id'] for row in rows[:SHOP_PAGE_SIZE]])
         return JsonResponse({
-            'products': products_data,
-            'has_next': page_obj.has_next(),
-            'next_page_number': page_obj.next_page_number() if page_obj.has_next() else None
+            'products': build_product_cards_json(products),
+            'has_next': next_cursor is not None,
+            'next_cursor': next_cursor,
         })
 
+    # مرتب‌سازی و صفحه‌بندی روی ردیف‌های ایندکس؛ فقط محصولات همین صفحه از دیتابیس خوانده می‌شوند
+    paginator = Paginator(index.sorted_rows(matched, sort), SHOP_PAGE_SIZE)
+    page_obj = paginator.get_page(page_number)
+    page_rows = page_obj.object_list
+    next_cursor = cursor_for(page_rows[-1], sort) if page_obj.has_next() else None
+    page_obj.object_list = _products_in_order([row['id'] for row in page_rows])
+
+    # ✅ ساخت feature_dict برای نمایش در فیلترها (فقط مقادیری که در محصولات فعلی وجود دارند)
+    value_counts = index.value_counts(matched)
+    values_by_feature = {}
+    for value in FeatureValue.objects.filter(id__in=value_counts):
+        value.product_count = value_counts[value.id]
+        values_by_feature.setdefault(value.feature_id, []).append(value)
+
+    feature_dict = {}
+    for feature in Feature.objects.filter(categories=group):
+        if feature.id in values_by_feature:
+            feature_dict[feature] = values_by_feature[feature.id]
+
     # متاتگ‌ها
     try:
         meta_tag = group.meta_tag
@@ -661,6 +425,7 @@ def show_by_filter(request, *args, **kwargs):
     # داده‌ها برای قالب
     context = {
         'products': page_obj,
+        'next_cursor': next_cursor,
         'result_price': result_price,
         'slug': slug,
         'group': group,
@@ -671,7 +436,7 @@ def show_by_filter(request, *args, **kwargs):
         **meta_context
     }
 
-    return render(request, 'product_app/shop.html', context)
+    return render_page(request, 'product_app/shop.html', context)
 
 
 
@@ -681,13 +446,12 @@ def get_categories_menu(request):
     دریافت دسته‌بندی‌های اصلی برای منوی ساده
     """
     try:
-        # دریافت فقط دسته‌بندی‌های اصلی (سطح اول)
-        main_categories = Category.objects.filter(
-            parent__isnull=True,
-            isActive=True
-        ).annotate(
-            product_count=Count('products')
-        ).order_by('-product_count', 'title')[:8]
+        # دریافت فقط دسته‌بندی‌های اصلی (سطح اول) با تعداد محصولات کل زیردرخت
+        subtree_counts = Category.subtree_product_counts()
+        main_categories = sorted(
+            Category.objects.filter(parent__isnull=True, isActive=True),
+            key=lambda category: (-subtree_counts.get(category.id, 0), category.title)
+        )[:8]
 
         categories_data = []
 
@@ -696,7 +460,7 @@ def get_categories_menu(request):
                 'id': category.id,
                 'title': category.title,
                 'slug': category.slug,
-                'product_count': category.product_count,
+                'product_count': subtree_counts.get(category.id, 0),
             })
 
         return JsonResponse({
@@ -717,6 +481,7 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
 from .models import Wishlist, Product
+from .cards import product_card
 
 @login_required
 @require_POST
@@ -782,22 +547,25 @@ def remove_from_wishlist(request, product_id):
 @login_required
 def wishlist_view(request):
     """صفحه علاقه‌مندی‌های کاربر"""
-    wishlist_items = Wishlist.objects.filter(user=request.user).select_related('product')
+    wishlist_items = Wishlist.objects.filter(user=request.user).prefetch_related(
+        Prefetch('product', queryset=Product.objects.with_card_data())
+    )
 
     # محاسبه اطلاعات محصولات
     wishlist_products = []
     for item in wishlist_items:
         product = item.product
+        card = product_card(product)
         wishlist_products.append({
             'id': product.id,
             'title': product.title,
-            'image_url': product.image.url if product.image else '',
-            'brand': product.brand.title,
+            'image_url': card['image_url'],
+            'brand': card['brand'],
             'price': product.price,
-            'final_price': product.get_price_by_discount(),
-            'discount_percentage': product.get_discount_percentage(),
+            'final_price': card['final_price'],
+            'discount_percentage': card['discount_percentage'],
             'rating': product.avg_rating,
-            'comments_count': product.comments.count(),
+            'comments_count': card['comments_count'],
             'url': product.get_absolute_url(),
             'added_date': item.created_at
         })
@@ -0,0 +1,169 @@
+# analytics.py
+# ثبت تاخیری (write-behind) تاریخچه جستجو و شمارنده جستجوهای پرتکرار
+#
+# رویدادهای جستجو به جای نوشتن در دیتابیس در مسیر درخواست، در حافظه worker جمع
+# می‌شوند و هر SEARCH_ANALYTICS_FLUSH_INTERVAL ثانیه یا با رسیدن به
+# SEARCH_ANALYTICS_BATCH_SIZE رویداد یکجا نوشته می‌شوند: تاریخچه با bulk_create و
+# شمارنده‌ها با یک UPDATE ... count = count + n برای هر مقدار n.
+# شمارنده جستجوهای پرتکرار روی عبارت یکسان‌سازی شده (normalize_phrase) نگه داشته می‌شود
+# تا «Samsung»، «samsung» و املاهای عربی و فارسی یک ردیف باشند.
+# تعداد hit و miss کش نتایج جستجو (apps.search.results_cache) هم در همین بافر جمع و
+# با همان نوشتن گروهی به ردیف مشترک SearchCacheStats اضافه می‌شود.
+# هنگام خروج پردازه رویدادهای باقی مانده نوشته می‌شوند (atexit).
+#
+# در settings:  SEARCH_ANALYTICS_FLUSH_INTERVAL = 30  (0 یعنی نوشتن فوری)
+#               SEARCH_ANALYTICS_BATCH_SIZE = 500
+import atexit
+import logging
+import threading
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import SearchHistory, PopularSearch, SearchCacheStats
+from .text import normalize_phrase
+
+logger = logging.getLogger(__name__)
+
+
+def flush_interval():
+    return getattr(settings, 'SEARCH_ANALYTICS_FLUSH_INTERVAL', 30)
+
+
+def batch_size():
+    return getattr(settings, 'SEARCH_ANALYTICS_BATCH_SIZE', 500)
+
+
+class SearchEventBuffer:
+    """بافر رویدادهای جستجوی یک worker"""
+
+    def __init__(self):
+        self.history = []    # ردیف‌های SearchHistory
+        self.counts = {}     # عبارت یکسان‌سازی شده -> [تعداد، آخرین زمان]
+        self.lookups = {'hits': 0, 'misses': 0}   # کش نتایج جستجو
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.timer = None
+
+    def record(self, query, user=None, session_key=None, results_count=None):
+        now = timezone.now()
+        with self.lock:
+            # جستجوی مهمان بدون نشست هم برای آمار ترند و جستجوهای بدون نتیجه ثبت می‌شود
+            self.history.append(SearchHistory(
+                user_id=user.pk if user is not None else None,
+                session_key=session_key if user is None else None,
+                query=query,
+                created_at=now,
+                results_count=results_count,
+            ))
+            key = normalize_phrase(query)
+            if key:
+                entry = self.counts.setdefault(key, [0, now])
+                entry[0] += 1
+                entry[1] = now
+            pending = len(self.history) + len(self.counts)
+
+        interval = flush_interval()
+        if not interval or pending >= batch_size():
+            self.flush()
+        else:
+            self._schedule(interval)
+
+    def record_lookup(self, name):
+        """شمارش یک hit یا miss کش نتایج جستجو"""
+        with self.lock:
+            self.lookups[name] += 1
+        interval = flush_interval()
+        if not interval:
+            self.flush()
+        else:
+            self._schedule(interval)
+
+    def _schedule(self, interval):
+        with self.lock:
+            if self.timer is not None:
+                return
+            self.timer = threading.Timer(interval, self._flush_from_timer)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def _flush_from_timer(self):
+        with self.lock:
+            self.timer = None
+        try:
+            self.flush()
+        finally:
+            # اتصال دیتابیس این thread بسته می‌شود
+            connections.close_all()
+
+    def flush(self):
+        """نوشتن رویدادهای بافر؛ خروجی: تعداد رویدادهای نوشته شده"""
+        with self.flush_lock:
+            with self.lock:
+                history, counts, lookups = self.history, self.counts, self.lookups
+                self.history, self.counts, self.lookups = [], {}, {'hits': 0, 'misses': 0}
+            if not history and not counts and not any(lookups.values()):
+                return 0
+            try:
+                write_events(history, counts, lookups)
+            except Exception:
+                # آمار جستجو نباید درخواست یا خروج پردازه را خراب کند
+                logger.exception('Flushing %d search events failed', len(history) + len(counts))
+                return 0
+            return len(history) + sum(count for count, _ in counts.values()) + sum(lookups.values())
+
+
+def write_events(history, counts, lookups=None):
+    size = batch_size()
+    with transaction.atomic():
+        SearchHistory.objects.bulk_create(history, batch_size=size)
+        if lookups:
+            SearchCacheStats.add(**lookups)
+        if not counts:
+            return
+
+        # ردیف‌های جدید با تعداد صفر ساخته می‌شوند تا همه با یک مسیر (F) افزایش پیدا کنند؛
+        # ignore_conflicts ردیفی که worker دیگری همزمان ساخته را دوباره نمی‌سازد
+        # (کلید دوباره یکسان‌سازی می‌شود چون collation دیتابیس ممکن است به حروف بزرگ و کوچک حساس نباشد)
+        existing = {
+            normalize_phrase(query): search_id
+            for search_id, query in PopularSearch.objects.filter(query__in=list(counts)).values_list('id', 'query')
+        }
+        missing = [key for key in counts if key not in existing]
+        if missing:
+            PopularSearch.objects.bulk_create(
+                [PopularSearch(query=key, count=0) for key in missing],
+                batch_size=size, ignore_conflicts=True,
+            )
+            existing.update({
+                normalize_phrase(query): search_id
+                for search_id, query in PopularSearch.objects.filter(query__in=missing).values_list('id', 'query')
+            })
+
+        # یک UPDATE برای همه عبارت‌هایی که به یک اندازه افزایش پیدا کرده‌اند
+        by_increment = {}
+        for key, (count, last_searched) in counts.items():
+            if key in existing:
+                ids, latest = by_increment.get(count, ([], last_searched))
+                ids.append(existing[key])
+                by_increment[count] = (ids, max(latest, last_searched))
+        for count, (ids, last_searched) in by_increment.items():
+            PopularSearch.objects.filter(id__in=ids).update(count=F('count') + count, last_searched=last_searched)
+
+
+_buffer = SearchEventBuffer()
+atexit.register(_buffer.flush)
+
+
+def record_search(query, user=None, session_key=None, results_count=None):
+    """ثبت یک جستجو (کاربر وارد شده یا نشست مهمان) و تعداد نتایج آن در بافر"""
+    _buffer.record(query, user=user, session_key=session_key, results_count=results_count)
+
+
+def record_cache_lookup(name):
+    """ثبت hit یا miss کش نتایج جستجو در بافر ('hits' یا 'misses')"""
+    _buffer.record_lookup(name)
+
+
+def flush():
+    return _buffer.flush()
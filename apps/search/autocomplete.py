@@ -0,0 +1,267 @@
+# autocomplete.py
+# ایندکس پیشوندی پیشنهادهای جستجوی هدر در حافظه
+#
+# برای عنوان محصولات (همراه نام برند)، عنوان دسته‌بندی‌ها و جستجوهای پرتکرار از
+# ابتدای هر کلمه یک کلید یکسان‌سازی شده ساخته می‌شود و کلیدها در یک آرایه مرتب نگه
+# داشته می‌شوند؛ پیشنهادهای هر عبارت با bisect و پیمایش کلیدهای هم‌پیشوند پیدا
+# می‌شوند و دیتابیس فقط برای داده کارت محصولات نهایی استفاده می‌شود.
+#
+# مثل ایندکس فیلترها (apps.product.facets) ایندکس در حافظه هر worker ساخته می‌شود؛
+# سیگنال‌ها ایندکس همان worker را جزئی بروزرسانی می‌کنند و با بالا بردن نسخه در دیتابیس
+# (main.CacheVersion) بقیه workerها ایندکس را در درخواست بعدی از نو می‌سازند. ایندکس سه‌حرفی تطبیق تقریبی
+# (apps.search.fuzzy) هم بخشی از همین ایندکس است. ایندکس با اولین درخواست
+# worker ساخته می‌شود و جستجوهای پرتکرار هر REBUILD_INTERVAL ثانیه دوباره خوانده می‌شوند.
+import bisect
+import heapq
+import logging
+import threading
+import time
+from apps.main.models import CacheVersion
+from apps.product.models import Product, Category
+from .fuzzy import TrigramIndex, product_terms
+from .models import PopularSearch
+from .text import normalize_phrase
+
+KIND_PRODUCT = 'product'
+KIND_CATEGORY = 'category'
+KIND_QUERY = 'query'
+
+VERSION_KEY = 'autocomplete_index'
+REBUILD_INTERVAL = 60 * 10
+POPULAR_SEARCH_LIMIT = 5000
+# حداکثر کلیدهای بررسی شده برای یک پیشوند کوتاه (سقف زمان پاسخ)
+MAX_SCAN = 3000
+SUGGEST_BUDGET_SECONDS = 0.001
+
+logger = logging.getLogger(__name__)
+
+_index = None
+_lock = threading.Lock()
+
+
+def word_suffixes(phrase):
+    """کلید از ابتدای هر کلمه: «galaxy s20» -> «galaxy s20»، «s20»"""
+    words = phrase.split(' ')
+    return [' '.join(words[start:]) for start in range(len(words)) if words[start]]
+
+
+class AutocompleteIndex:
+    """آرایه مرتب کلیدها به همراه داده نمایشی هر مورد"""
+
+    def __init__(self, version):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.keys = []     # لیست مرتب (کلید، نوع، id)
+        self.items = {}    # (نوع، id) -> (وزن، داده نمایشی)
+        self.item_keys = {}  # (نوع، id) -> کلیدهای ثبت شده
+        self.fuzzy = TrigramIndex()
+        self.lock = threading.RLock()
+
+    # ---------------------- ساخت و بروزرسانی ----------------------
+
+    @classmethod
+    def build(cls, version):
+        index = cls(version)
+        entries = []
+        entries.extend(product_entries())
+        entries.extend(category_entries())
+        entries.extend(popular_search_entries())
+        for kind, item_id, phrases, weight, data in entries:
+            index._add(kind, item_id, phrases, weight, data, sort=False)
+        index.keys.sort()
+        index.fuzzy = TrigramIndex.build(product_terms())
+        return index
+
+    def _add(self, kind, item_id, phrases, weight, data, sort=True):
+        item = (kind, item_id)
+        keys = set()
+        for phrase in phrases:
+            keys.update(word_suffixes(normalize_phrase(phrase)))
+        self.items[item] = (weight, data)
+        self.item_keys[item] = keys
+        for key in keys:
+            if sort:
+                bisect.insort(self.keys, (key, kind, item_id))
+            else:
+                self.keys.append((key, kind, item_id))
+
+    def _remove(self, kind, item_id):
+        item = (kind, item_id)
+        for key in self.item_keys.pop(item, ()):
+            position = bisect.bisect_left(self.keys, (key, kind, item_id))
+            if position < len(self.keys) and self.keys[position] == (key, kind, item_id):
+                del self.keys[position]
+        self.items.pop(item, None)
+
+    def replace(self, kind, entries, item_ids):
+        """جایگزینی موردهای داده شده (موردهایی که دیگر entry ندارند حذف می‌شوند)"""
+        with self.lock:
+            for item_id in item_ids:
+                self._remove(kind, item_id)
+            for entry_kind, item_id, phrases, weight, data in entries:
+                self._add(entry_kind, item_id, phrases, weight, data)
+
+    # ---------------------- جستجو ----------------------
+
+    def search(self, query, limits):
+        """
+        موردهای هر نوع که کلیدشان با عبارت شروع می‌شود، به ترتیب وزن.
+        limits: {نوع: تعداد}؛ خروجی: ({نوع: [داده]}, {نوع: تعداد کل یافته‌ها})
+        """
+        prefix = normalize_phrase(query)
+        matches = {kind: set() for kind in limits}
+        results, totals = {}, {}
+        with self.lock:
+            if prefix:
+                position = bisect.bisect_left(self.keys, (prefix,))
+                for key, kind, item_id in self.keys[position:position + MAX_SCAN]:
+                    if not key.startswith(prefix):
+                        break
+                    if kind in matches:
+                        matches[kind].add(item_id)
+
+            for kind, item_ids in matches.items():
+                best = heapq.nlargest(
+                    limits[kind], item_ids, key=lambda item_id: (self.items[(kind, item_id)][0], item_id)
+                )
+                results[kind] = [self.items[(kind, item_id)][1] for item_id in best]
+                totals[kind] = len(item_ids)
+        return results, totals
+
+    def is_expired(self):
+        return time.monotonic() - self.built_at > REBUILD_INTERVAL
+
+
+# ---------------------- داده موردها ----------------------
+
+def product_entries(product_ids=None):
+    products = Product.objects.filter(isActive=True)
+    if product_ids is not None:
+        products = products.filter(id__in=product_ids)
+    rows = products.values_list('id', 'title', 'brand__title', 'stats__total_sold')
+    return [
+        (KIND_PRODUCT, product_id, [title, f'{brand_title} {title}' if brand_title else title], sold or 0, product_id)
+        for product_id, title, brand_title, sold in rows
+    ]
+
+
+def category_entries(category_ids=None):
+    categories = Category.objects.filter(isActive=True).only('id', 'title', 'slug', 'image')
+    if category_ids is not None:
+        categories = categories.filter(id__in=category_ids)
+    counts = Category.subtree_product_counts()
+    entries = []
+    for category in categories:
+        product_count = counts.get(category.id, 0)
+        entries.append((KIND_CATEGORY, category.id, [category.title], product_count, {
+            'id': category.id,
+            'title': category.title,
+            'slug': category.slug,
+            'image_url': category.image.url if category.image else '',
+            'url': category.get_absolute_url(),
+            'product_count': product_count,
+        }))
+    return entries
+
+
+def popular_search_entries():
+    rows = PopularSearch.objects.order_by('-count').values_list('id', 'query', 'count')[:POPULAR_SEARCH_LIMIT]
+    return [
+        (KIND_QUERY, search_id, [query], count, {'query': query, 'count': count})
+        for search_id, query, count in rows
+    ]
+
+
+# ---------------------- ایندکس هر worker ----------------------
+
+def _version():
+    return CacheVersion.get(VERSION_KEY)
+
+
+def _bump_version():
+    return CacheVersion.bump(VERSION_KEY)
+
+
+def get_index():
+    """ایندکس این worker؛ در صورت نبود، کهنه بودن نسخه یا گذشتن REBUILD_INTERVAL از نو ساخته می‌شود"""
+    global _index
+    version = _version()
+    index = _index
+    if index is None or index.version != version or index.is_expired():
+        with _lock:
+            index = _index
+            if index is None or index.version != version or index.is_expired():
+                index = AutocompleteIndex.build(version)
+                _index = index
+    return index
+
+
+def _refresh(kind, entries, item_ids, fuzzy_terms=None):
+    global _index
+    version = _bump_version()
+    index = _index
+    if index is None:
+        return
+    if index.version == version - 1:
+        index.replace(kind, entries, item_ids)
+        if fuzzy_terms is not None:
+            with index.lock:
+                index.fuzzy.replace_products(item_ids, fuzzy_terms)
+        index.version = version
+    else:
+        # ایندکس تغییرات worker دیگری را ندیده است؛ در درخواست بعدی از نو ساخته می‌شود
+        _index = None
+
+
+def refresh_products(product_ids):
+    product_ids = list(product_ids)
+    fuzzy_terms = product_terms(product_ids) if _index is not None else None
+    _refresh(KIND_PRODUCT, product_entries(product_ids), product_ids, fuzzy_terms)
+
+
+def refresh_categories(category_ids):
+    category_ids = list(category_ids)
+    _refresh(KIND_CATEGORY, category_entries(category_ids), category_ids)
+
+
+def suggest(query, product_limit=8, category_limit=6, query_limit=5):
+    """
+    پیشنهادهای عبارت از ایندکس حافظه.
+    خروجی: (شناسه محصولات، داده دسته‌ها، داده جستجوهای پرتکرار، تعداد کل محصولات، تعداد کل دسته‌ها)
+    """
+    index = get_index()
+    started = time.perf_counter()
+    results, totals = index.search(query, {
+        KIND_PRODUCT: product_limit,
+        KIND_CATEGORY: category_limit,
+        KIND_QUERY: query_limit + 1,
+    })
+    elapsed = time.perf_counter() - started
+    if elapsed > SUGGEST_BUDGET_SECONDS:
+        logger.debug('Autocomplete for %r took %.2f ms', query, elapsed * 1000)
+    normalized = normalize_phrase(query)
+    popular = [
+        search for search in results[KIND_QUERY]
+        if normalize_phrase(search['query']) != normalized
+    ][:query_limit]
+    return (
+        results[KIND_PRODUCT],
+        results[KIND_CATEGORY],
+        popular,
+        totals[KIND_PRODUCT],
+        totals[KIND_CATEGORY],
+    )
+
+
+def did_you_mean(query):
+    """عبارت اصلاح شده با نزدیک‌ترین کلمات محصولات (یا None)"""
+    index = get_index()
+    with index.lock:
+        return index.fuzzy.correct(query)
+
+
+def fuzzy_product_ids(query, limit=8):
+    """شناسه محصولات مشابه عبارت، وقتی جستجوی دقیق نتیجه‌ای ندارد"""
+    index = get_index()
+    with index.lock:
+        return index.fuzzy.product_ids(query, limit=limit)
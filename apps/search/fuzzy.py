@@ -0,0 +1,140 @@
+# fuzzy.py
+# تطبیق تقریبی (trigram) برای عبارت‌های اشتباه تایپ شده
+#
+# واژگان عنوان محصولات، نام برندها و مقادیر ویژگی‌ها (بعد از یکسان‌سازی) به
+# سه‌حرفی‌هایشان شکسته می‌شوند. برای هر کلمه عبارت جستجو، کلمه‌های واژگان که
+# سه‌حرفی مشترک دارند پیدا و با شباهت Jaccard مرتب می‌شوند؛ از همین برای
+# «منظورتان ... بود؟» و برای پیدا کردن محصولات وقتی جستجوی دقیق نتیجه‌ای ندارد
+# استفاده می‌شود. ایندکس بخشی از ایندکس پیشنهادهای هدر (apps.search.autocomplete)
+# است و همراه آن ساخته و بروزرسانی می‌شود.
+from collections import Counter
+from apps.product.models import Product, ProductFeature
+from .text import tokenize
+
+SIMILARITY_THRESHOLD = 0.3
+MAX_CANDIDATE_TERMS = 10
+
+
+def trigrams(term):
+    """سه‌حرفی‌های کلمه با فاصله در ابتدا و انتها (مثل pg_trgm)"""
+    padded = f'  {term} '
+    return {padded[start:start + 3] for start in range(len(padded) - 2)}
+
+
+def product_terms(product_ids=None):
+    """{id محصول: کلمات عنوان، برند و ویژگی‌ها} برای محصولات فعال (دو کوئری)"""
+    products = Product.objects.filter(isActive=True)
+    features = ProductFeature.objects.filter(product__isActive=True)
+    if product_ids is not None:
+        products = products.filter(id__in=product_ids)
+        features = features.filter(product_id__in=product_ids)
+
+    terms = {}
+    for product_id, title, brand_title in products.values_list('id', 'title', 'brand__title'):
+        terms[product_id] = set(tokenize(f'{title} {brand_title or ""}'))
+    for product_id, value, filter_value in features.values_list('product_id', 'value', 'filterValue__value'):
+        if product_id in terms:
+            terms[product_id].update(tokenize(f'{value} {filter_value or ""}'))
+    return terms
+
+
+class TrigramIndex:
+    """ایندکس سه‌حرفی واژگان محصولات"""
+
+    def __init__(self):
+        self.term_products = {}    # کلمه -> id محصولات
+        self.product_terms = {}    # id محصول -> کلمات
+        self.trigram_terms = {}    # سه‌حرفی -> کلمات
+
+    @classmethod
+    def build(cls, terms_by_product):
+        index = cls()
+        for product_id, terms in terms_by_product.items():
+            index._add(product_id, terms)
+        return index
+
+    def _add(self, product_id, terms):
+        self.product_terms[product_id] = terms
+        for term in terms:
+            products = self.term_products.get(term)
+            if products is None:
+                products = self.term_products[term] = set()
+                for trigram in trigrams(term):
+                    self.trigram_terms.setdefault(trigram, set()).add(term)
+            products.add(product_id)
+
+    def _remove(self, product_id):
+        for term in self.product_terms.pop(product_id, ()):
+            products = self.term_products.get(term)
+            if products is None:
+                continue
+            products.discard(product_id)
+            if not products:
+                del self.term_products[term]
+                for trigram in trigrams(term):
+                    terms = self.trigram_terms.get(trigram)
+                    if terms is not None:
+                        terms.discard(term)
+                        if not terms:
+                            del self.trigram_terms[trigram]
+
+    def replace_products(self, product_ids, terms_by_product):
+        for product_id in product_ids:
+            self._remove(product_id)
+        for product_id, terms in terms_by_product.items():
+            self._add(product_id, terms)
+
+    def similar_terms(self, term, limit=MAX_CANDIDATE_TERMS, threshold=SIMILARITY_THRESHOLD):
+        """کلمات مشابه واژگان به ترتیب شباهت: لیست (کلمه، شباهت)"""
+        if term in self.term_products:
+            return [(term, 1.0)]
+        term_trigrams = trigrams(term)
+        shared = Counter()
+        for trigram in term_trigrams:
+            shared.update(self.trigram_terms.get(trigram, ()))
+
+        similar = []
+        for candidate, count in shared.items():
+            similarity = count / (len(term_trigrams) + len(trigrams(candidate)) - count)
+            if similarity >= threshold:
+                similar.append((candidate, similarity))
+        # در شباهت برابر کلمه پرکاربردتر
+        similar.sort(key=lambda item: (-item[1], -len(self.term_products[item[0]]), item[0]))
+        return similar[:limit]
+
+    def correct(self, query):
+        """عبارت اصلاح شده با نزدیک‌ترین کلمات واژگان؛ اگر تغییری لازم نباشد یا پیدا نشود None"""
+        tokens = tokenize(query)
+        corrected = []
+        for token in tokens:
+            similar = self.similar_terms(token, limit=1)
+            if not similar:
+                return None
+            corrected.append(similar[0][0])
+        if not corrected or corrected == tokens:
+            return None
+        return ' '.join(corrected)
+
+    def product_ids(self, query, limit=8):
+        """
+        محصولات به ترتیب مجموع شباهت کلمات عبارت.
+        محصولی که برای کلمه‌ای از عبارت هیچ کلمه مشابهی ندارد کنار گذاشته می‌شود.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        scores = Counter()
+        matched = Counter()
+        for token in tokens:
+            best = {}
+            for term, similarity in self.similar_terms(token):
+                for product_id in self.term_products[term]:
+                    if similarity > best.get(product_id, 0):
+                        best[product_id] = similarity
+            for product_id, similarity in best.items():
+                scores[product_id] += similarity
+                matched[product_id] += 1
+
+        ranked = [product_id for product_id in scores if matched[product_id] == len(tokens)]
+        ranked.sort(key=lambda product_id: (-scores[product_id], -product_id))
+        return ranked[:limit]
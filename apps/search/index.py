@@ -0,0 +1,126 @@
+# index.py
+# ایندکس معکوس محصولات در جدول SearchPosting
+#
+# متن عنوان، برند، ویژگی‌ها و توضیحات (بدون HTML) هر محصول فعال توکن‌سازی می‌شود و
+# برای هر (توکن، محصول، فیلد) یک ردیف با تعداد تکرار ذخیره می‌شود. با ذخیره محصول فقط
+# ردیف‌های همان محصول دوباره ساخته می‌شوند. جستجو به جای icontains روی کل جدول
+# محصولات، لیست محصولات هر توکن را از ایندکس می‌خواند و اشتراک آن‌ها را برمی‌گرداند.
+from collections import Counter
+from django.db import transaction
+from django.db.models import Q
+from apps.product.models import Product
+from .models import SearchPosting, SearchDocument
+from .text import tokenize, html_to_text
+
+
+def product_fields(product):
+    """متن هر فیلد قابل جستجوی محصول؛ محصول باید با indexable_products() آمده باشد"""
+    features = []
+    for product_feature in product.features_value.all():
+        features.append(product_feature.value)
+        if product_feature.filterValue:
+            features.append(product_feature.filterValue.value)
+    return {
+        SearchPosting.FIELD_TITLE: product.title,
+        SearchPosting.FIELD_BRAND: product.brand.title if product.brand else '',
+        SearchPosting.FIELD_FEATURE: ' '.join(features),
+        SearchPosting.FIELD_DESCRIPTION: html_to_text(product.description),
+    }
+
+
+def indexable_products():
+    return Product.objects.filter(isActive=True).select_related('brand').prefetch_related(
+        'features_value__filterValue'
+    )
+
+
+def build_postings(product):
+    """ردیف‌های ایندکس و سند (طول فیلدها) یک محصول"""
+    postings = []
+    document = SearchDocument(product_id=product.id)
+    for field, text in product_fields(product).items():
+        tokens = tokenize(text)
+        setattr(document, SearchDocument.LENGTH_FIELDS[field], len(tokens))
+        for term, frequency in Counter(tokens).items():
+            postings.append(SearchPosting(term=term, product_id=product.id, field=field, frequency=frequency))
+    return postings, document
+
+
+def index_products(product_ids, batch_size=1000):
+    """
+    ساخت دوباره ردیف‌های ایندکس محصولات داده شده.
+    محصولات غیرفعال یا حذف شده از ایندکس خارج می‌شوند.
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return 0
+    postings, documents = [], []
+    for product in indexable_products().filter(id__in=product_ids):
+        product_postings, document = build_postings(product)
+        postings.extend(product_postings)
+        documents.append(document)
+    with transaction.atomic():
+        SearchPosting.objects.filter(product_id__in=product_ids).delete()
+        SearchDocument.objects.filter(product_id__in=product_ids).delete()
+        SearchPosting.objects.bulk_create(postings, batch_size=batch_size)
+        SearchDocument.objects.bulk_create(documents, batch_size=batch_size)
+    return len(postings)
+
+
+def rebuild_index(batch_size=200):
+    """ساخت دوباره کل ایندکس؛ خروجی: تعداد محصولات ایندکس شده"""
+    SearchPosting.objects.all().delete()
+    SearchDocument.objects.all().delete()
+    product_ids = list(Product.objects.filter(isActive=True).values_list('id', flat=True))
+    for start in range(0, len(product_ids), batch_size):
+        index_products(product_ids[start:start + batch_size])
+    return len(product_ids)
+
+
+def query_terms(query):
+    """توکن‌های عبارت جستجو بدون تکرار (به ترتیب عبارت)"""
+    terms = list(dict.fromkeys(tokenize(query)))
+    # اگر همه کلمات توقف باشند (مثلا «در»)، همان‌ها جستجو می‌شوند
+    return terms or list(dict.fromkeys(tokenize(query, keep_stop_words=True)))
+
+
+def term_postings(terms, prefix_last=False):
+    """
+    لیست محصولات هر توکن با یک کوئری.
+    با prefix_last توکن آخر به صورت پیشوندی جستجو می‌شود (برای کلمه‌ای که کاربر در حال تایپ آن است).
+    خروجی: {توکن: {id محصول: [(فیلد، تکرار)، ...]}}
+    """
+    if not terms:
+        return {}
+    exact = terms[:-1] if prefix_last else terms
+    condition = Q(term__in=exact) if exact else Q()
+    if prefix_last:
+        condition |= Q(term__startswith=terms[-1])
+
+    postings = {term: {} for term in terms}
+    exact = set(exact)
+    rows = SearchPosting.objects.filter(condition).values_list('term', 'product_id', 'field', 'frequency')
+    for term, product_id, field, frequency in rows:
+        if term in exact:
+            postings[term].setdefault(product_id, []).append((field, frequency))
+        if prefix_last and term.startswith(terms[-1]):
+            postings[terms[-1]].setdefault(product_id, []).append((field, frequency))
+    return postings
+
+
+def intersect(postings):
+    """اشتراک لیست محصولات توکن‌ها، از کوتاه‌ترین لیست"""
+    if not postings:
+        return set()
+    lists = sorted(postings.values(), key=len)
+    result = set(lists[0])
+    for product_ids in lists[1:]:
+        if not result:
+            break
+        result.intersection_update(product_ids)
+    return result
+
+
+def search_product_ids(query, prefix_last=False):
+    """id محصولاتی که همه توکن‌های عبارت جستجو را دارند"""
+    return intersect(term_postings(query_terms(query), prefix_last=prefix_last))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from apps.search import index
+
+
+class Command(BaseCommand):
+    help = 'ساخت دوباره ایندکس جستجوی محصولات (جدول SearchPosting)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        count = index.rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{count} محصول در ایندکس جستجو ثبت شد'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from apps.search import trends
+
+
+class Command(BaseCommand):
+    help = 'تجمیع ساعتی و روزانه تاریخچه جستجو، ساخت جستجوهای ترند و پاک کردن تاریخچه قدیمی (هر ساعت با cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=trends.PRUNE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        result = trends.run(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['hours']} ساعت تجمیع شد، {result['trending']} جستجوی ترند، "
+            f"{result['history_deleted']} ردیف تاریخچه و {result['rollups_deleted']} آمار ساعتی قدیمی حذف شد"
+        ))
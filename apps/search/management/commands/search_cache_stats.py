@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from apps.search import results_cache
+
+
+class Command(BaseCommand):
+    help = 'نمایش تعداد hit و miss کش نتایج جستجو'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='صفر کردن شمارنده‌ها بعد از نمایش')
+
+    def handle(self, *args, **options):
+        stats = results_cache.cache_stats()
+        # شمارنده‌های همه workerها؛ رویدادهای هنوز در بافر workerها نوشته نشده‌اند
+        self.stdout.write(
+            f"hits: {stats['hits']}  misses: {stats['misses']}  hit ratio: {stats['hit_ratio']}"
+            f"  since: {stats['since']:%Y-%m-%d %H:%M}"
+        )
+        if options['reset']:
+            results_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('شمارنده‌ها صفر شدند'))
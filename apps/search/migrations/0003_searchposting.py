@@ -0,0 +1,61 @@
+# Generated by Django 4.0.3 on 2026-10-18 10:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+from collections import Counter
+from apps.search.text import tokenize, html_to_text
+
+
+def build_search_index(apps, schema_editor):
+    Product = apps.get_model('product', 'Product')
+    SearchPosting = apps.get_model('search', 'SearchPosting')
+    products = Product.objects.filter(isActive=True).select_related('brand').prefetch_related(
+        'features_value__filterValue'
+    )
+    postings = []
+    for product in products:
+        features = []
+        for product_feature in product.features_value.all():
+            features.append(product_feature.value)
+            if product_feature.filterValue:
+                features.append(product_feature.filterValue.value)
+        fields = {
+            1: product.title,
+            2: product.brand.title if product.brand else '',
+            3: ' '.join(features),
+            4: html_to_text(product.description),
+        }
+        for field, text in fields.items():
+            for term, frequency in Counter(tokenize(text)).items():
+                postings.append(SearchPosting(term=term, product_id=product.id, field=field, frequency=frequency))
+        if len(postings) >= 5000:
+            SearchPosting.objects.bulk_create(postings)
+            postings = []
+    SearchPosting.objects.bulk_create(postings)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0007_comment_vote_counters'),
+        ('search', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='توکن')),
+                ('field', models.PositiveSmallIntegerField(choices=[(1, 'عنوان'), (2, 'برند'), (3, 'ویژگی'), (4, 'توضیحات')], verbose_name='فیلد')),
+                ('frequency', models.PositiveIntegerField(default=1, verbose_name='تعداد تکرار')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_postings', to='product.product', verbose_name='محصول')),
+            ],
+            options={
+                'verbose_name': 'توکن ایندکس جستجو',
+                'verbose_name_plural': 'ایندکس جستجو',
+                'unique_together': {('term', 'product', 'field')},
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
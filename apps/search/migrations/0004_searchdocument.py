@@ -0,0 +1,45 @@
+# Generated by Django 4.0.3 on 2026-10-18 10:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+
+LENGTH_FIELDS = {1: 'title_length', 2: 'brand_length', 3: 'feature_length', 4: 'description_length'}
+
+
+def fill_documents(apps, schema_editor):
+    # طول هر فیلد همان مجموع تکرار توکن‌های آن فیلد در ایندکس موجود است
+    SearchPosting = apps.get_model('search', 'SearchPosting')
+    SearchDocument = apps.get_model('search', 'SearchDocument')
+    documents = {}
+    rows = SearchPosting.objects.values('product', 'field').annotate(length=Sum('frequency')).order_by()
+    for row in rows:
+        document = documents.setdefault(row['product'], SearchDocument(product_id=row['product']))
+        setattr(document, LENGTH_FIELDS[row['field']], row['length'])
+    SearchDocument.objects.bulk_create(documents.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0007_comment_vote_counters'),
+        ('search', '0003_searchposting'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='product.product', verbose_name='محصول')),
+                ('title_length', models.PositiveIntegerField(default=0, verbose_name='طول عنوان')),
+                ('brand_length', models.PositiveIntegerField(default=0, verbose_name='طول برند')),
+                ('feature_length', models.PositiveIntegerField(default=0, verbose_name='طول ویژگی\u200cها')),
+                ('description_length', models.PositiveIntegerField(default=0, verbose_name='طول توضیحات')),
+            ],
+            options={
+                'verbose_name': 'سند ایندکس جستجو',
+                'verbose_name_plural': 'اسناد ایندکس جستجو',
+            },
+        ),
+        migrations.RunPython(fill_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.0.3 on 2026-10-18 10:55
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0004_searchdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=200, verbose_name='عبارت یکسان\u200cسازی شده')),
+                ('granularity', models.CharField(choices=[('hour', 'ساعتی'), ('day', 'روزانه')], max_length=5, verbose_name='بازه')),
+                ('bucket', models.DateTimeField(verbose_name='شروع بازه')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='تعداد جستجو')),
+                ('zero_result_count', models.PositiveIntegerField(default=0, verbose_name='جستجوهای بدون نتیجه')),
+            ],
+            options={
+                'verbose_name': 'آمار بازه\u200cای جستجو',
+                'verbose_name_plural': 'آمار بازه\u200cای جستجوها',
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingSearch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=200, unique=True, verbose_name='عبارت جستجو')),
+                ('score', models.FloatField(db_index=True, default=0, verbose_name='امتیاز ترند')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='تعداد جستجو در بازه ترند')),
+                ('updateAt', models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')),
+            ],
+            options={
+                'verbose_name': 'جستجوی ترند',
+                'verbose_name_plural': 'جستجوهای ترند',
+                'ordering': ['-score'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ZeroResultSearch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=200, unique=True, verbose_name='عبارت جستجو')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='تعداد جستجو')),
+                ('last_searched', models.DateTimeField(default=django.utils.timezone.now, verbose_name='آخرین جستجو')),
+            ],
+            options={
+                'verbose_name': 'جستجوی بدون نتیجه',
+                'verbose_name_plural': 'جستجوهای بدون نتیجه',
+                'ordering': ['-count', '-last_searched'],
+            },
+        ),
+        migrations.AddField(
+            model_name='searchhistory',
+            name='results_count',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='تعداد نتایج'),
+        ),
+        migrations.AddIndex(
+            model_name='searchhistory',
+            index=models.Index(fields=['created_at'], name='search_sear_created_bf0338_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchrollup',
+            index=models.Index(fields=['granularity', 'bucket'], name='search_sear_granula_f2233c_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='searchrollup',
+            unique_together={('query', 'granularity', 'bucket')},
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.0.3 on 2026-10-18 11:20
+
+from django.db import migrations
+from apps.search.text import normalize_phrase
+
+
+def normalize_popular_searches(apps, schema_editor):
+    # ادغام ردیف‌های هم‌معنی («Samsung» و «samsung») در یک ردیف با عبارت یکسان‌سازی شده
+    PopularSearch = apps.get_model('search', 'PopularSearch')
+
+    groups = {}
+    for search in PopularSearch.objects.order_by('-count', 'id'):
+        groups.setdefault(normalize_phrase(search.query), []).append(search)
+
+    for key, searches in groups.items():
+        kept, duplicates = searches[0], searches[1:]
+        if not key:
+            PopularSearch.objects.filter(id__in=[search.id for search in searches]).delete()
+            continue
+        if not duplicates and kept.query == key:
+            continue
+        PopularSearch.objects.filter(id__in=[search.id for search in duplicates]).delete()
+        kept.query = key
+        kept.count = sum(search.count for search in searches)
+        kept.last_searched = max(search.last_searched for search in searches)
+        kept.save(update_fields=['query', 'count', 'last_searched'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0005_search_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_popular_searches, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.0.3 on 2026-10-18 11:25
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0006_normalize_popular_searches'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchCacheStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hits', models.PositiveBigIntegerField(default=0, verbose_name='hit')),
+                ('misses', models.PositiveBigIntegerField(default=0, verbose_name='miss')),
+                ('resetAt', models.DateTimeField(default=django.utils.timezone.now, verbose_name='شروع شمارش')),
+            ],
+            options={
+                'verbose_name': 'آمار کش جستجو',
+                'verbose_name_plural': 'آمار کش جستجو',
+            },
+        ),
+    ]
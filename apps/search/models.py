@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F
 from django.utils import timezone
 from apps.product.models import Product, Category
 
@@ -10,11 +11,13 @@ class SearchHistory(models.Model):
     query = models.CharField(max_length=200, verbose_name="عبارت جستجو")
     created_at = models.DateTimeField(default=timezone.now, verbose_name="تاریخ جستجو")
     session_key = models.CharField(max_length=100, blank=True, null=True, verbose_name="کلید نشست")
+    results_count = models.PositiveIntegerField(null=True, blank=True, verbose_name="تعداد نتایج")
 
     class Meta:
         verbose_name = "تاریخچه جستجو"
         verbose_name_plural = "تاریخچه جستجوها"
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['created_at'])]
 
     def __str__(self):
         return f"{self.query} - {self.user if self.user else 'مهمان'}"
@@ -33,4 +36,144 @@ class PopularSearch(models.Model):
         ordering = ['-count', '-last_searched']
 
     def __str__(self):
-        return f"{self.query} ({self.count})"
\ No newline at end of file
+        return f"{self.query} ({self.count})"
+
+# ========================
+# آمار زمانی جستجوها (از SearchHistory با دستور rollup_search_history)
+# ========================
+class SearchRollup(models.Model):
+    GRANULARITY_HOUR = 'hour'
+    GRANULARITY_DAY = 'day'
+    GRANULARITY_CHOICES = [(GRANULARITY_HOUR, 'ساعتی'), (GRANULARITY_DAY, 'روزانه')]
+
+    query = models.CharField(max_length=200, verbose_name="عبارت یکسان‌سازی شده")
+    granularity = models.CharField(max_length=5, choices=GRANULARITY_CHOICES, verbose_name="بازه")
+    bucket = models.DateTimeField(verbose_name="شروع بازه")
+    count = models.PositiveIntegerField(default=0, verbose_name="تعداد جستجو")
+    zero_result_count = models.PositiveIntegerField(default=0, verbose_name="جستجوهای بدون نتیجه")
+
+    class Meta:
+        verbose_name = "آمار بازه‌ای جستجو"
+        verbose_name_plural = "آمار بازه‌ای جستجوها"
+        unique_together = ['query', 'granularity', 'bucket']
+        indexes = [models.Index(fields=['granularity', 'bucket'])]
+
+    def __str__(self):
+        return f"{self.query} ({self.get_granularity_display()} {self.bucket:%Y-%m-%d %H:%M}: {self.count})"
+
+
+class TrendingSearch(models.Model):
+    query = models.CharField(max_length=200, unique=True, verbose_name="عبارت جستجو")
+    score = models.FloatField(default=0, db_index=True, verbose_name="امتیاز ترند")
+    count = models.PositiveIntegerField(default=0, verbose_name="تعداد جستجو در بازه ترند")
+    updateAt = models.DateTimeField(auto_now=True, verbose_name="تاریخ بروزرسانی")
+
+    class Meta:
+        verbose_name = "جستجوی ترند"
+        verbose_name_plural = "جستجوهای ترند"
+        ordering = ['-score']
+
+    def __str__(self):
+        return f"{self.query} ({self.score:.1f})"
+
+
+class ZeroResultSearch(models.Model):
+    query = models.CharField(max_length=200, unique=True, verbose_name="عبارت جستجو")
+    count = models.PositiveIntegerField(default=0, verbose_name="تعداد جستجو")
+    last_searched = models.DateTimeField(default=timezone.now, verbose_name="آخرین جستجو")
+
+    class Meta:
+        verbose_name = "جستجوی بدون نتیجه"
+        verbose_name_plural = "جستجوهای بدون نتیجه"
+        ordering = ['-count', '-last_searched']
+
+    def __str__(self):
+        return f"{self.query} ({self.count})"
+
+
+# ========================
+# ایندکس معکوس جستجوی محصولات
+# ========================
+class SearchPosting(models.Model):
+    FIELD_TITLE = 1
+    FIELD_BRAND = 2
+    FIELD_FEATURE = 3
+    FIELD_DESCRIPTION = 4
+    FIELD_CHOICES = [
+        (FIELD_TITLE, 'عنوان'),
+        (FIELD_BRAND, 'برند'),
+        (FIELD_FEATURE, 'ویژگی'),
+        (FIELD_DESCRIPTION, 'توضیحات'),
+    ]
+
+    term = models.CharField(max_length=64, verbose_name="توکن")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="search_postings", verbose_name="محصول")
+    field = models.PositiveSmallIntegerField(choices=FIELD_CHOICES, verbose_name="فیلد")
+    frequency = models.PositiveIntegerField(default=1, verbose_name="تعداد تکرار")
+
+    class Meta:
+        verbose_name = "توکن ایندکس جستجو"
+        verbose_name_plural = "ایندکس جستجو"
+        unique_together = ['term', 'product', 'field']
+
+    def __str__(self):
+        return f"{self.term} → {self.product_id} ({self.get_field_display()})"
+
+
+class SearchDocument(models.Model):
+    """طول هر فیلد محصول ایندکس شده (به تعداد توکن) برای نرمال‌سازی امتیاز BM25"""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name="search_document", verbose_name="محصول")
+    title_length = models.PositiveIntegerField(default=0, verbose_name="طول عنوان")
+    brand_length = models.PositiveIntegerField(default=0, verbose_name="طول برند")
+    feature_length = models.PositiveIntegerField(default=0, verbose_name="طول ویژگی‌ها")
+    description_length = models.PositiveIntegerField(default=0, verbose_name="طول توضیحات")
+
+    LENGTH_FIELDS = {
+        SearchPosting.FIELD_TITLE: 'title_length',
+        SearchPosting.FIELD_BRAND: 'brand_length',
+        SearchPosting.FIELD_FEATURE: 'feature_length',
+        SearchPosting.FIELD_DESCRIPTION: 'description_length',
+    }
+
+    class Meta:
+        verbose_name = "سند ایندکس جستجو"
+        verbose_name_plural = "اسناد ایندکس جستجو"
+
+    def __str__(self):
+        return f"سند جستجوی {self.product_id}"
+
+
+# ========================
+# شمارنده hit و miss کش نتایج جستجو (یک ردیف مشترک بین workerها؛ apps.search.results_cache)
+# ========================
+class SearchCacheStats(models.Model):
+    SINGLETON_ID = 1
+
+    hits = models.PositiveBigIntegerField(default=0, verbose_name="hit")
+    misses = models.PositiveBigIntegerField(default=0, verbose_name="miss")
+    resetAt = models.DateTimeField(default=timezone.now, verbose_name="شروع شمارش")
+
+    class Meta:
+        verbose_name = "آمار کش جستجو"
+        verbose_name_plural = "آمار کش جستجو"
+
+    def __str__(self):
+        return f"hits: {self.hits}  misses: {self.misses}"
+
+    @classmethod
+    def add(cls, hits=0, misses=0):
+        """افزایش اتمیک شمارنده‌ها (ردیف در صورت نبود ساخته می‌شود)"""
+        if not hits and not misses:
+            return
+        changes = {'hits': F('hits') + hits, 'misses': F('misses') + misses}
+        if not cls.objects.filter(id=cls.SINGLETON_ID).update(**changes):
+            cls.objects.bulk_create([cls(id=cls.SINGLETON_ID)], ignore_conflicts=True)
+            cls.objects.filter(id=cls.SINGLETON_ID).update(**changes)
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(id=cls.SINGLETON_ID).first() or cls(id=cls.SINGLETON_ID)
+
+    @classmethod
+    def reset(cls):
+        cls.objects.filter(id=cls.SINGLETON_ID).update(hits=0, misses=0, resetAt=timezone.now())
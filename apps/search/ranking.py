@@ -0,0 +1,100 @@
+# ranking.py
+# امتیازدهی نتایج جستجو با BM25F
+#
+# تکرار هر توکن در هر فیلد با وزن همان فیلد (عنوان > برند > ویژگی > توضیحات) و نسبت به
+# طول فیلد نرمال می‌شود، سپس با اشباع k1 و idf توکن جمع زده می‌شود. تعداد فروش
+# سفارش‌های نهایی (ProductStats.total_sold) به صورت لگاریتمی امتیاز را تقویت می‌کند.
+import math
+from django.core.cache import cache
+from django.db.models import Avg, Count
+from .index import query_terms, term_postings, intersect
+from .models import SearchPosting, SearchDocument
+
+FIELD_WEIGHTS = {
+    SearchPosting.FIELD_TITLE: 4.0,
+    SearchPosting.FIELD_BRAND: 2.5,
+    SearchPosting.FIELD_FEATURE: 1.5,
+    SearchPosting.FIELD_DESCRIPTION: 1.0,
+}
+# میزان اثر طول فیلد (b در BM25)؛ عنوان و برند کوتاه هستند و کمتر نرمال می‌شوند
+FIELD_LENGTH_NORMALIZATION = {
+    SearchPosting.FIELD_TITLE: 0.5,
+    SearchPosting.FIELD_BRAND: 0.3,
+    SearchPosting.FIELD_FEATURE: 0.75,
+    SearchPosting.FIELD_DESCRIPTION: 0.75,
+}
+BM25_K1 = 1.2
+POPULARITY_BOOST = 0.15
+
+COLLECTION_STATS_CACHE_KEY = 'search_collection_stats'
+COLLECTION_STATS_TTL = 60 * 10
+
+
+def collection_stats():
+    """تعداد اسناد و میانگین طول هر فیلد (با کش کوتاه مدت)"""
+    stats = cache.get(COLLECTION_STATS_CACHE_KEY)
+    if stats is None:
+        result = SearchDocument.objects.aggregate(
+            count=Count('product'),
+            **{field_name: Avg(field_name) for field_name in SearchDocument.LENGTH_FIELDS.values()},
+        )
+        stats = {
+            'count': result['count'],
+            'avg_length': {
+                field: result[field_name] or 1.0
+                for field, field_name in SearchDocument.LENGTH_FIELDS.items()
+            },
+        }
+        cache.set(COLLECTION_STATS_CACHE_KEY, stats, COLLECTION_STATS_TTL)
+    return stats
+
+
+def idf(document_count, document_frequency):
+    return math.log(1 + (document_count - document_frequency + 0.5) / (document_frequency + 0.5))
+
+
+def bm25_score(term_fields, lengths, avg_length, term_idf):
+    """امتیاز یک توکن برای یک سند؛ term_fields لیست (فیلد، تکرار) است"""
+    weighted_tf = 0.0
+    for field, frequency in term_fields:
+        b = FIELD_LENGTH_NORMALIZATION[field]
+        norm = 1 - b + b * lengths.get(field, 0) / avg_length[field]
+        weighted_tf += FIELD_WEIGHTS[field] * frequency / norm
+    return term_idf * weighted_tf / (BM25_K1 + weighted_tf)
+
+
+def popularity_boost(total_sold):
+    return 1 + POPULARITY_BOOST * math.log1p(total_sold or 0)
+
+
+def rank(query, prefix_last=False):
+    """
+    محصولات منطبق با همه توکن‌های عبارت، به ترتیب امتیاز.
+    خروجی: لیست (id محصول، امتیاز، تعداد فروش)
+    """
+    postings = term_postings(query_terms(query), prefix_last=prefix_last)
+    candidates = intersect(postings)
+    if not candidates:
+        return []
+
+    stats = collection_stats()
+    document_count = max(stats['count'], 1)
+    idfs = {term: idf(document_count, len(products)) for term, products in postings.items()}
+
+    length_fields = list(SearchDocument.LENGTH_FIELDS.items())
+    rows = SearchDocument.objects.filter(product_id__in=candidates).values_list(
+        'product_id', *[field_name for _, field_name in length_fields], 'product__stats__total_sold'
+    )
+
+    results = []
+    for row in rows:
+        product_id, total_sold = row[0], row[-1]
+        lengths = {field: length for (field, _), length in zip(length_fields, row[1:-1])}
+        score = sum(
+            bm25_score(products[product_id], lengths, stats['avg_length'], idfs[term])
+            for term, products in postings.items()
+        )
+        results.append((product_id, score * popularity_boost(total_sold), total_sold or 0))
+
+    results.sort(key=lambda result: (-result[1], -result[0]))
+    return results
@@ -0,0 +1,63 @@
+# results_cache.py
+# کش نتایج جستجو بر اساس عبارت یکسان‌سازی شده
+#
+# فقط ترتیب شناسه محصولات (و داده‌های سبک پیشنهادها) کش می‌شود و کارت محصولات
+# همیشه جدا از دیتابیس خوانده می‌شوند؛ بنابراین تغییر قیمت و تخفیف کش را باطل نمی‌کند.
+# نسخه کاتالوگ جزو کلید است و با ذخیره یا حذف محصول، برند، دسته‌بندی و ویژگی محصول
+# (apps.search.signals) در دیتابیس (main.CacheVersion) بالا می‌رود تا نتایج قبلی در همه
+# workerها کنار گذاشته شوند.
+#
+# تعداد hit و miss در بافر آمار جستجو جمع و در ردیف مشترک SearchCacheStats نوشته می‌شود
+# (با تاخیر حداکثر SEARCH_ANALYTICS_FLUSH_INTERVAL): cache_stats() یا دستور search_cache_stats
+import hashlib
+from django.core.cache import cache
+from apps.main.models import CacheVersion
+from .analytics import record_cache_lookup
+from .models import SearchCacheStats
+from .text import normalize_phrase
+
+CATALOG_VERSION_KEY = 'search_catalog'
+RESULTS_CACHE_KEY = 'search_results:{}:{}:{}'
+
+RESULTS_TTL = 60 * 10
+SUGGESTIONS_TTL = 60
+
+
+def catalog_version():
+    """نسخه فعلی کاتالوگ (مشترک بین workerها)"""
+    return CacheVersion.get(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    CacheVersion.bump(CATALOG_VERSION_KEY)
+
+
+def results_key(kind, query, *params):
+    normalized = repr((normalize_phrase(query), params))
+    digest = hashlib.md5(normalized.encode()).hexdigest()
+    return RESULTS_CACHE_KEY.format(kind, catalog_version(), digest)
+
+
+def get_or_compute(kind, query, params, compute, ttl=RESULTS_TTL):
+    """نتیجه کش شده برای (نوع، عبارت یکسان‌سازی شده، پارامترها) یا اجرای compute() و ذخیره آن"""
+    key = results_key(kind, query, *params)
+    result = cache.get(key)
+    if result is not None:
+        record_cache_lookup('hits')
+        return result
+    record_cache_lookup('misses')
+    result = compute()
+    cache.set(key, result, ttl)
+    return result
+
+
+def cache_stats():
+    current = SearchCacheStats.current()
+    stats = {'hits': current.hits, 'misses': current.misses, 'since': current.resetAt}
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / total, 3) if total else 0
+    return stats
+
+
+def reset_stats():
+    SearchCacheStats.reset()
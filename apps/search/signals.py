@@ -0,0 +1,66 @@
+# signals.py
+# بروزرسانی ایندکس جستجو و ایندکس پیشنهادهای هدر بعد از تغییر محصول، برند،
+# دسته‌بندی و ویژگی‌های محصول و بالا بردن نسخه کاتالوگ کش نتایج جستجو
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from apps.product.models import Product, Brand, Category, ProductFeature, FeatureValue
+from . import autocomplete, index, results_cache
+
+
+def reindex_products(product_ids):
+    index.index_products(product_ids)
+    autocomplete.refresh_products(product_ids)
+    results_cache.bump_catalog_version()
+
+
+def reindex_after_commit(product_ids):
+    product_ids = list(product_ids)
+    if product_ids:
+        transaction.on_commit(lambda: reindex_products(product_ids))
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    reindex_after_commit([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_suggestions(sender, instance, **kwargs):
+    # ردیف‌های ایندکس با حذف محصول cascade می‌شوند
+    product_id = instance.pk
+    transaction.on_commit(lambda: autocomplete.refresh_products([product_id]))
+    transaction.on_commit(results_cache.bump_catalog_version)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_category_suggestions(sender, instance, **kwargs):
+    category_id = instance.pk
+    transaction.on_commit(lambda: autocomplete.refresh_categories([category_id]))
+    transaction.on_commit(results_cache.bump_catalog_version)
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def invalidate_results_on_categories_change(sender, action, **kwargs):
+    # فیلتر دسته‌بندی صفحه نتایج به این رابطه بستگی دارد
+    if action.startswith('post_'):
+        transaction.on_commit(results_cache.bump_catalog_version)
+
+
+@receiver(post_save, sender=Brand)
+def index_brand_products(sender, instance, **kwargs):
+    reindex_after_commit(instance.products.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=ProductFeature)
+@receiver(post_delete, sender=ProductFeature)
+def index_product_features(sender, instance, **kwargs):
+    reindex_after_commit([instance.product_id])
+
+
+@receiver(post_save, sender=FeatureValue)
+def index_feature_value_products(sender, instance, **kwargs):
+    reindex_after_commit(
+        ProductFeature.objects.filter(filterValue=instance).values_list('product_id', flat=True).distinct()
+    )
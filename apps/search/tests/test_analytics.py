@@ -0,0 +1,69 @@
+import importlib
+from django.apps import apps
+from django.test import TestCase, override_settings
+from apps.product.tests.helpers import make_user
+from apps.search import analytics
+from apps.search.models import PopularSearch, SearchHistory
+
+
+def popular():
+    return dict(PopularSearch.objects.values_list('query', 'count'))
+
+
+@override_settings(SEARCH_ANALYTICS_FLUSH_INTERVAL=60, SEARCH_ANALYTICS_BATCH_SIZE=500)
+class SearchAnalyticsTests(TestCase):
+    def setUp(self):
+        self.buffer = analytics.SearchEventBuffer()
+        self.addCleanup(self.cancel_timer)
+
+    def cancel_timer(self):
+        if self.buffer.timer is not None:
+            self.buffer.timer.cancel()
+
+    def test_variant_spellings_share_one_counter(self):
+        for query in ('Samsung M2070', 'samsung  m2070', 'SAMSUNG M۲۰۷۰'):
+            self.buffer.record(query, session_key='guest')
+        self.buffer.record('پرينتر')
+        self.buffer.record('پرینتر', user=make_user())
+
+        self.assertEqual(SearchHistory.objects.count(), 0)
+        self.assertEqual(self.buffer.flush(), 10)
+        self.assertEqual(popular(), {'samsung m2070': 3, 'پرینتر': 2})
+        self.assertEqual(SearchHistory.objects.count(), 5)
+        self.assertEqual(SearchHistory.objects.filter(session_key='guest').count(), 3)
+
+    def test_flush_increments_existing_rows(self):
+        PopularSearch.objects.create(query='samsung', count=5)
+        self.buffer.record('Samsung')
+        self.buffer.record('samsung')
+        self.buffer.flush()
+        self.assertEqual(popular(), {'samsung': 7})
+
+    def test_punctuation_only_query_is_kept_in_history_only(self):
+        self.buffer.record('؟؟')
+        self.buffer.flush()
+        self.assertEqual(popular(), {})
+        self.assertEqual(SearchHistory.objects.count(), 1)
+
+    @override_settings(SEARCH_ANALYTICS_BATCH_SIZE=3)
+    def test_batch_size_triggers_a_flush(self):
+        self.buffer.record('laser')
+        self.assertEqual(SearchHistory.objects.count(), 0)
+        self.buffer.record('laser')
+        self.assertEqual(popular(), {'laser': 2})
+
+    @override_settings(SEARCH_ANALYTICS_FLUSH_INTERVAL=0)
+    def test_zero_interval_writes_immediately(self):
+        self.buffer.record('toner')
+        self.assertEqual(popular(), {'toner': 1})
+        self.assertIsNone(self.buffer.timer)
+
+    def test_migration_merges_case_variants(self):
+        PopularSearch.objects.create(query='Samsung', count=4)
+        PopularSearch.objects.create(query='samsung', count=2)
+        PopularSearch.objects.create(query='پرينتر', count=1)
+        PopularSearch.objects.create(query='!!', count=1)
+
+        migration = importlib.import_module('apps.search.migrations.0006_normalize_popular_searches')
+        migration.normalize_popular_searches(apps, None)
+        self.assertEqual(popular(), {'samsung': 6, 'پرینتر': 1})
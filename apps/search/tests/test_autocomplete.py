@@ -0,0 +1,71 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from apps.main.models import CacheVersion
+from apps.product.models import ProductStats
+from apps.product.tests.helpers import make_brand, make_category, make_product, reset_caches
+from apps.search import autocomplete
+from apps.search.models import PopularSearch
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        samsung = make_brand('Samsung')
+        self.printers = make_category('پرینتر لیزری')
+        self.m2070 = make_product('Xpress M2070', brand=samsung, categories=[self.printers])
+        self.m2020 = make_product('Xpress M2020', brand=samsung, categories=[self.printers])
+        ProductStats.objects.filter(product=self.m2020).update(total_sold=3)
+        PopularSearch.objects.create(query='xpress', count=10)
+        PopularSearch.objects.create(query='xpress m2070', count=4)
+
+    def test_prefix_of_any_word_ordered_by_sales(self):
+        product_ids, categories, popular, total_products, total_categories = autocomplete.suggest('xpre')
+        self.assertEqual(product_ids, [self.m2020.id, self.m2070.id])
+        self.assertEqual(total_products, 2)
+        self.assertEqual([search['query'] for search in popular], ['xpress', 'xpress m2070'])
+
+        self.assertEqual(autocomplete.suggest('m207')[0], [self.m2070.id])
+        self.assertEqual(autocomplete.suggest('samsung xpress m20')[3], 2)
+
+    def test_categories_match_variant_spellings(self):
+        _, categories, _, _, total_categories = autocomplete.suggest('لیزري')
+        self.assertEqual(total_categories, 1)
+        self.assertEqual((categories[0]['id'], categories[0]['product_count']), (self.printers.id, 2))
+
+    def test_exact_query_is_not_suggested_back(self):
+        popular = autocomplete.suggest('Xpress')[2]
+        self.assertEqual([search['query'] for search in popular], ['xpress m2070'])
+
+    def test_local_refresh_patches_the_index_in_place(self):
+        index = autocomplete.get_index()
+        self.m2070.title = 'Xpress C430'
+        self.m2070.save()
+        autocomplete.refresh_products([self.m2070.id])
+
+        self.assertIs(autocomplete.get_index(), index)
+        self.assertEqual(index.version, CacheVersion.get(autocomplete.VERSION_KEY))
+        self.assertEqual(autocomplete.suggest('c43')[0], [self.m2070.id])
+        self.assertEqual(autocomplete.suggest('m207')[0], [])
+
+    def test_change_from_another_worker_rebuilds_the_index(self):
+        index = autocomplete.get_index()
+        # worker دیگری محصول را تغییر داده و نسخه مشترک را بالا برده است
+        self.m2070.title = 'Xpress C430'
+        self.m2070.save()
+        CacheVersion.bump(autocomplete.VERSION_KEY)
+
+        self.assertIsNot(autocomplete.get_index(), index)
+        self.assertEqual(autocomplete.suggest('c43')[0], [self.m2070.id])
+
+    def test_refresh_after_a_missed_version_drops_the_index(self):
+        autocomplete.get_index()
+        CacheVersion.bump(autocomplete.VERSION_KEY)
+        autocomplete.refresh_products([self.m2070.id])
+        self.assertIsNone(autocomplete._index)
+
+    @override_settings(SEARCH_ANALYTICS_FLUSH_INTERVAL=0)
+    def test_suggestions_endpoint(self):
+        data = self.client.get(reverse('search:search_suggestions'), {'q': 'm2070'}).json()
+        self.assertEqual([product['id'] for product in data['products']], [self.m2070.id])
+        self.assertEqual(data['total_products'], 1)
+        self.assertIsNone(data['did_you_mean'])
@@ -0,0 +1,55 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from apps.product.tests.helpers import make_brand, make_feature_value, make_product, reset_caches
+from apps.search.fuzzy import TrigramIndex, product_terms, trigrams
+from apps.search.index import rebuild_index
+
+
+class TrigramIndexTests(TestCase):
+    def setUp(self):
+        self.index = TrigramIndex.build({
+            1: {'samsung', 'xpress', 'm2070'},
+            2: {'samsung', 'galaxy'},
+            3: {'canon', 'pixma'},
+        })
+
+    def test_trigrams_are_padded(self):
+        self.assertEqual(trigrams('ab'), {'  a', ' ab', 'ab '})
+
+    def test_typo_is_corrected_to_the_closest_term(self):
+        self.assertEqual(self.index.correct('samsnug galaxy'), 'samsung galaxy')
+        self.assertIsNone(self.index.correct('samsung galaxy'))
+        self.assertIsNone(self.index.correct('qwerty'))
+
+    def test_products_must_match_every_word(self):
+        self.assertEqual(self.index.product_ids('samsng'), [2, 1])
+        self.assertEqual(self.index.product_ids('samsng xpres'), [1])
+        self.assertEqual(self.index.product_ids('samsng pixma'), [])
+
+    def test_replace_products_drops_unused_terms(self):
+        self.index.replace_products([3], {3: {'epson'}})
+        self.assertNotIn('pixma', self.index.term_products)
+        self.assertFalse(any('pixma' in terms for terms in self.index.trigram_terms.values()))
+        self.assertEqual(self.index.product_ids('epsn'), [3])
+
+
+@override_settings(SEARCH_ANALYTICS_FLUSH_INTERVAL=0)
+class FuzzySearchTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.product = make_product('Xpress M2070', brand=make_brand('Samsung'), image='images/product.jpg')
+        make_feature_value(self.product, 'نوع', 'لیزری')
+        rebuild_index()
+
+    def test_vocabulary_includes_brand_and_feature_values(self):
+        self.assertEqual(product_terms([self.product.id]), {self.product.id: {'xpress', 'm2070', 'samsung', 'لیزری'}})
+
+    def test_suggestions_fall_back_to_fuzzy_matches(self):
+        data = self.client.get(reverse('search:search_suggestions'), {'q': 'samsnug xpres'}).json()
+        self.assertEqual([product['id'] for product in data['products']], [self.product.id])
+        self.assertEqual(data['did_you_mean'], 'samsung xpress')
+
+    def test_results_page_searches_the_corrected_query(self):
+        response = self.client.get(reverse('search:search_results'), {'q': 'لیزرى xpres'})
+        self.assertEqual(response.context['suggested_query'], 'لیزری xpress')
+        self.assertEqual(list(response.context['products']), [self.product])
@@ -0,0 +1,69 @@
+from django.test import TestCase
+from apps.product.tests.helpers import make_brand, make_feature_value, make_product, reset_caches
+from apps.search import index
+from apps.search.models import SearchDocument, SearchPosting
+from apps.search.text import normalize_phrase, tokenize
+
+
+class TextNormalizationTests(TestCase):
+    def test_variant_spellings_reach_the_same_tokens(self):
+        self.assertEqual(tokenize('پرينتر كارتريج'), tokenize('پرینتر کارتریج'))
+        self.assertEqual(tokenize('چاپ‌گر'), ['چاپگر'])
+        self.assertEqual(tokenize('M۲۰۷۰ و ٢٠٢٠'), ['m2070', '2020'])
+        self.assertEqual(normalize_phrase('  Laser   Jet '), 'laser jet')
+
+    def test_stop_words_are_dropped_only_when_other_terms_exist(self):
+        self.assertEqual(index.query_terms('پرینتر در دفتر'), ['پرینتر', 'دفتر'])
+        self.assertEqual(index.query_terms('در'), ['در'])
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        reset_caches()
+
+    def create(self, *args, **kwargs):
+        # ایندکس بعد از commit ساخته می‌شود
+        with self.captureOnCommitCallbacks(execute=True):
+            return make_product(*args, **kwargs)
+
+    def test_product_save_updates_its_postings(self):
+        product = self.create('پرینتر لیزری', brand=make_brand('Samsung'), description='<p>چاپ <b>سريع</b></p>')
+        fields = dict(SearchPosting.objects.filter(product=product, term='سریع').values_list('field', 'frequency'))
+        self.assertEqual(fields, {SearchPosting.FIELD_DESCRIPTION: 1})
+        self.assertEqual(SearchDocument.objects.get(product=product).title_length, 2)
+
+        product.title = 'اسکنر'
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertEqual(index.search_product_ids('لیزری'), set())
+        self.assertEqual(index.search_product_ids('اسكنر'), {product.id})
+
+    def test_query_is_an_intersection_of_posting_lists(self):
+        samsung = make_brand('Samsung')
+        laser = self.create('پرینتر لیزری', brand=samsung)
+        inkjet = self.create('پرینتر جوهرافشان', brand=samsung)
+        self.create('اسکنر', brand=make_brand('Canon'))
+
+        self.assertEqual(index.search_product_ids('پرینتر'), {laser.id, inkjet.id})
+        self.assertEqual(index.search_product_ids('samsung لیزری'), {laser.id})
+        self.assertEqual(index.search_product_ids('پرینتر canon'), set())
+        self.assertEqual(index.search_product_ids('پرینتر جوه', prefix_last=True), {inkjet.id})
+
+    def test_feature_values_and_deactivation_are_reindexed(self):
+        product = self.create('پرینتر')
+        with self.captureOnCommitCallbacks(execute=True):
+            make_feature_value(product, 'رنگ', 'مشکی')
+        self.assertEqual(index.search_product_ids('مشکی'), {product.id})
+
+        product.isActive = False
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertFalse(SearchPosting.objects.filter(product=product).exists())
+
+    def test_rebuild_matches_incremental_index(self):
+        product = self.create('پرینتر لیزری', description='کارتریج اصلی')
+        expected = set(SearchPosting.objects.values_list('term', 'product_id', 'field', 'frequency'))
+
+        self.assertEqual(index.rebuild_index(), 1)
+        self.assertEqual(set(SearchPosting.objects.values_list('term', 'product_id', 'field', 'frequency')), expected)
+        self.assertTrue(SearchDocument.objects.filter(product=product).exists())
@@ -0,0 +1,75 @@
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from apps.product.models import ProductStats
+from apps.product.tests.helpers import make_brand, make_feature_value, make_product, reset_caches
+from apps.search import ranking
+from apps.search.index import rebuild_index
+
+
+def ranked_ids(query):
+    return [product_id for product_id, _, _ in ranking.rank(query)]
+
+
+class RankingTests(TestCase):
+    def setUp(self):
+        reset_caches()
+
+    def test_field_weights_order_title_brand_feature_description(self):
+        in_description = make_product('Device A', brand=make_brand('Canon'), description='<p>laser</p>')
+        in_feature = make_product('Device B', brand=make_brand('HP'))
+        make_feature_value(in_feature, 'Type', 'laser')
+        in_brand = make_product('Device C', brand=make_brand('Laser'))
+        in_title = make_product('Laser D', brand=make_brand('Epson'))
+        rebuild_index()
+
+        self.assertEqual(ranked_ids('laser'), [in_title.id, in_brand.id, in_feature.id, in_description.id])
+
+    def test_sales_boost_breaks_equal_relevance(self):
+        first = make_product('Laser printer')
+        second = make_product('Laser printer')
+        ProductStats.objects.filter(product=first).update(total_sold=20)
+        rebuild_index()
+
+        results = ranking.rank('laser printer')
+        self.assertEqual([product_id for product_id, _, _ in results], [first.id, second.id])
+        self.assertEqual(results[0][2], 20)
+        self.assertGreater(results[0][1], results[1][1])
+
+    def test_rare_terms_weigh_more_than_common_ones(self):
+        common = [make_product(f'Printer {i}') for i in range(4)]
+        rare = make_product('Printer toner')
+        rebuild_index()
+
+        self.assertEqual(ranked_ids('printer toner'), [rare.id])
+        self.assertEqual(set(ranked_ids('printer')), {product.id for product in common} | {rare.id})
+        self.assertGreater(ranking.idf(5, 1), ranking.idf(5, 5))
+
+
+@override_settings(SEARCH_ANALYTICS_FLUSH_INTERVAL=0)
+class ResultsPageTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        # قالب کارت نتایج به تصویر محصول نیاز دارد
+        self.products = [
+            make_product(f'Laser printer {i}', price=1000 + i, image='images/product.jpg') for i in range(25)
+        ]
+        ProductStats.objects.filter(product=self.products[3]).update(total_sold=5)
+        rebuild_index()
+
+    def test_results_are_paginated_in_rank_order(self):
+        with mock.patch('apps.search.views.SEARCH_PAGE_SIZE', 10):
+            response = self.client.get(reverse('search:search_results'), {'q': 'laser'})
+            second = self.client.get(reverse('search:search_results'), {'q': 'laser', 'page': 3})
+
+        self.assertEqual(response.context['results_count'], 25)
+        self.assertEqual(len(response.context['products']), 10)
+        self.assertEqual(response.context['products'][0], self.products[3])
+        self.assertEqual(len(second.context['products']), 5)
+
+    def test_column_sorts_apply_to_matches(self):
+        response = self.client.get(reverse('search:search_results'), {'q': 'laser', 'sort': 'price_desc'})
+        self.assertEqual(response.context['products'][0], self.products[-1])
+
+        response = self.client.get(reverse('search:search_results'), {'q': 'printer', 'sort': 'popular'})
+        self.assertEqual(response.context['products'][0], self.products[3])
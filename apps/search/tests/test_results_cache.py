@@ -0,0 +1,56 @@
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from apps.main.models import CacheVersion
+from apps.product.tests.helpers import reset_caches
+from apps.search import analytics, results_cache
+from apps.search.models import SearchCacheStats
+
+
+@override_settings(SEARCH_ANALYTICS_FLUSH_INTERVAL=0)
+class ResultsCacheTests(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.compute = mock.Mock(side_effect=lambda: {'product_ids': [1, 2]})
+
+    def lookup(self, query, params=()):
+        return results_cache.get_or_compute('results', query, params, self.compute)
+
+    def test_variant_spellings_share_one_entry(self):
+        self.assertEqual(self.lookup('پرينتر  Laser'), {'product_ids': [1, 2]})
+        self.assertEqual(self.lookup('پرینتر laser'), {'product_ids': [1, 2]})
+        self.lookup('پرینتر laser', ('category',))
+        self.assertEqual(self.compute.call_count, 2)
+
+    def test_catalog_bump_from_any_worker_invalidates(self):
+        self.lookup('laser')
+        # worker دیگری محصولی را ذخیره کرده است
+        CacheVersion.bump(results_cache.CATALOG_VERSION_KEY)
+        self.lookup('laser')
+        self.assertEqual(self.compute.call_count, 2)
+
+    def test_hits_and_misses_are_counted_in_the_shared_row(self):
+        self.lookup('laser')
+        self.lookup('laser')
+        self.lookup('toner')
+        stats = results_cache.cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_ratio']), (1, 2, 0.333))
+
+        out = StringIO()
+        call_command('search_cache_stats', '--reset', stdout=out)
+        self.assertIn('hits: 1  misses: 2', out.getvalue())
+        self.assertEqual(results_cache.cache_stats()['hits'], 0)
+
+    @override_settings(SEARCH_ANALYTICS_FLUSH_INTERVAL=60)
+    def test_counts_are_buffered_until_flush(self):
+        buffer = analytics.SearchEventBuffer()
+        self.addCleanup(lambda: buffer.timer and buffer.timer.cancel())
+        with mock.patch.object(analytics, '_buffer', buffer):
+            self.lookup('laser')
+            self.lookup('laser')
+            self.assertFalse(SearchCacheStats.objects.exists())
+            self.assertEqual(analytics.flush(), 2)
+
+        current = SearchCacheStats.current()
+        self.assertEqual((current.hits, current.misses), (1, 1))
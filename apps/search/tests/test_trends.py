@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from apps.main.fragments import tag_versions
+from apps.search import trends
+from apps.search.models import SearchHistory, SearchRollup, TrendingSearch, ZeroResultSearch
+
+NOW = datetime(2024, 5, 10, 12, 10, tzinfo=dt_timezone.utc)
+
+
+def search(query, at, results_count=3):
+    return SearchHistory.objects.create(query=query, created_at=at, results_count=results_count)
+
+
+def hourly():
+    return {
+        (row.query, row.bucket.hour): (row.count, row.zero_result_count)
+        for row in SearchRollup.objects.filter(granularity=SearchRollup.GRANULARITY_HOUR)
+    }
+
+
+@override_settings(SEARCH_ANALYTICS_FLUSH_INTERVAL=30)
+class TrendsRollupTests(TestCase):
+    def test_hours_are_rolled_up_by_normalized_query(self):
+        search('Samsung', NOW - timedelta(hours=2))
+        search('samsung ', NOW - timedelta(hours=2), results_count=0)
+        search('پرينتر', NOW - timedelta(minutes=30))
+        search('پرینتر', NOW - timedelta(minutes=20))
+
+        result = trends.run(NOW)
+        self.assertEqual(result['hours'], 2)
+        self.assertEqual(hourly(), {('samsung', 10): (2, 1), ('پرینتر', 11): (2, 0)})
+        daily = SearchRollup.objects.filter(granularity=SearchRollup.GRANULARITY_DAY)
+        self.assertEqual({row.query: row.count for row in daily}, {'samsung': 2, 'پرینتر': 2})
+        self.assertEqual(ZeroResultSearch.objects.get().query, 'samsung')
+
+    def test_hour_waits_for_buffered_events(self):
+        search('laser', NOW.replace(hour=11, minute=58))
+        # در 12:03 هنوز ممکن است رویدادهای 11:59 در بافر workerها باشند
+        self.assertIsNone(trends.pending_range(NOW.replace(minute=3)))
+
+        self.assertEqual(trends.run(NOW)['hours'], 1)
+        # رویدادی که دیر از بافر نوشته شده، در بازه تجمیع نشده‌ای نمی‌افتد
+        search('laser', NOW.replace(hour=11, minute=59))
+        self.assertIsNone(trends.pending_range(NOW + timedelta(minutes=30)))
+        self.assertEqual(hourly(), {('laser', 11): (1, 0)})
+
+    def test_recent_searches_outrank_older_bigger_ones(self):
+        for _ in range(10):
+            search('toner', NOW - timedelta(hours=48))
+        for _ in range(4):
+            search('laser', NOW - timedelta(hours=1, minutes=30))
+        for _ in range(9):
+            search('missing', NOW - timedelta(hours=1, minutes=30), results_count=0)
+
+        before = tag_versions(['trending'])
+        self.assertEqual(trends.run(NOW)['trending'], 2)
+        self.assertEqual(list(TrendingSearch.objects.values_list('query', 'count')), [('laser', 4), ('toner', 10)])
+        # قطعه cache شده هدر در همه workerها باطل می‌شود
+        self.assertNotEqual(tag_versions(['trending']), before)
+
+    def test_prune_keeps_history_that_is_not_rolled_up(self):
+        old = search('toner', NOW - trends.HISTORY_RETENTION - timedelta(days=1))
+        trends.run(NOW)
+        self.assertFalse(SearchHistory.objects.filter(pk=old.pk).exists())
+
+        SearchRollup.objects.all().delete()
+        search('laser', NOW - trends.HISTORY_RETENTION - timedelta(days=1))
+        self.assertEqual(trends.prune(NOW), (0, 0))
+
+    def test_command_reports_the_run(self):
+        # دستور با زمان فعلی اجرا می‌شود
+        search('laser', timezone.now() - timedelta(hours=3))
+        out = StringIO()
+        call_command('rollup_search_history', stdout=out)
+        self.assertTrue(SearchRollup.objects.exists())
+        self.assertIn('laser', list(TrendingSearch.objects.values_list('query', flat=True)))
+        self.assertTrue(out.getvalue())
@@ -0,0 +1,64 @@
+# text.py
+# یکسان‌سازی متن فارسی برای ایندکس و جستجو
+#
+# متن محصول و عبارت جستجو هر دو از همین مسیر عبور می‌کنند تا املاهای مختلف یک کلمه
+# (ی/ک عربی، نیم‌فاصله، اعراب، ارقام فارسی و عربی، حروف بزرگ لاتین) به یک توکن برسند.
+import html
+import re
+from django.utils.html import strip_tags
+
+CHAR_MAP = str.maketrans({
+    'ي': 'ی', 'ى': 'ی', 'ئ': 'ی',
+    'ك': 'ک',
+    'ة': 'ه', 'ۀ': 'ه',
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ؤ': 'و',
+    '۰': '0', '۱': '1', '۲': '2', '۳': '3', '۴': '4',
+    '۵': '5', '۶': '6', '۷': '7', '۸': '8', '۹': '9',
+    '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
+    '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+})
+
+# اعراب، تنوین، تشدید و کشیده (ـ)
+DIACRITICS_RE = re.compile('[\u064B-\u065F\u0670\u0640]')
+# نیم‌فاصله و کاراکترهای کنترلی جهت متن؛ «می‌شود» و «میشود» یک توکن می‌شوند
+JOINERS_RE = re.compile('[\u200c\u200d\u200e\u200f\u00ad]')
+TOKEN_RE = re.compile(r'\w+')
+
+MAX_TOKEN_LENGTH = 64
+
+STOP_WORDS = frozenset({
+    'و', 'در', 'به', 'از', 'که', 'با', 'را', 'این', 'ان', 'برای', 'است', 'یا',
+    'تا', 'بر', 'هم', 'هر', 'شود', 'میشود', 'کند', 'میکند', 'دارد', 'های', 'ها',
+    'the', 'and', 'of', 'for', 'with', 'a', 'an', 'to', 'in', 'on',
+})
+
+
+def normalize(text):
+    """یکسان‌سازی حروف، ارقام و نیم‌فاصله‌ها (بدون حذف فاصله‌ها)"""
+    if not text:
+        return ''
+    text = text.translate(CHAR_MAP)
+    text = DIACRITICS_RE.sub('', text)
+    text = JOINERS_RE.sub('', text)
+    return text.lower()
+
+
+def tokenize(text, keep_stop_words=False):
+    """لیست توکن‌های یکسان‌سازی شده متن (با تکرار، به ترتیب متن)"""
+    tokens = []
+    for token in TOKEN_RE.findall(normalize(text).replace('_', ' ')):
+        if not keep_stop_words and token in STOP_WORDS:
+            continue
+        tokens.append(token[:MAX_TOKEN_LENGTH])
+    return tokens
+
+
+def normalize_phrase(text):
+    """متن یکسان‌سازی شده با یک فاصله بین کلمات (کلمات توقف حذف نمی‌شوند)"""
+    return ' '.join(TOKEN_RE.findall(normalize(text).replace('_', ' ')))
+
+
+def html_to_text(value):
+    """متن ساده توضیحات CKEditor"""
+    return html.unescape(strip_tags(value or ''))
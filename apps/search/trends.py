@@ -0,0 +1,217 @@
+# trends.py
+# تجمیع ساعتی و روزانه تاریخچه جستجو، جستجوهای ترند و جستجوهای بدون نتیجه
+#
+# دستور rollup_search_history (هر ساعت با cron) ساعت‌های کامل شده‌ی SearchHistory را
+# بر اساس عبارت یکسان‌سازی شده در SearchRollup جمع می‌زند، آمار روزانه همان روزها را
+# از آمار ساعتی می‌سازد، امتیاز ترند را با کاهش نمایی (نیمه عمر TRENDING_HALF_LIFE)
+# از آمار ساعتی اخیر حساب می‌کند و تاریخچه قدیمی‌تر از HISTORY_RETENTION را
+# دسته‌ای پاک می‌کند. هدر سایت فقط جدول TrendingSearch را می‌خواند و قطعه cache شده آن
+# با invalidate_tags('trending') در همه workerها باطل می‌شود (نسخه در main.CacheVersion).
+#
+# رویدادهای جستجو تا SEARCH_ANALYTICS_FLUSH_INTERVAL ثانیه در بافر workerها می‌مانند
+# (apps.search.analytics)؛ یک ساعت فقط وقتی تجمیع می‌شود که این فاصله به همراه
+# ROLLUP_GRACE از پایان آن گذشته باشد تا رویدادهای دیرتر نوشته شده جا نیفتند.
+import math
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import TruncHour, TruncDay
+from django.utils import timezone
+from apps.main.fragments import invalidate_tags
+from .analytics import flush_interval
+from .models import SearchHistory, SearchRollup, TrendingSearch, ZeroResultSearch
+from .text import normalize_phrase
+
+TRENDING_HALF_LIFE = timedelta(hours=24)
+TRENDING_WINDOW = timedelta(days=7)
+TRENDING_LIMIT = 50
+TRENDING_MIN_LENGTH = 2
+
+ROLLUP_GRACE = timedelta(minutes=5)
+
+HISTORY_RETENTION = timedelta(days=30)
+HOURLY_ROLLUP_RETENTION = timedelta(days=30)
+PRUNE_BATCH_SIZE = 5000
+
+
+def hour_start(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def settled_until(now):
+    """زمانی که همه رویدادهای قبل از آن از بافر workerها نوشته شده‌اند"""
+    return now - timedelta(seconds=flush_interval()) - ROLLUP_GRACE
+
+
+def pending_range(now):
+    """بازه ساعت‌های کامل و نوشته شده‌ای که هنوز تجمیع نشده‌اند: (شروع، پایان) یا None"""
+    end = hour_start(settled_until(now))
+    last = SearchRollup.objects.filter(granularity=SearchRollup.GRANULARITY_HOUR).aggregate(last=Max('bucket'))['last']
+    if last is not None:
+        start = last + timedelta(hours=1)
+    else:
+        first = SearchHistory.objects.aggregate(first=Min('created_at'))['first']
+        if first is None:
+            return None
+        start = hour_start(first)
+    return (start, end) if start < end else None
+
+
+def rollup_hours(start, end):
+    """
+    تجمیع SearchHistory بازه [start, end) در آمار ساعتی و روزانه.
+    خروجی: {عبارت یکسان‌سازی شده: تعداد جستجوهای بدون نتیجه} برای بروزرسانی ZeroResultSearch
+    """
+    rows = SearchHistory.objects.filter(created_at__gte=start, created_at__lt=end).annotate(
+        hour=TruncHour('created_at')
+    ).values('hour', 'query').annotate(
+        count=Count('id'), zero=Count('id', filter=Q(results_count=0)), last=Max('created_at')
+    ).order_by()
+
+    hourly = {}
+    zero_results = {}
+    for row in rows:
+        query = normalize_phrase(row['query'])
+        if not query:
+            continue
+        counts = hourly.setdefault((query, row['hour']), [0, 0])
+        counts[0] += row['count']
+        counts[1] += row['zero']
+        if row['zero']:
+            count, last = zero_results.get(query, (0, row['last']))
+            zero_results[query] = (count + row['zero'], max(last, row['last']))
+
+    with transaction.atomic():
+        SearchRollup.objects.filter(
+            granularity=SearchRollup.GRANULARITY_HOUR, bucket__gte=start, bucket__lt=end
+        ).delete()
+        SearchRollup.objects.bulk_create([
+            SearchRollup(
+                query=query, granularity=SearchRollup.GRANULARITY_HOUR, bucket=hour,
+                count=count, zero_result_count=zero,
+            )
+            for (query, hour), (count, zero) in hourly.items()
+        ], batch_size=1000)
+        rollup_days(start, end)
+    return zero_results
+
+
+def rollup_days(start, end):
+    """ساخت دوباره آمار روزانه روزهایی که بازه [start, end) با آن‌ها اشتراک دارد"""
+    day_start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    rows = SearchRollup.objects.filter(
+        granularity=SearchRollup.GRANULARITY_HOUR, bucket__gte=day_start, bucket__lt=end
+    ).annotate(day=TruncDay('bucket')).values('day', 'query').annotate(
+        count=Sum('count'), zero=Sum('zero_result_count')
+    ).order_by()
+    SearchRollup.objects.filter(
+        granularity=SearchRollup.GRANULARITY_DAY, bucket__gte=day_start, bucket__lt=end
+    ).delete()
+    SearchRollup.objects.bulk_create([
+        SearchRollup(
+            query=row['query'], granularity=SearchRollup.GRANULARITY_DAY, bucket=row['day'],
+            count=row['count'], zero_result_count=row['zero'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+def record_zero_results(zero_results):
+    """افزودن تعداد جستجوهای بدون نتیجه (یک UPDATE برای هر مقدار افزایش)"""
+    if not zero_results:
+        return
+    ZeroResultSearch.objects.bulk_create(
+        [ZeroResultSearch(query=query, count=0) for query in zero_results], ignore_conflicts=True
+    )
+    ids = dict(ZeroResultSearch.objects.filter(query__in=list(zero_results)).values_list('query', 'id'))
+    by_increment = {}
+    for query, (count, last) in zero_results.items():
+        if query in ids:
+            id_list, latest = by_increment.get(count, ([], last))
+            id_list.append(ids[query])
+            by_increment[count] = (id_list, max(latest, last))
+    for count, (id_list, last) in by_increment.items():
+        ZeroResultSearch.objects.filter(id__in=id_list).update(count=F('count') + count, last_searched=last)
+
+
+def decay_weight(age):
+    """وزن یک بازه با فاصله زمانی age از حالا (نصف شدن در هر TRENDING_HALF_LIFE)"""
+    return math.exp(-math.log(2) * age / TRENDING_HALF_LIFE)
+
+
+def compute_trending(now):
+    """ساخت دوباره جدول TrendingSearch از آمار ساعتی TRENDING_WINDOW اخیر"""
+    rows = SearchRollup.objects.filter(
+        granularity=SearchRollup.GRANULARITY_HOUR, bucket__gte=now - TRENDING_WINDOW
+    ).values_list('query', 'bucket', 'count', 'zero_result_count')
+
+    scores, counts = {}, {}
+    for query, bucket, count, zero in rows:
+        # عبارت‌های بدون نتیجه در ترند نمایش داده نمی‌شوند
+        found = count - zero
+        if found <= 0 or len(query) < TRENDING_MIN_LENGTH:
+            continue
+        middle = bucket + timedelta(minutes=30)
+        scores[query] = scores.get(query, 0) + found * decay_weight(now - middle)
+        counts[query] = counts.get(query, 0) + found
+
+    top = sorted(scores, key=lambda query: (-scores[query], query))[:TRENDING_LIMIT]
+    with transaction.atomic():
+        TrendingSearch.objects.all().delete()
+        TrendingSearch.objects.bulk_create([
+            TrendingSearch(query=query, score=round(scores[query], 3), count=counts[query]) for query in top
+        ])
+    invalidate_tags('trending')
+    return len(top)
+
+
+def prune_before(queryset, cutoff_field, cutoff, batch_size=PRUNE_BATCH_SIZE):
+    """حذف دسته‌ای ردیف‌های قدیمی (هر دسته یک DELETE با id)"""
+    deleted = 0
+    old = queryset.filter(**{f'{cutoff_field}__lt': cutoff})
+    while True:
+        ids = list(old.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += queryset.model.objects.filter(id__in=ids).delete()[0]
+
+
+def prune(now, batch_size=PRUNE_BATCH_SIZE):
+    """
+    پاک کردن تاریخچه قدیمی‌تر از HISTORY_RETENTION (فقط ساعت‌های تجمیع شده)
+    و آمار ساعتی قدیمی‌تر از HOURLY_ROLLUP_RETENTION؛ آمار روزانه نگه داشته می‌شود.
+    """
+    last = SearchRollup.objects.filter(granularity=SearchRollup.GRANULARITY_HOUR).aggregate(last=Max('bucket'))['last']
+    history_cutoff = now - HISTORY_RETENTION
+    if last is None:
+        return 0, 0
+    history_cutoff = min(history_cutoff, last + timedelta(hours=1))
+    history = prune_before(SearchHistory.objects.all(), 'created_at', history_cutoff, batch_size)
+    hourly = prune_before(
+        SearchRollup.objects.filter(granularity=SearchRollup.GRANULARITY_HOUR),
+        'bucket', now - HOURLY_ROLLUP_RETENTION, batch_size,
+    )
+    return history, hourly
+
+
+def run(now=None, batch_size=PRUNE_BATCH_SIZE):
+    """اجرای کامل: تجمیع ساعت‌های جدید، ترند و پاک کردن داده قدیمی"""
+    now = now or timezone.now()
+    hours = 0
+    pending = pending_range(now)
+    if pending is not None:
+        start, end = pending
+        record_zero_results(rollup_hours(start, end))
+        hours = int((end - start) / timedelta(hours=1))
+    trending = compute_trending(now)
+    history_deleted, rollups_deleted = prune(now, batch_size)
+    return {
+        'hours': hours,
+        'trending': trending,
+        'history_deleted': history_deleted,
+        'rollups_deleted': rollups_deleted,
+    }
+
+
+def trending_searches(limit=10):
+    return TrendingSearch.objects.order_by('-score').values('query', 'count')[:limit]
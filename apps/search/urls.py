@@ -6,4 +6,5 @@ app_name = 'search'
 urlpatterns = [
     path('suggestions/', views.search_suggestions, name='search_suggestions'),
     path('results/', views.search_results, name='search_results'),
+    path('trending/', views.trending_searches_view, name='trending_searches'),
 ]
\ No newline at end of file
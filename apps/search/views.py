@@ -1,11 +1,43 @@
 from django.http import JsonResponse
-from django.db.models import Q
-from django.utils import timezone
 from django.views.decorators.http import require_GET
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import render
+from django.core.paginator import Paginator
 from apps.product.models import Product, Category
-from .models import SearchHistory, PopularSearch
+from .analytics import record_search
+from .ranking import rank
+from .autocomplete import suggest, did_you_mean, fuzzy_product_ids
+from .results_cache import get_or_compute, SUGGESTIONS_TTL
+from .trends import trending_searches
+
+
+def record_request_search(request, query, results_count):
+    record_search(
+        query,
+        user=request.user if request.user.is_authenticated else None,
+        session_key=request.session.session_key,
+        results_count=results_count,
+    )
+
+
+def compute_suggestions(query):
+    """پیشنهادهای عبارت بدون داده کارت محصولات (قابل کش)"""
+    product_ids, categories, popular_searches, total_products, total_categories = suggest(query)
+    did_you_mean_query = None
+    if not product_ids:
+        # بدون نتیجه دقیق: محصولات مشابه با تطبیق تقریبی (اشتباه تایپی)
+        product_ids = fuzzy_product_ids(query)
+        total_products = len(product_ids)
+        did_you_mean_query = did_you_mean(query)
+    return {
+        'product_ids': product_ids,
+        'categories': categories,
+        'popular_searches': popular_searches,
+        'total_products': total_products,
+        'total_categories': total_categories,
+        'did_you_mean': did_you_mean_query,
+    }
+
 
 @require_GET
 @csrf_exempt
@@ -19,99 +51,53 @@ def search_suggestions(request):
         'categories': [],
         'popular_searches': [],
         'total_products': 0,
-        'total_categories': 0
+        'total_categories': 0,
+        'did_you_mean': None
     }
 
     if not query or len(query) < 2:
         return JsonResponse(response_data)
 
     try:
-        # ذخیره تاریخچه جستجو
-        if request.user.is_authenticated:
-            SearchHistory.objects.create(user=request.user, query=query)
-        else:
-            session_key = request.session.session_key
-            if session_key:
-                SearchHistory.objects.create(session_key=session_key, query=query)
-
-        # به‌روزرسانی جستجوهای پرتکرار
-        popular_search, created = PopularSearch.objects.get_or_create(
-            query__iexact=query,
-            defaults={'query': query, 'count': 1}
-        )
-        if not created:
-            popular_search.count += 1
-            popular_search.last_searched = timezone.now()
-            popular_search.save()
-
-        # جستجوی محصولات - استفاده از icontains برای جستجوی جزئی
-        products = Product.objects.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query) |
-            Q(brand__title__icontains=query),
-            isActive=True
-        ).select_related('brand').prefetch_related('categories')[:8]
-
-        # جستجوی دسته‌بندی‌ها
-        categories = Category.objects.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query),
-            isActive=True
-        )[:6]
-
-        # جستجوهای پرتکرار مرتبط
-        popular_searches = PopularSearch.objects.filter(
-            query__icontains=query
-        ).exclude(query__iexact=query).order_by('-count')[:5]
+        # پیشنهادها از ایندکس پیشوندی حافظه؛ فقط داده کارت محصولات از دیتابیس خوانده می‌شود
+        suggestions = get_or_compute('suggest', query, (), lambda: compute_suggestions(query), ttl=SUGGESTIONS_TTL)
+        product_ids = suggestions['product_ids']
+
+        # ثبت تاریخچه و شمارنده جستجو در بافر (نوشتن گروهی در پس‌زمینه)
+        record_request_search(request, query, suggestions['total_products'] + suggestions['total_categories'])
+        products = Product.objects.filter(id__in=product_ids).select_related(
+            'brand', 'stats', 'effective_price'
+        ).in_bulk()
 
         # آماده‌سازی داده محصولات
         product_suggestions = []
-        for product in products:
-            try:
-                product_data = {
-                    'id': product.id,
-                    'title': product.title,
-                    'slug': product.slug,
-                    'price': product.price,
-                    'final_price': product.get_price_by_discount(),
-                    'image_url': product.image.url if product.image else '',
-                    'brand': product.brand.title if product.brand else '',
-                    'url': product.get_absolute_url(),
-                    'has_discount': product.get_discount_percentage() > 0,
-                    'discount_percentage': product.get_discount_percentage(),
-                    'avg_rating': getattr(product, 'avg_rating', 0)
-                }
-                product_suggestions.append(product_data)
-            except Exception as e:
-                print(f"Error processing product {product.id}: {e}")
+        for product_id in product_ids:
+            product = products.get(product_id)
+            if product is None:
                 continue
-
-        # آماده‌سازی داده دسته‌بندی‌ها
-        category_suggestions = []
-        for category in categories:
-            try:
-                category_data = {
-                    'id': category.id,
-                    'title': category.title,
-                    'slug': category.slug,
-                    'image_url': category.image.url if category.image else '',
-                    'url': category.get_absolute_url(),
-                    'product_count': category.products.filter(isActive=True).count()
-                }
-                category_suggestions.append(category_data)
-            except Exception as e:
-                print(f"Error processing category {category.id}: {e}")
-                continue
-
-        # آماده‌سازی جستجوهای پرتکرار
-        popular_suggestions = [{'query': ps.query, 'count': ps.count} for ps in popular_searches]
+            discount_percentage = product.get_discount_percentage()
+            stats = getattr(product, 'stats', None)
+            product_suggestions.append({
+                'id': product.id,
+                'title': product.title,
+                'slug': product.slug,
+                'price': product.price,
+                'final_price': int(product.price - (product.price * discount_percentage / 100)),
+                'image_url': product.image.url if product.image else '',
+                'brand': product.brand.title if product.brand else '',
+                'url': product.get_absolute_url(),
+                'has_discount': discount_percentage > 0,
+                'discount_percentage': discount_percentage,
+                'avg_rating': stats.avg_rating if stats else 0
+            })
 
         response_data.update({
             'products': product_suggestions,
-            'categories': category_suggestions,
-            'popular_searches': popular_suggestions,
-            'total_products': products.count(),
-            'total_categories': categories.count()
+            'categories': suggestions['categories'],
+            'popular_searches': suggestions['popular_searches'],
+            'total_products': suggestions['total_products'],
+            'total_categories': suggestions['total_categories'],
+            'did_you_mean': suggestions['did_you_mean']
         })
 
     except Exception as e:
@@ -122,45 +108,104 @@ def search_suggestions(request):
 
 
 
+SEARCH_PAGE_SIZE = 20
+
+SORT_OPTIONS = [
+    ('relevance', 'مرتبط‌ترین'),
+    ('popular', 'پرفروش ترین'),
+    ('price_asc', 'ارزان ترین'),
+    ('price_desc', 'گران ترین'),
+    ('newest', 'جدیدترین'),
+]
+
+# مرتب‌سازی‌های ستونی؛ relevance و popular از امتیاز جستجو می‌آیند
+SEARCH_ORDERINGS = {
+    'price_asc': ('price', 'id'),
+    'price_desc': ('-price', '-id'),
+    'newest': ('-createAt', '-id'),
+}
+
+
+def _products_in_order(product_ids):
+    """محصولات با داده کارت به همان ترتیب شناسه‌های داده شده"""
+    products = Product.objects.filter(id__in=product_ids).with_card_data().in_bulk()
+    return [products[pk] for pk in product_ids if pk in products]
+
+
+def ranked_product_ids(query, category_slug, sort_by):
+    """شناسه محصولات منطبق به ترتیب نهایی صفحه نتایج"""
+    ranked = rank(query)
+    if category_slug:
+        allowed = set(Product.objects.filter(
+            id__in=[product_id for product_id, _, _ in ranked], categories__slug=category_slug
+        ).values_list('id', flat=True))
+        ranked = [result for result in ranked if result[0] in allowed]
+
+    if sort_by == 'popular':
+        ranked.sort(key=lambda result: (-result[2], -result[1]))
+    elif sort_by in SEARCH_ORDERINGS:
+        return list(Product.objects.filter(
+            id__in=[product_id for product_id, _, _ in ranked]
+        ).order_by(*SEARCH_ORDERINGS[sort_by]).values_list('id', flat=True))
+    return [product_id for product_id, _, _ in ranked]
+
+
+def compute_results(query, category_slug, sort_by):
+    product_ids = ranked_product_ids(query, category_slug, sort_by)
+    suggested_query = None
+    if not product_ids:
+        # بدون نتیجه: جستجو با نزدیک‌ترین کلمات موجود در محصولات
+        suggested_query = did_you_mean(query)
+        if suggested_query:
+            product_ids = ranked_product_ids(suggested_query, category_slug, sort_by)
+    return {'product_ids': product_ids, 'suggested_query': suggested_query}
+
+
 def search_results(request):
-    """صفحه نتایج جستجوی کامل"""
+    """صفحه نتایج جستجوی کامل (فقط محصولات صفحه جاری بارگذاری می‌شوند)"""
     query = request.GET.get('q', '').strip()
     category_slug = request.GET.get('category', '')
     sort_by = request.GET.get('sort', 'relevance')
 
-    products = Product.objects.filter(isActive=True)
     categories = Category.objects.filter(isActive=True)
 
+    suggested_query = None
     if query:
-        products = products.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query) |
-            Q(brand__title__icontains=query) |
-            Q(features_value__value__icontains=query)
-        ).distinct()
-
-    if category_slug:
-        products = products.filter(categories__slug=category_slug)
-
-    # مرتب‌سازی
-    if sort_by == 'price_asc':
-        products = products.order_by('price')
-    elif sort_by == 'price_desc':
-        products = products.order_by('-price')
-    elif sort_by == 'newest':
-        products = products.order_by('-createAt')
-    elif sort_by == 'popular':
-        products = products.order_by('-createAt')  # می‌توانید منطق محبوبیت را اضافه کنید
-    else:  # relevance
-        products = products.order_by('-createAt')
+        # ترتیب شناسه‌ها از کش؛ کارت محصولات صفحه همیشه تازه خوانده می‌شوند
+        result = get_or_compute(
+            'results', query, (category_slug, sort_by),
+            lambda: compute_results(query, category_slug, sort_by),
+        )
+        suggested_query = result['suggested_query']
+        paginator = Paginator(result['product_ids'], SEARCH_PAGE_SIZE)
+        if not request.GET.get('page'):
+            record_request_search(request, query, paginator.count)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        products = _products_in_order(list(page_obj))
+    else:
+        products = Product.objects.filter(isActive=True)
+        if category_slug:
+            products = products.filter(categories__slug=category_slug)
+        ordering = SEARCH_ORDERINGS.get(sort_by, SEARCH_ORDERINGS['newest'])
+        paginator = Paginator(products.order_by(*ordering).with_card_data(), SEARCH_PAGE_SIZE)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        products = list(page_obj)
 
     context = {
         'query': query,
+        'suggested_query': suggested_query,
         'products': products,
+        'page_obj': page_obj,
         'categories': categories,
         'selected_category': category_slug,
         'sort_by': sort_by,
-        'results_count': products.count()
+        'sort_options': SORT_OPTIONS,
+        'results_count': paginator.count
     }
 
-    return render(request, 'search_app/search.html', context)
\ No newline at end of file
+    return render(request, 'search_app/search.html', context)
+
+
+def trending_searches_view(request):
+    """جستجوهای ترند هدر (از جدول TrendingSearch که دستور rollup_search_history می‌سازد)"""
+    return render(request, 'search_app/trending_searches.html', {'searches': trending_searches()})
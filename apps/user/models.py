@@ -70,6 +70,12 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return f"{self.mobileNumber} - {self.name or ''} {self.family or ''}"
 
+    def get_full_name(self):
+        return f"{self.name or ''} {self.family or ''}".strip()
+
+    def get_short_name(self):
+        return self.name or ''
+
     @property
     def age(self):
         if self.birth_date:
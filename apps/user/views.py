@@ -8,6 +8,7 @@ from datetime import timedelta
 
 from .forms import MobileForm, VerificationCodeForm
 from .models import CustomUser, UserSecurity
+from apps.order.cart_store import merge_on_login
 import utils
 
 import json
@@ -124,10 +125,10 @@ def verify_code(request):
                 messages.success(request, "✅ ورود موفقیت‌آمیز بود.")
 
                 # اگر next_url موجود بود برو همونجا
-                if next_url:
-                    return redirect(next_url)
+                response = redirect(next_url) if next_url else redirect("main:index")
 
-                return redirect("main:index")
+                # ادغام سبد خرید مهمان در سبد کاربر
+                return merge_on_login(request, user, response)
 
     else:
         form = VerificationCodeForm()
@@ -195,6 +195,10 @@ CKEDITOR_CONFIGS = {
 }
 
 # settings.py
+# LocMemCache جدا برای هر worker است؛ داده‌ای که باید بین workerها یکسان باشد (سبد خرید،
+# نسخه‌های cache در main.CacheVersion، شمارنده‌های جستجو) در دیتابیس نگه داشته می‌شود و
+# این cache فقط برای نتایج قابل بازسازی است. برای اشتراک همین نتایج بین workerها باید
+# backend مشترک (Redis یا Memcached) تنظیم شود.
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
@@ -205,3 +209,16 @@ CACHES = {
         'LOCATION': 'token-cache',
     }
 }
+
+# رندر همزمان ویجت‌های cached_partial در صفحه اصلی، دسته‌بندی و برند
+# (تعداد thread؛ 0 یعنی رندر ترتیبی)
+PARTIAL_RENDER_WORKERS = 0
+
+# نوشتن گروهی تاریخچه و آمار جستجو (apps.search.analytics)
+# فاصله نوشتن به ثانیه (0 یعنی نوشتن فوری) و حداکثر رویدادهای بافر
+SEARCH_ANALYTICS_FLUSH_INTERVAL = 30
+SEARCH_ANALYTICS_BATCH_SIZE = 500
+
+# محاسبه تاخیری آمار فروش، محصولات مرتبط و لیست پیشنهادی بعد از نهایی شدن سفارش
+# (apps.order.sales_refresh؛ فاصله به ثانیه، 0 یعنی محاسبه فوری بعد از commit)
+ORDER_SALES_REFRESH_INTERVAL = 10